@@ -5,7 +5,8 @@ from django.utils.html import format_html
 
 from .models import (
     UserProfile, MoodKeyword, Watchlist, WatchlistItem,
-    Room, RoomMembership, RoomMovie, WatchlistCollaborator, WatchRoomVote
+    Room, RoomMembership, RoomMovie, WatchlistCollaborator, WatchRoomVote,
+    CatalogMovie, CatalogCertification, CatalogAvailability, PosterPalette,
 )
 
 # --- User Profile ---
@@ -129,18 +130,11 @@ class RoomMembershipAdmin(admin.ModelAdmin):
 @admin.register(RoomMovie)
 class RoomMovieAdmin(admin.ModelAdmin):
     list_display = ("id", "room", "tmdb_id", "title", "position",
-                    "added_by", "votes_count", "added_at")
+                    "added_by", "score", "up_count", "down_count", "added_at")
     list_filter = ("added_at",)
     search_fields = ("title", "tmdb_id", "room__name", "added_by__username")
     ordering = ("room", "position", "-added_at")
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        return qs.annotate(_votes_count=Count("votes"))
-
-    def votes_count(self, obj):
-        return getattr(obj, "_votes_count", 0)
-    votes_count.admin_order_field = "_votes_count"
+    readonly_fields = ("score", "up_count", "down_count")  # kept by the vote endpoint / reconcile_room_scores - KR 16/10/2025
 
 @admin.register(WatchRoomVote)
 class WatchRoomVoteAdmin(admin.ModelAdmin):
@@ -155,4 +149,27 @@ class MoodKeywordAdmin(admin.ModelAdmin):
     list_display = ("mood", "keyword_id", "keyword_name", "weight")
     list_filter = ("mood",)
     search_fields = ("mood", "keyword_name", "keyword_id")
-    ordering = ("mood", "-weight", "keyword_name")
\ No newline at end of file
+    ordering = ("mood", "-weight", "keyword_name")
+
+# --- Local catalog ---
+class CatalogCertificationInline(admin.TabularInline):
+    model = CatalogCertification
+    extra = 0
+
+class CatalogAvailabilityInline(admin.TabularInline):
+    model = CatalogAvailability
+    extra = 0
+
+@admin.register(CatalogMovie)
+class CatalogMovieAdmin(admin.ModelAdmin):
+    list_display = ("tmdb_id", "title", "release_date", "popularity", "vote_average", "vote_count", "updated_at")
+    list_filter = ("original_language", "adult")
+    search_fields = ("title", "tmdb_id")
+    ordering = ("-popularity",)
+    inlines = [CatalogCertificationInline, CatalogAvailabilityInline]
+
+
+@admin.register(PosterPalette)
+class PosterPaletteAdmin(admin.ModelAdmin):
+    list_display = ("file_path", "palette", "created_at")
+    search_fields = ("file_path",)
@@ -0,0 +1,102 @@
+import gzip
+import io
+import json
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import CatalogMovie
+from api.services.catalog import ingest_details
+from api.services.tmdb import (
+    cache_get_many,
+    get_movie_details_many,
+    movie_detail_key,
+    tmdb_session,
+)
+
+TMDB_EXPORT_URL = "https://files.tmdb.org/p/exports/movie_ids_{d:%m_%d_%Y}.json.gz"
+
+
+class Command(BaseCommand):
+    """
+    Fill / refresh the local movie catalog used by mood discovery.
+    Ids come from a TMDB daily export (file or download), an explicit list, or the rows already in the
+    catalog (--refresh). Details go through the shared movie-detail cache, so anything mood pages or
+    the pre-warmer already fetched costs no TMDB call; --cached-only never calls TMDB at all. - KR 16/10/2025
+    """
+
+    help = "Ingest TMDB movies into the local catalog (CatalogMovie + certifications + availability)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--export", default="",
+                            help='TMDB daily export: a local movie_ids_*.json(.gz) path, or "latest" to download.')
+        parser.add_argument("--ids", default="", help="Comma-separated TMDB ids.")
+        parser.add_argument("--refresh", action="store_true", help="Re-ingest every movie already in the catalog.")
+        parser.add_argument("--limit", type=int, default=20000, help="Most popular N ids from the export.")
+        parser.add_argument("--min-popularity", type=float, default=0.0, help="Skip export rows below this.")
+        parser.add_argument("--batch", type=int, default=200, help="Ids per detail fetch / DB write.")
+        parser.add_argument("--cached-only", action="store_true",
+                            help="Only ingest details already in the movie-detail cache (no TMDB calls).")
+
+    def handle(self, *args, **opts):
+        ids = self._plan_ids(opts)
+        if not ids:
+            raise CommandError("nothing to ingest: pass --export, --ids or --refresh")
+
+        batch = max(1, opts["batch"])
+        ingested = skipped = 0
+        for start in range(0, len(ids), batch):
+            chunk = ids[start:start + batch]
+            if opts["cached_only"]:
+                hits = cache_get_many([movie_detail_key(mid) for mid in chunk])
+                details = [hits.get(movie_detail_key(mid)) for mid in chunk]
+            else:
+                details = [d if not err else None for d, err in get_movie_details_many(chunk)]
+            details = [d for d in details if d]
+            skipped += len(chunk) - len(details)
+            ingested += ingest_details(details)
+            self.stdout.write(f"{min(start + batch, len(ids))}/{len(ids)} ids processed")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"catalog: {ingested} movies ingested, {skipped} skipped; {CatalogMovie.objects.count()} rows total"
+        ))
+
+    def _plan_ids(self, opts) -> list[int]:
+        ids = [int(x) for x in opts["ids"].split(",") if x.strip().isdigit()]
+        if opts["refresh"]:
+            ids.extend(CatalogMovie.objects.values_list("tmdb_id", flat=True))
+        if opts["export"]:
+            ids.extend(self._export_ids(opts["export"], limit=opts["limit"], min_pop=opts["min_popularity"]))
+        return list(dict.fromkeys(ids))
+
+    def _export_ids(self, source: str, *, limit: int, min_pop: float) -> list[int]:
+        """Most popular non-adult ids from a TMDB export (one JSON object per line)."""
+        if source == "latest":
+            # exports are published once a day; yesterday's is always there
+            url = TMDB_EXPORT_URL.format(d=datetime.utcnow() - timedelta(days=1))
+            resp = tmdb_session().get(url, timeout=60)
+            if resp.status_code != 200:
+                raise CommandError(f"export download failed ({resp.status_code}): {url}")
+            raw = resp.content
+        else:
+            with open(source, "rb") as fh:
+                raw = fh.read()
+        if raw[:2] == b"\x1f\x8b":
+            raw = gzip.decompress(raw)
+
+        rows = []
+        for line in io.TextIOWrapper(io.BytesIO(raw), encoding="utf-8"):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if row.get("adult") or row.get("video") or not row.get("id"):
+                continue
+            pop = float(row.get("popularity") or 0)
+            if pop >= min_pop:
+                rows.append((pop, int(row["id"])))
+        rows.sort(key=lambda r: (-r[0], r[1]))
+        return [mid for _, mid in rows[:limit]]
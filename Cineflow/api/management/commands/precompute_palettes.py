@@ -0,0 +1,117 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import RoomMovie, WatchlistItem
+from api.services.mood import MOOD_RULES, DEFAULT_FILTERS, snapshot_base_params, snapshot_variants, snapshot_key
+from api.services.palette import cached_palettes, fetch_poster, poster_file, store_palettes
+from api.services.palette_engine import extract_palette_or_none
+from api.services.tmdb import cache_get, concurrent_map, tmdb_get
+
+SOURCES = ("trending", "now_playing", "snapshots", "watchlists", "rooms")
+PALETTE_PROCESSES = int(os.environ.get("PALETTE_PROCESSES", str(min(4, os.cpu_count() or 1))))  # 0 = inline
+
+
+class Command(BaseCommand):
+    """
+    Compute poster palettes ahead of time for every poster users are likely to see: the trending and
+    now-playing rails, today's mood snapshots and everything sitting in watchlists and rooms.
+    Already-known files are skipped, so it is cheap to run from cron after prewarm_mood_snapshots. - KR 16/10/2025
+    """
+
+    help = "Precompute poster palettes (cache + PosterPalette table) for rails, mood snapshots, watchlists and rooms."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sources", default=",".join(SOURCES), help=f"Comma-separated subset of {SOURCES}.")
+        parser.add_argument("--regions", default="", help="Comma-separated regions (default: MOOD_PREWARM_REGIONS).")
+        parser.add_argument("--workers", type=int, default=8, help="Posters downloaded in parallel.")
+        parser.add_argument("--processes", type=int, default=PALETTE_PROCESSES,
+                            help="Extraction processes (0 = extract in this process).")
+        parser.add_argument("--limit", type=int, default=0, help="Stop after this many new palettes (0 = no limit).")
+
+    def handle(self, *args, **opts):
+        sources = [s.strip() for s in opts["sources"].split(",") if s.strip()]
+        unknown = [s for s in sources if s not in SOURCES]
+        if unknown:
+            raise CommandError(f"unknown sources: {', '.join(unknown)}")
+        regions = [r.strip().upper() for r in opts["regions"].split(",") if r.strip()] \
+            or list(settings.MOOD_PREWARM_REGIONS)
+
+        paths = {}  # file -> first poster path seen for it
+        for source in sources:
+            for path in getattr(self, f"_{source}")(regions):
+                f = poster_file(path or "")
+                if f:
+                    paths.setdefault(f, path)
+
+        known = cached_palettes(list(paths))
+        todo = [f for f in paths if f not in known]
+        if opts["limit"]:
+            todo = todo[:opts["limit"]]
+
+        def _fetch(f):
+            try:
+                return fetch_poster(paths[f])
+            except Exception:
+                return None
+
+        # downloads on threads (I/O bound); extraction in a process pool owned by this command only.
+        # "spawn" so workers never inherit sockets/locks from this process.
+        contents = dict(zip(todo, concurrent_map(_fetch, todo, max_in_flight=opts["workers"])))
+        ready = [f for f in todo if contents[f]]
+        if opts["processes"] and len(ready) > 1:
+            with ProcessPoolExecutor(
+                max_workers=opts["processes"], mp_context=multiprocessing.get_context("spawn"),
+            ) as pool:
+                extracted = list(pool.map(extract_palette_or_none, [contents[f] for f in ready], chunksize=8))
+        else:
+            extracted = [extract_palette_or_none(contents[f]) for f in ready]
+
+        fresh = {f: palette for f, palette in zip(ready, extracted) if palette}
+        failed = len(todo) - len(fresh)
+        store_palettes(fresh)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"palettes: {len(paths)} posters seen, {len(known)} already known, "
+            f"{len(fresh)} computed, {failed} failed"
+        ))
+
+    # --- poster sources ---
+
+    @staticmethod
+    def _rail(cache_key, path, params=None):
+        data = cache_get(cache_key)
+        if not data:
+            data, err = tmdb_get(path, params)
+            if err:
+                return []
+        return [m.get("poster_path") for m in (data or {}).get("results") or []]
+
+    def _trending(self, regions):
+        return self._rail("tmdb:trending:movie:week", "/trending/movie/week")
+
+    def _now_playing(self, regions):
+        out = []
+        for region in regions:
+            out += self._rail(f"tmdb:now_playing:{region}:p1", "/movie/now_playing", {"region": region, "page": "1"})
+        return out
+
+    def _snapshots(self, regions):
+        out = []
+        for mood in sorted(MOOD_RULES):
+            for region in regions:
+                for providers in settings.MOOD_PREWARM_PROVIDER_SETS:
+                    base = snapshot_base_params(mood, region=region, providers=providers, filters=DEFAULT_FILTERS)
+                    for name, par in snapshot_variants(base):
+                        snap = cache_get(snapshot_key(name, mood, region, par, DEFAULT_FILTERS)) or {}
+                        out += [m.get("poster_path") for m in snap.get("results") or []]
+        return out
+
+    def _watchlists(self, regions):
+        return WatchlistItem.objects.exclude(poster_path="").values_list("poster_path", flat=True).distinct()
+
+    def _rooms(self, regions):
+        return RoomMovie.objects.exclude(poster_path="").values_list("poster_path", flat=True).distinct()
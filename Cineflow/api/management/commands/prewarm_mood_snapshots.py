@@ -0,0 +1,174 @@
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.services.tmdb import (
+    collect_discover_pages,
+    concurrent_map,
+    get_movie_details_many,
+    midnight_ttl_seconds,
+    cache_swap_in,
+)
+from api.services.catalog import local_snapshot
+from api.services.mood import (
+    MOOD_RULES,
+    DEFAULT_FILTERS,
+    ENRICH_N,
+    SNAPSHOT_MAX_PAGES,
+    snapshot_base_params,
+    snapshot_variants,
+    snapshot_key,
+    merge_snapshot_candidates,
+)
+from api.views.mood_discover import ranked_mood
+
+# Monetization types the mood pages send: default pills and the "include rent/buy" toggle - KR 17/10/2025
+UI_TYPES = ("flatrate,ads,free", "ads,buy,flatrate,free,rent")
+
+
+def ui_shapes(providers):
+    """(types, broad, force_providers) for each mood request the web app makes with this provider set."""
+    if not providers:
+        return [(types, False, False) for types in UI_TYPES]
+    # a provider pick always sends broad=1, with or without the hard gate
+    return [(types, True, force) for types in UI_TYPES for force in (False, True)]
+
+
+class Command(BaseCommand):
+    """
+    Build every mood snapshot (all MOOD_RULES x regions x provider sets x UI request shapes) ahead
+    of the UTC midnight rollover, warm the detail cache for their enrichment candidates, swap the
+    new snapshots in with one set_many and rank each shape into its moodrank: entry, so no user
+    request has to build either.
+    Run it from cron shortly before midnight, or keep it running with --loop. - KR 15/10/2025
+    """
+
+    help = "Pre-build mood discover snapshots (and enrichment details) for all moods/regions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--moods", default="", help="Comma-separated mood keys (default: all).")
+        parser.add_argument("--regions", default="", help="Comma-separated regions (default: MOOD_PREWARM_REGIONS).")
+        parser.add_argument("--providers", default=None,
+                            help='";"-separated provider sets (default: MOOD_PREWARM_PROVIDER_SETS).')
+        parser.add_argument("--workers", type=int, default=4, help="Snapshots built in parallel.")
+        parser.add_argument("--ahead-hours", type=float, default=3.0,
+                            help="When run this close to midnight, keep snapshots until the following midnight.")
+        parser.add_argument("--no-enrich", action="store_true", help="Skip warming the movie-detail cache.")
+        parser.add_argument("--no-rank", action="store_true", help="Skip warming the ranked moodrank: entries.")
+        parser.add_argument("--loop", action="store_true", help="Stay running and rebuild once a day at --at.")
+        parser.add_argument("--at", default="23:30", help="UTC HH:MM for --loop runs.")
+
+    def handle(self, *args, **opts):
+        if not opts["loop"]:
+            self._run_once(opts)
+            return
+        while True:
+            wait = self._seconds_until(opts["at"])
+            self.stdout.write(f"next pre-warm in {wait}s")
+            time.sleep(wait)
+            try:
+                self._run_once(opts)
+            except Exception as e:  # keep the worker alive
+                self.stderr.write(f"pre-warm failed: {e}")
+
+    @staticmethod
+    def _seconds_until(hhmm: str) -> int:
+        hh, mm = (int(x) for x in hhmm.split(":", 1))
+        now = datetime.utcnow()
+        target = now.replace(hour=hh, minute=mm, second=0, microsecond=0)
+        if target <= now:
+            target += timedelta(days=1)
+        return int((target - now).total_seconds())
+
+    def _run_once(self, opts):
+        moods = [m.strip() for m in opts["moods"].split(",") if m.strip()] or sorted(MOOD_RULES)
+        unknown = [m for m in moods if m not in MOOD_RULES]
+        if unknown:
+            self.stderr.write(f"unknown moods: {', '.join(unknown)}")
+            return
+        regions = [r.strip().upper() for r in opts["regions"].split(",") if r.strip()] \
+            or list(settings.MOOD_PREWARM_REGIONS)
+        if opts["providers"] is None:
+            provider_sets = list(settings.MOOD_PREWARM_PROVIDER_SETS)
+        else:
+            provider_sets = [p.strip() for p in opts["providers"].split(";")]
+
+        ttl = midnight_ttl_seconds()
+        if ttl < opts["ahead_hours"] * 3600:
+            ttl += 60 * 60 * 24  # built for tomorrow: outlive the rollover
+
+        # 1) Plan: every request shape the UI makes, and the snapshot keys behind it, deduped by discover params
+        filters = dict(DEFAULT_FILTERS)
+        plans = []        # (mood, region, providers, types, broad, force, variants, keys)
+        by_params = {}    # frozen params -> keys sharing that snapshot
+        for mood in moods:
+            for region in regions:
+                for providers in provider_sets:
+                    for types, broad, force in ui_shapes(providers):
+                        base = snapshot_base_params(mood, region=region, providers=providers, types=types,
+                                                    broad=broad, filters=filters)
+                        variants = snapshot_variants(base)
+                        keys = []
+                        for name, par in variants:
+                            k = snapshot_key(name, mood, region, par, filters)
+                            keys.append(k)
+                            shared = by_params.setdefault(tuple(sorted(par.items())), [])
+                            if k not in shared:
+                                shared.append(k)
+                        plans.append((mood, region, providers, types, broad, force, variants, keys))
+
+        # 2) Build all snapshots: local catalog first, the rest concurrently from TMDB (each fans out its pages)
+        param_list = list(by_params)
+        built = {}
+        for frozen in param_list:
+            snap = local_snapshot({**dict(frozen), "page": 1}, max_pages=SNAPSHOT_MAX_PAGES)
+            if snap:
+                built[frozen] = snap
+        backfill = [frozen for frozen in param_list if frozen not in built]
+        built.update(zip(backfill, concurrent_map(
+            lambda frozen: collect_discover_pages({**dict(frozen), "page": 1}, max_pages=SNAPSHOT_MAX_PAGES),
+            backfill,
+            max_in_flight=opts["workers"],
+        )))
+        fresh = {}
+        for frozen, snap in built.items():
+            if not (snap or {}).get("results"):
+                continue  # never swap an empty/failed build over a good snapshot
+            for k in by_params[frozen]:
+                fresh[k] = snap
+
+        # 3) Warm the shared detail cache for each mood's enrichment window
+        detail_ids = []
+        if not opts["no_enrich"]:
+            for mood, keys in dict.fromkeys((plan[0], tuple(plan[-1])) for plan in plans):
+                candidates = merge_snapshot_candidates(mood, [fresh.get(k) for k in keys])
+                detail_ids.extend(c.id for c in candidates[:ENRICH_N])
+            detail_ids = list(dict.fromkeys(detail_ids))
+            get_movie_details_many(detail_ids)
+
+        # 4) Swap in: snapshots + their stale copies in one go
+        cache_swap_in(fresh, ttl)
+
+        # 5) Rank every UI shape through the view's code path, off the snapshots just published
+        #    (shapes with a failed snapshot are left for the first request to build)
+        ranked = []
+        if not opts["no_rank"]:
+            ranked = [plan for plan in plans if all(k in fresh for k in plan[-1])]
+
+            def _rank(plan):
+                mood, region, providers, types, broad, force, variants, keys = plan
+                return ranked_mood(
+                    mood, variants, keys,
+                    region=region, providers=providers, types_in=types, filters=filters,
+                    broad=broad, force_providers=force, ttl=ttl,
+                )
+
+            concurrent_map(_rank, ranked, max_in_flight=opts["workers"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"pre-warmed {len(fresh)} snapshot keys ({len(param_list)} builds, "
+            f"{len(detail_ids)} details, {len(ranked)} rankings) "
+            f"for {len(moods)} moods x {len(regions)} regions; ttl={ttl}s"
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import Room, RoomMovie, Watchlist, WatchlistItem
+from api.services.ranking import needs_rebalance, rebalance
+
+
+class Command(BaseCommand):
+    """
+    Renumber watchlists and room queues whose gapped positions are running out of room between
+    neighbours, so drag-and-drop moves keep touching a single row. Lists with healthy gaps are
+    left alone; safe to run from cron. - KR 16/10/2025
+    """
+
+    help = "Rebalance gapped positions for watchlist items and room movies."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--min-gap", type=int, default=8,
+                            help="Renumber a list when two neighbours are closer than this.")
+        parser.add_argument("--all", action="store_true", help="Renumber every list regardless of gaps.")
+
+    def handle(self, *args, **opts):
+        targets = (
+            ("watchlists", Watchlist, WatchlistItem, "watchlist"),
+            ("rooms", Room, RoomMovie, "room"),
+        )
+        for label, Parent, Child, fk in targets:
+            fixed = 0
+            for parent_id in Parent.objects.values_list("id", flat=True).iterator():
+                siblings = Child.objects.filter(**{fk: parent_id})
+                positions = list(siblings.order_by("position").values_list("position", flat=True))
+                if opts["all"] or needs_rebalance(positions, min_gap=opts["min_gap"]):
+                    with transaction.atomic():
+                        rebalance(siblings.select_for_update())
+                    fixed += 1
+            self.stdout.write(self.style.SUCCESS(f"{label}: {fixed} rebalanced"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from api.services.room_votes import reconcile_scores
+
+
+class Command(BaseCommand):
+    """
+    Recompute RoomMovie.score / up_count / down_count from the WatchRoomVote rows.
+    The vote endpoint keeps them in step; this catches anything that bypassed it (users deleted with
+    their votes, admin edits, restores). Safe to run from cron. - KR 16/10/2025
+    """
+
+    help = "Reconcile denormalized room-movie vote counters with the vote rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", default="", help="Comma-separated room ids (default: all rooms).")
+
+    def handle(self, *args, **opts):
+        room_ids = [int(r) for r in opts["rooms"].split(",") if r.strip().isdigit()]
+        fixed = reconcile_scores(room_ids or None)
+        self.stdout.write(self.style.SUCCESS(f"room scores: {fixed} room movies corrected"))
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.3 on 2025-10-16 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_userprofile_email_verified_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogMovie',
+            fields=[
+                ('tmdb_id', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(blank=True, max_length=250)),
+                ('original_language', models.CharField(blank=True, max_length=10)),
+                ('release_date', models.DateField(blank=True, null=True)),
+                ('runtime', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('popularity', models.FloatField(default=0)),
+                ('vote_average', models.FloatField(default=0)),
+                ('vote_count', models.PositiveIntegerField(default=0)),
+                ('genre_mask', models.BigIntegerField(default=0)),
+                ('adult', models.BooleanField(default=False)),
+                ('data', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-popularity'], name='api_catalog_popular_54765e_idx'), models.Index(fields=['vote_count'], name='api_catalog_vote_co_8390b9_idx'), models.Index(fields=['vote_average'], name='api_catalog_vote_av_42d109_idx'), models.Index(fields=['release_date'], name='api_catalog_release_65e86b_idx'), models.Index(fields=['runtime'], name='api_catalog_runtime_b884da_idx'), models.Index(fields=['original_language'], name='api_catalog_origina_20b456_idx'), models.Index(fields=['genre_mask'], name='api_catalog_genre_m_7f53aa_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CatalogCertification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(max_length=2)),
+                ('certification', models.CharField(max_length=12)),
+                ('ordinal', models.PositiveSmallIntegerField()),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='certifications', to='api.catalogmovie')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['country', 'ordinal'], name='api_catalog_country_c6a889_idx')],
+                'unique_together': {('movie', 'country')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CatalogAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('region', models.CharField(max_length=2)),
+                ('provider_id', models.PositiveIntegerField()),
+                ('monetization', models.CharField(max_length=10)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability', to='api.catalogmovie')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['region', 'provider_id', 'monetization'], name='api_catalog_region_68e951_idx'), models.Index(fields=['region', 'monetization'], name='api_catalog_region_fb51d9_idx')],
+                'unique_together': {('movie', 'region', 'provider_id', 'monetization')},
+            },
+        ),
+    ]
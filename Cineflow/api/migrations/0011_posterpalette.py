@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2025-10-16 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_catalog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PosterPalette',
+            fields=[
+                ('file_path', models.CharField(max_length=120, primary_key=True, serialize=False)),
+                ('palette', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
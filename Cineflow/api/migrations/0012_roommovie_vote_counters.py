@@ -0,0 +1,45 @@
+# Generated by Django 5.2.3 on 2025-10-16 15:20
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_counters(apps, schema_editor):
+    RoomMovie = apps.get_model("api", "RoomMovie")
+    rows = RoomMovie.objects.annotate(
+        _score=Sum("votes__value", default=0),
+        _up=Count("votes", filter=Q(votes__value=1)),
+        _down=Count("votes", filter=Q(votes__value=-1)),
+    ).values_list("pk", "_score", "_up", "_down")
+    movies = [RoomMovie(pk=pk, score=s, up_count=u, down_count=d) for pk, s, u, d in rows if s or u or d]
+    RoomMovie.objects.bulk_update(movies, ["score", "up_count", "down_count"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_posterpalette'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roommovie',
+            name='down_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='roommovie',
+            name='score',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='roommovie',
+            name='up_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='roommovie',
+            index=models.Index(fields=['room', 'position', '-score'], name='api_roommov_room_id_8b758b_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2025-10-16 16:10
+
+from django.db import migrations
+from django.db.models import Case, When
+
+GAP = 1024  # api.services.ranking.GAP at the time of writing
+
+
+def spread_positions(apps, schema_editor):
+    """Renumber every watchlist and room queue to GAP-spaced positions, keeping the current order."""
+    for model_name, parent in (("WatchlistItem", "watchlist_id"), ("RoomMovie", "room_id")):
+        Model = apps.get_model("api", model_name)
+        ordered = {}
+        for pk, parent_id in Model.objects.order_by(parent, "position", "-added_at").values_list("pk", parent):
+            ordered.setdefault(parent_id, []).append(pk)
+        for ids in ordered.values():
+            whens = [When(pk=pk, then=i * GAP) for i, pk in enumerate(ids, start=1)]
+            Model.objects.filter(pk__in=ids).update(position=Case(*whens))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_roommovie_vote_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(spread_positions, migrations.RunPython.noop),
+    ]
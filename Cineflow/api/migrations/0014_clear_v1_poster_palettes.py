@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2025-10-17 09:20
+
+from django.db import migrations
+
+
+def clear_v1_palettes(apps, schema_editor):
+    """Palettes from the old ColorThief/w500 extractor; recomputed on demand or by precompute_palettes."""
+    apps.get_model("api", "PosterPalette").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_gapped_positions'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_v1_palettes, migrations.RunPython.noop),
+    ]
@@ -117,15 +117,11 @@ class WatchlistItem(models.Model): # each row will represent one movie saved ins
         Ensures new items append to the end of the list. - KR 27/09/2025
         """
         # Only generate on initial insert or when position is 0/None - KR 27/09/2025
+        # Gapped (tail + GAP) so later moves only touch the moved row - KR 16/10/2025
         if self._state.adding and (self.position is None or self.position == 0):
-            last_position = (
-                self.__class__.objects
-                .filter(watchlist=self.watchlist)
-                .order_by("-position")
-                .values_list("position", flat=True)
-                .first()
-            )
-            self.position = (last_position or 0) + 1
+            from api.services.ranking import tail_position
+
+            self.position = tail_position(self.__class__.objects.filter(watchlist=self.watchlist))
 
         super().save(*args, **kwargs)
 
@@ -183,6 +179,10 @@ class RoomMovie(models.Model):
     added_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True) #which user suggested the movie. Keeps record even if user is deleted - KR
     position = models.PositiveIntegerField(default=0)
     added_at = models.DateTimeField(auto_now_add=True)
+    # vote totals, maintained by api/services/room_votes.py so reads never aggregate WatchRoomVote - KR 16/10/2025
+    score = models.IntegerField(default=0)
+    up_count = models.PositiveIntegerField(default=0)
+    down_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         unique_together = [("room", "tmdb_id")]
@@ -190,6 +190,7 @@ class RoomMovie(models.Model):
         indexes = [
             models.Index(fields=["room", "position"]),     
             models.Index(fields=["room", "-added_at"]),    
+            models.Index(fields=["room", "position", "-score"]),  # room ranking order - KR 16/10/2025
         ]
 
     def __str__(self):
@@ -243,4 +244,80 @@ class WatchRoomVote(models.Model):  # One user's vote on one movie in a room - K
         ]
 
     def __str__(self):
-        return f"Vote({self.get_value_display()}) by {self.user} on {self.room_movie_id}"
\ No newline at end of file
+        return f"Vote({self.get_value_display()}) by {self.user} on {self.room_movie_id}"
+
+# Local movie catalog - KR 16/10/2025
+# Our own copy of the TMDB fields /discover filters on, so mood snapshots can be built with one
+# indexed query instead of TMDB round-trips (see api/services/catalog.py, `manage.py ingest_catalog`).
+
+class CatalogMovie(models.Model):
+    tmdb_id = models.PositiveIntegerField(primary_key=True)
+    title = models.CharField(max_length=250, blank=True)
+    original_language = models.CharField(max_length=10, blank=True)
+    release_date = models.DateField(null=True, blank=True)
+    runtime = models.PositiveSmallIntegerField(null=True, blank=True)
+    popularity = models.FloatField(default=0)
+    vote_average = models.FloatField(default=0)
+    vote_count = models.PositiveIntegerField(default=0)
+    genre_mask = models.BigIntegerField(default=0)  # bits per api.services.mood.TMDB_GENRE_IDS
+    adult = models.BooleanField(default=False)
+    data = models.JSONField(default=dict)  # /discover-shaped result dict, served as-is
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-popularity"]),
+            models.Index(fields=["vote_count"]),
+            models.Index(fields=["vote_average"]),
+            models.Index(fields=["release_date"]),
+            models.Index(fields=["runtime"]),
+            models.Index(fields=["original_language"]),
+            models.Index(fields=["genre_mask"]),
+        ]
+
+    def __str__(self):
+        return f"{self.title or 'TMDB'} ({self.tmdb_id})"
+
+
+class CatalogCertification(models.Model):  # lightest certification per movie per country - KR 16/10/2025
+    movie = models.ForeignKey(CatalogMovie, on_delete=models.CASCADE, related_name="certifications")
+    country = models.CharField(max_length=2)
+    certification = models.CharField(max_length=12)
+    ordinal = models.PositiveSmallIntegerField()  # position on api.services.certification.CERT_LADDERS
+
+    class Meta:
+        unique_together = [("movie", "country")]
+        indexes = [
+            models.Index(fields=["country", "ordinal"]),
+        ]
+
+    def __str__(self):
+        return f"{self.movie_id} {self.country}:{self.certification}"
+
+
+class CatalogAvailability(models.Model):  # region -> provider availability per movie - KR 16/10/2025
+    movie = models.ForeignKey(CatalogMovie, on_delete=models.CASCADE, related_name="availability")
+    region = models.CharField(max_length=2)
+    provider_id = models.PositiveIntegerField()
+    monetization = models.CharField(max_length=10)  # flatrate / ads / free / rent / buy
+
+    class Meta:
+        unique_together = [("movie", "region", "provider_id", "monetization")]
+        indexes = [
+            models.Index(fields=["region", "provider_id", "monetization"]),
+            models.Index(fields=["region", "monetization"]),
+        ]
+
+    def __str__(self):
+        return f"{self.movie_id} {self.region}:{self.provider_id} ({self.monetization})"
+
+
+# Poster palettes (api/services/palette.py) - KR 16/10/2025
+
+class PosterPalette(models.Model):
+    file_path = models.CharField(max_length=120, primary_key=True)  # TMDB image file name, e.g. "abc123.jpg"
+    palette = models.JSONField(default=list)  # [[r, g, b], ...]
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Palette({self.file_path})"
@@ -1,7 +1,7 @@
 from typing import Optional
 
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
+from django.db.models import Prefetch
 from rest_framework import serializers
 
 from .models import (
@@ -115,6 +115,17 @@ class ReorderSerializer(serializers.Serializer):
         return ids
 
 
+class MoveSerializer(serializers.Serializer):
+    """Drag-and-drop move: place the item after `after` and/or before `before` (sibling ids) - KR 16/10/2025"""
+    after = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+    before = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+
+    def validate(self, attrs):
+        if not (attrs.get("after") or attrs.get("before")):
+            raise serializers.ValidationError("Give 'after' and/or 'before'.")
+        return attrs
+
+
 # --- Rooms ---
 class RoomMembershipSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source="user.username", read_only=True)
@@ -170,18 +181,25 @@ class RoomVoteSerializer(serializers.ModelSerializer):
 
 
 class RoomMovieSerializer(serializers.ModelSerializer):
-    score = serializers.SerializerMethodField()
-
     class Meta:
         model = RoomMovie
-        fields = ["id", "tmdb_id", "title", "poster_path", "added_by", "added_at", "position", "score"]
-        read_only_fields = ["id", "added_by", "added_at", "position", "score"]
+        fields = ["id", "tmdb_id", "title", "poster_path", "added_by", "added_at", "position", "score", "up_count", "down_count"]
+        read_only_fields = ["id", "added_by", "added_at", "position", "score", "up_count", "down_count"]
+
+
+RANKED_ROOM_MOVIES = ("position", "-score", "-added_at")
+
 
-    def get_score(self, obj):
-        agg = getattr(obj, "votes_sum", None)
-        if agg is not None:
-            return agg
-        return obj.votes.aggregate(s=Sum("value")).get("s") or 0
+def room_prefetches():
+    """
+    Everything RoomSerializer reads, as prefetches: members with user + profile (avatar) in one query,
+    movies in ranking order in another. Use with prefetch_related() on a queryset or
+    prefetch_related_objects() on instances, so serializing N rooms costs a constant number of queries. - KR 16/10/2025
+    """
+    return (
+        Prefetch("memberships", queryset=RoomMembership.objects.select_related("user__profile")),
+        Prefetch("movies", queryset=RoomMovie.objects.order_by(*RANKED_ROOM_MOVIES), to_attr="ranked_movies"),
+    )
 
 
 class RoomSerializer(serializers.ModelSerializer):
@@ -194,8 +212,10 @@ class RoomSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "owner", "invite_code", "created_at", "members", "movies"]
 
     def get_movies(self, room):
-        qs = room.movies.all().annotate(votes_sum=Sum("votes__value")).order_by("position", "-votes_sum", "-added_at")
-        return RoomMovieSerializer(qs, many=True).data
+        movies = getattr(room, "ranked_movies", None)  # set by room_prefetches()
+        if movies is None:
+            movies = room.movies.order_by(*RANKED_ROOM_MOVIES)
+        return RoomMovieSerializer(movies, many=True).data
 
 
 class RoomCreateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,256 @@
+from datetime import date
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+
+from api.models import CatalogMovie, CatalogCertification, CatalogAvailability
+from .certification import CERT_LADDERS, cert_ordinal
+from .mood import TMDB_GENRE_IDS, _PROVIDER_BUCKETS
+from .provider_index import provider_index
+from .tmdb import detail_watch_providers
+
+# Local movie catalog — KR 16/10/2025
+# Ingest: TMDB detail payloads (fresh or from the shared detail cache) -> CatalogMovie + lightest
+# certification per country + (region, provider, monetization) availability rows.
+# Query: the /discover/movie params build_discover_params produces, executed as one indexed ORM query,
+# shaped like collect_discover_pages() so snapshots can come from either source.
+
+CATALOG_GENRE_BITS = {gid: 1 << i for i, gid in enumerate(TMDB_GENRE_IDS)}  # stable; persisted in genre_mask
+
+_LIST_FIELDS = (
+    "id", "title", "original_title", "original_language", "overview", "poster_path", "backdrop_path",
+    "release_date", "popularity", "vote_average", "vote_count", "adult", "video",
+)
+
+_SORT_FIELDS = {
+    "popularity": "popularity",
+    "vote_average": "vote_average",
+    "vote_count": "vote_count",
+    "primary_release_date": "release_date",
+    "release_date": "release_date",
+}
+
+def catalog_genre_mask(ids) -> int:
+    mask = 0
+    for g in ids or ():
+        try:
+            mask |= CATALOG_GENRE_BITS.get(int(g), 0)
+        except (TypeError, ValueError):
+            pass
+    return mask
+
+def _date_or_none(val):
+    try:
+        return date.fromisoformat(val) if val else None
+    except (TypeError, ValueError):
+        return None
+
+def list_shape(detail: dict) -> dict:
+    """A /movie/{id} payload reduced to the /discover result shape (genres -> genre_ids)."""
+    m = {k: detail.get(k) for k in _LIST_FIELDS if k in detail}
+    m["genre_ids"] = [g.get("id") for g in detail.get("genres") or [] if isinstance(g, dict) and g.get("id")]
+    return m
+
+def catalog_rows(detail: dict):
+    """(CatalogMovie, [CatalogCertification], [CatalogAvailability]) for one detail payload (unsaved)."""
+    mid = int(detail["id"])
+    shaped = list_shape(detail)
+    movie = CatalogMovie(
+        tmdb_id=mid,
+        title=(detail.get("title") or "")[:250],
+        original_language=(detail.get("original_language") or "")[:10],
+        release_date=_date_or_none(detail.get("release_date")),
+        runtime=detail.get("runtime") or None,
+        popularity=float(detail.get("popularity") or 0),
+        vote_average=float(detail.get("vote_average") or 0),
+        vote_count=int(detail.get("vote_count") or 0),
+        genre_mask=catalog_genre_mask(shaped["genre_ids"]),
+        adult=bool(detail.get("adult")),
+        data=shaped,
+    )
+
+    lightest = {}
+    for block in (detail.get("release_dates") or {}).get("results", []) or []:
+        country = block.get("iso_3166_1")
+        for rd in block.get("release_dates", []) or []:
+            cert = (rd.get("certification") or "").strip()
+            o = cert_ordinal(country, cert)
+            if o is not None and (country not in lightest or o < lightest[country][1]):
+                lightest[country] = (cert, o)
+    certs = [
+        CatalogCertification(movie_id=mid, country=c, certification=cert[:12], ordinal=o)
+        for c, (cert, o) in lightest.items()
+    ]
+
+    seen, avail = set(), []
+    for region, rb in detail_watch_providers(detail).items():
+        for bucket in _PROVIDER_BUCKETS:
+            for p in (rb or {}).get(bucket) or []:
+                pid = p.get("provider_id")
+                if pid and (region, pid, bucket) not in seen:
+                    seen.add((region, pid, bucket))
+                    avail.append(CatalogAvailability(movie_id=mid, region=region[:2], provider_id=int(pid), monetization=bucket))
+    return movie, certs, avail
+
+@transaction.atomic
+def ingest_details(details) -> int:
+    """Upsert catalog rows for detail payloads; certification/availability rows are replaced wholesale."""
+    movies, certs, avail = [], [], []
+    for d in details:
+        if not d or not d.get("id"):
+            continue
+        m, c, a = catalog_rows(d)
+        movies.append(m)
+        certs.extend(c)
+        avail.extend(a)
+    if not movies:
+        return 0
+
+    ids = [m.tmdb_id for m in movies]
+    CatalogMovie.objects.bulk_create(
+        movies,
+        update_conflicts=True,
+        unique_fields=["tmdb_id"],
+        update_fields=[
+            "title", "original_language", "release_date", "runtime", "popularity",
+            "vote_average", "vote_count", "genre_mask", "adult", "data", "updated_at",
+        ],
+    )
+    CatalogCertification.objects.filter(movie_id__in=ids).delete()
+    CatalogAvailability.objects.filter(movie_id__in=ids).delete()
+    CatalogCertification.objects.bulk_create(certs)
+    CatalogAvailability.objects.bulk_create(avail)
+
+    by_movie = {mid: {} for mid in ids}
+    for a in avail:
+        by_movie[a.movie_id].setdefault(a.region, set()).add(a.provider_id)
+    for mid, providers in by_movie.items():
+        provider_index.observe(mid, providers)
+    return len(movies)
+
+def _split(val, seps=",|"):
+    val = str(val or "")
+    for sep in seps:
+        if sep in val:
+            return sep, [x.strip() for x in val.split(sep) if x.strip()]
+    return "|", [val.strip()] if val.strip() else []
+
+def catalog_queryset(params: dict):
+    """
+    CatalogMovie queryset matching TMDB /discover/movie semantics for the params we send:
+    with_genres ("|" any, "," all), without_genres, certification_country + certification.lte,
+    watch_region + with_watch_monetization_types + with_watch_providers ("|" any, "," all),
+    vote/runtime/date/language filters and include_adult.
+    """
+    qs = CatalogMovie.objects.all()
+
+    if str(params.get("include_adult", "false")).lower() != "true":
+        qs = qs.filter(adult=False)
+
+    if params.get("with_genres"):
+        sep, gids = _split(params["with_genres"])
+        mask = catalog_genre_mask(gids)
+        if not mask:
+            return qs.none()
+        qs = qs.annotate(_inc=F("genre_mask").bitand(mask))
+        qs = qs.filter(_inc=mask) if sep == "," else qs.filter(_inc__gt=0)
+    if params.get("without_genres"):
+        _, gids = _split(params["without_genres"])
+        mask = catalog_genre_mask(gids)
+        if mask:
+            qs = qs.annotate(_exc=F("genre_mask").bitand(mask)).filter(_exc=0)
+
+    country, cap = params.get("certification_country"), params.get("certification.lte")
+    if country and cap:
+        cap_ord = cert_ordinal(country, cap)
+        if cap_ord is None and country.upper() in CERT_LADDERS:
+            return qs.none()
+        if cap_ord is not None:
+            qs = qs.filter(Exists(CatalogCertification.objects.filter(
+                movie=OuterRef("pk"), country=country.upper(), ordinal__lte=cap_ord,
+            )))
+
+    region = params.get("watch_region")
+    if region:
+        avail = CatalogAvailability.objects.filter(movie=OuterRef("pk"), region=region)
+        # TMDB: "|" = any of, "," = all of; each "," item must be met by its own availability row - KR 17/10/2025
+        types_sep, types = _split(params.get("with_watch_monetization_types"))
+        prov_sep, provs = _split(params.get("with_watch_providers"))
+        provs = [int(p) for p in provs if p.isdigit()]
+        type_groups = [[t] for t in types] if types_sep == "," else [types]
+        prov_groups = [[p] for p in provs] if prov_sep == "," else [provs]
+        if types or provs:
+            for tg in type_groups:
+                for pg in prov_groups:
+                    rows = avail
+                    if tg:
+                        rows = rows.filter(monetization__in=tg)
+                    if pg:
+                        rows = rows.filter(provider_id__in=pg)
+                    qs = qs.filter(Exists(rows))
+
+    if params.get("vote_count.gte"):
+        qs = qs.filter(vote_count__gte=int(params["vote_count.gte"]))
+    if params.get("vote_average.gte") not in (None, ""):
+        qs = qs.filter(vote_average__gte=float(params["vote_average.gte"]))
+    if params.get("with_runtime.gte"):
+        qs = qs.filter(runtime__gte=int(params["with_runtime.gte"]))
+    if params.get("with_runtime.lte"):
+        qs = qs.filter(runtime__lte=int(params["with_runtime.lte"]))
+    if _date_or_none(params.get("primary_release_date.gte")):
+        qs = qs.filter(release_date__gte=_date_or_none(params["primary_release_date.gte"]))
+    if _date_or_none(params.get("primary_release_date.lte")):
+        qs = qs.filter(release_date__lte=_date_or_none(params["primary_release_date.lte"]))
+    if params.get("with_original_language"):
+        qs = qs.filter(original_language=params["with_original_language"])
+
+    field, _, direction = str(params.get("sort_by") or "popularity.desc").partition(".")
+    col = _SORT_FIELDS.get(field, "popularity")
+    return qs.order_by(f"-{col}" if direction != "asc" else col, "tmdb_id")
+
+def catalog_discover(params: dict, *, max_pages=5) -> dict:
+    """Same payload shape as collect_discover_pages (top max_pages*20, sorted by (-popularity, id))."""
+    rows = list(catalog_queryset(params).values_list("data", "popularity")[: max_pages * 20])
+    results = []
+    for data, popularity in rows:
+        m = dict(data)
+        m["popularity"] = popularity
+        results.append(m)
+    results.sort(key=lambda m: (-float(m.get("popularity") or 0), int(m.get("id") or 0)))
+    return {"results": results, "page": 1, "total_pages": 1, "total_results": len(results)}
+
+def catalog_details(tmdb_ids) -> dict:
+    """
+    {tmdb_id: detail-shaped payload} for the ids the catalog has: watch/providers, release_dates and
+    _cert_min rebuilt from the catalog rows (one prefetched query, no TMDB). Missing ids are left out.
+    """
+    out = {}
+    movies = CatalogMovie.objects.filter(tmdb_id__in=list(tmdb_ids)).only("tmdb_id").prefetch_related(
+        "certifications", "availability",
+    )
+    for movie in movies:
+        providers = {}
+        for a in movie.availability.all():
+            providers.setdefault(a.region, {}).setdefault(a.monetization, []).append({"provider_id": a.provider_id})
+        certs = list(movie.certifications.all())
+        out[movie.tmdb_id] = {
+            "id": movie.tmdb_id,
+            "watch/providers": {"results": providers},
+            "release_dates": {"results": [
+                {"iso_3166_1": c.country, "release_dates": [{"certification": c.certification}]} for c in certs
+            ]},
+            "_cert_min": {c.country: c.ordinal for c in certs},
+        }
+    return out
+
+def local_snapshot(params: dict, *, max_pages=5):
+    """
+    Snapshot from the local catalog, or None when the catalog is off or too thin for these params
+    (the caller then backfills from TMDB with collect_discover_pages).
+    """
+    if not getattr(settings, "MOOD_CATALOG_ENABLED", False):
+        return None
+    snap = catalog_discover(params, max_pages=max_pages)
+    need = min(getattr(settings, "MOOD_CATALOG_MIN_RESULTS", 40), max_pages * 20)
+    return snap if len(snap["results"]) >= need else None
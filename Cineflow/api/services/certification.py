@@ -0,0 +1,40 @@
+# Certification ordering per country — KR 16/10/2025
+# TMDB certifications are free-text per country; comparing them as strings is meaningless
+# ("R" <= "PG-13" is False only by accident of the alphabet). Each country gets an explicit
+# ladder, lightest first; a certification's ordinal is its index on that ladder.
+
+CERT_LADDERS = {
+    "US": ("G", "PG", "PG-13", "R", "NC-17"),
+    "GB": ("U", "PG", "12A", "12", "15", "18", "R18"),
+    "IE": ("G", "PG", "12A", "15A", "16", "18"),
+    "CA": ("G", "PG", "14A", "18A", "R"),
+    "AU": ("G", "PG", "M", "MA15+", "R18+", "X18+"),
+    "NZ": ("G", "PG", "M", "R13", "R15", "R16", "R18"),
+    "DE": ("0", "6", "12", "16", "18"),
+    "FR": ("U", "10", "12", "16", "18"),
+}
+
+_ORDINALS = {
+    country: {cert.upper(): i for i, cert in enumerate(ladder)}
+    for country, ladder in CERT_LADDERS.items()
+}
+
+def cert_ordinal(country: str, cert: str):
+    """Ordinal of `cert` on `country`'s ladder, or None if unknown (unrated, NR, typos...)."""
+    if not (country and cert):
+        return None
+    return _ORDINALS.get(country.upper(), {}).get(cert.strip().upper())
+
+def min_cert_ordinals(release_dates: dict) -> dict:
+    """
+    {country: lowest known certification ordinal} from a TMDB release_dates block.
+    Computed once per detail payload so scoring is a dict lookup + int compare.
+    """
+    out = {}
+    for block in (release_dates or {}).get("results", []) or []:
+        country = block.get("iso_3166_1")
+        for rd in block.get("release_dates", []) or []:
+            o = cert_ordinal(country, rd.get("certification") or "")
+            if o is not None and (country not in out or o < out[country]):
+                out[country] = o
+    return out
@@ -1,5 +1,12 @@
+import os
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+
 from django.core.cache import cache
-from .tmdb import tmdb_get
+from .tmdb import detail_watch_providers
+from .certification import cert_ordinal, min_cert_ordinals
+from .provider_index import provider_index
 
 # Pinned TMDB IDs per mood  — KR 02/09/2025
 PINNED_BASE = {
@@ -32,12 +39,26 @@ KEYWORDS_BASE = {
 #  Admin-configurable overrides (cache) — KR 17/09/2025
 _OVR_PINS_KEY     = "mood:pins:overrides"
 _OVR_KEYWORDS_KEY = "mood:keywords:overrides"
+_OVR_VERSION_KEY  = "mood:overrides:version"  # bumped on every write; part of ranked-list cache keys
+_OVR_TTL          = 60 * 60 * 24 * 30
 
 def _get_overrides(cache_key: str) -> dict:
     return cache.get(cache_key) or {}
 
 def _set_overrides(cache_key: str, data: dict):
-    cache.set(cache_key, data, 60 * 60 * 24 * 30)
+    cache.set(cache_key, data, _OVR_TTL)
+    bump_overrides_version()
+
+def overrides_version() -> int:
+    return cache.get(_OVR_VERSION_KEY) or 0
+
+def bump_overrides_version() -> int:
+    cache.add(_OVR_VERSION_KEY, 0, None)
+    try:
+        return cache.incr(_OVR_VERSION_KEY)
+    except ValueError:  # evicted between add and incr
+        cache.set(_OVR_VERSION_KEY, 1, None)
+        return 1
 
 def effective_pins_for(mood: str) -> list[int]:
     base = PINNED_BASE.get(mood, [])[:]
@@ -147,111 +168,324 @@ MOOD_RULES = {
     },
 }
 
-def _extract_genre_id_strings(movie: dict) -> set[str]:
-    ids = set()
+# Compact candidate records — KR 16/10/2025
+# Gating/scoring run on small __slots__ records (id, popularity, genre bitmask, provider-id sets per
+# region, lowest certification ordinal per country). The TMDB result dict rides along untouched in `raw` and is only
+# rehydrated for the movies on the page being returned.
+
+_PROVIDER_BUCKETS = ("flatrate", "ads", "free", "rent", "buy")
+
+# TMDB movie genre ids -> bit; unknown ids get the next free bit on first sight.
+# The bits of TMDB_GENRE_IDS are stable (the local catalog persists them); lazily added ones are per-process.
+TMDB_GENRE_IDS = (28, 12, 16, 35, 80, 99, 18, 10751, 14, 36, 27, 10402, 9648, 10749, 878, 10770, 53, 10752, 37)
+_GENRE_BITS = {gid: 1 << i for i, gid in enumerate(TMDB_GENRE_IDS)}
+_genre_bits_lock = threading.Lock()
+
+def genre_bit(gid) -> int:
+    gid = int(gid)
+    bit = _GENRE_BITS.get(gid)
+    if bit is None:
+        with _genre_bits_lock:
+            bit = _GENRE_BITS.setdefault(gid, 1 << len(_GENRE_BITS))
+    return bit
+
+def genre_mask(ids) -> int:
+    mask = 0
+    for g in ids or ():
+        try:
+            mask |= genre_bit(g)
+        except (TypeError, ValueError):
+            pass
+    return mask
+
+def movie_genre_mask(movie: dict) -> int:
     if isinstance(movie.get("genre_ids"), list):
-        for g in movie["genre_ids"]:
-            try:
-                ids.add(str(int(g)))
-            except Exception:
-                pass
-    elif isinstance(movie.get("genres"), list):
-        for g in movie["genres"]:
-            try:
-                ids.add(str(int(g.get("id"))))
-            except Exception:
-                pass
-    return ids
+        return genre_mask(movie["genre_ids"])
+    if isinstance(movie.get("genres"), list):
+        return genre_mask(g.get("id") for g in movie["genres"] if isinstance(g, dict))
+    return 0
 
-def passes_genre_gate(mood_key: str, movie: dict) -> bool:
+def provider_sets(watch_providers: dict) -> dict:
+    """{region: frozenset(provider_id)} from a TMDB watch/providers `results` block."""
+    out = {}
+    for region, rb in (watch_providers or {}).items():
+        if not rb:
+            continue
+        ids = set()
+        for key in _PROVIDER_BUCKETS:
+            for p in rb.get(key) or []:
+                if p.get("provider_id"):
+                    ids.add(int(p["provider_id"]))
+        out[region] = frozenset(ids)
+    return out
+
+class MoodCandidate:
+    __slots__ = ("id", "popularity", "genre_mask", "providers", "cert_min", "raw")
+
+    def __init__(self, raw: dict):
+        self.raw = raw
+        self.id = raw.get("id")
+        self.popularity = float(raw.get("popularity") or 0.0)
+        self.genre_mask = movie_genre_mask(raw)
+        self.providers = None  # {region: frozenset} once enriched
+        self.cert_min = None   # {country: lowest cert ordinal} once enriched
+
+    @classmethod
+    def from_movie(cls, movie: dict) -> "MoodCandidate":
+        """Build from a (possibly already enriched) result dict."""
+        c = cls(movie)
+        if movie.get("watch_providers"):
+            c.providers = provider_sets(movie["watch_providers"])
+        if movie.get("_detail"):
+            c.cert_min = min_cert_ordinals(movie["_detail"].get("release_dates"))
+        return c
+
+    def attach_detail(self, detail: dict):
+        self.providers = provider_sets(detail_watch_providers(detail))
+        provider_index.observe(self.id, self.providers)
+        cert_min = detail.get("_cert_min")  # precomputed when the detail was cached
+        self.cert_min = cert_min if cert_min is not None else min_cert_ordinals(detail.get("release_dates"))
+
+    def providers_in(self, region: str):
+        """Provider ids in `region` (US fallback), or None if never enriched."""
+        if self.providers is None:
+            return None
+        have = self.providers.get(region)
+        return have if have is not None else self.providers.get("US", frozenset())
+
+    def hydrate(self, detail: dict | None = None) -> dict:
+        """Card dict for the response (enrichment blocks attached from the movie detail)."""
+        m = dict(self.raw)
+        if detail:
+            m["_detail"] = {"release_dates": (detail.get("release_dates") or {})}
+            m["watch_providers"] = detail_watch_providers(detail)
+        return m
+
+def _parse_provider_ids(providers_csv: str) -> set[int]:
+    return {int(x) for x in (providers_csv or "").split("|") if x.strip().isdigit()}
+
+# Compiled mood rules — KR 16/10/2025
+# MOOD_RULES stays the hand-edited source of truth. Hot paths read these immutable compiled views
+# (int genre ids/bitmasks, cert cap, pins as a set, mood part of the discover params) so the per-movie
+# loops do no parsing. Genre parts are compiled at import; pins are rebuilt when overrides_version() moves.
+
+@dataclass(frozen=True, slots=True)
+class CompiledMood:
+    key: str
+    include_ids: frozenset
+    exclude_ids: frozenset
+    include_mask: int
+    exclude_mask: int
+    score_include_mask: int  # include_mask only when the gate is enforced (soft +16)
+    enforce_gate: bool
+    feelgood: bool
+    cert_country: str | None
+    cert_lte: str | None
+    cert_lte_ord: int | None  # cap as an ordinal on cert_country's ladder
+    min_votes_floor: int
+    pins: frozenset
+    pins_order: tuple
+    discover_template: MappingProxyType
+
+def _int_ids(values) -> frozenset:
+    out = set()
+    for g in values or ():
+        try:
+            out.add(int(g))
+        except (TypeError, ValueError):
+            pass
+    return frozenset(out)
+
+def _merge_pins(base, override) -> tuple:
+    seen, out = set(), []
+    for mid in list(override or []) + list(base or []):
+        if mid not in seen:
+            seen.add(mid)
+            out.append(mid)
+    return tuple(out)
+
+def compile_mood(mood_key: str, rules: dict, pins=()) -> CompiledMood:
+    include = rules.get("include_genres_any") or []
+    exclude = rules.get("exclude_genres") or []
+    enforce = bool(rules.get("enforce_genre_gate"))
+    cert_country = rules.get("cert_country") or None
+    cert_lte     = rules.get("cert_lte") or None
+
+    tpl = {"sort_by": rules.get("sort_by", "popularity.desc"), "include_adult": "false"}
+    if include:
+        tpl["with_genres"] = "|".join(str(g) for g in include)
+    if exclude:
+        tpl["without_genres"] = ",".join(str(g) for g in exclude)
+    if cert_country and cert_lte:
+        tpl["certification_country"] = cert_country
+        tpl["certification.lte"]     = cert_lte
+
+    pins = tuple(pins)
+    return CompiledMood(
+        key=mood_key,
+        include_ids=_int_ids(include),
+        exclude_ids=_int_ids(exclude),
+        include_mask=genre_mask(include),
+        exclude_mask=genre_mask(exclude),
+        score_include_mask=genre_mask(include) if enforce else 0,
+        enforce_gate=enforce,
+        feelgood=mood_key == "feelgood",
+        cert_country=cert_country,
+        cert_lte=cert_lte,
+        cert_lte_ord=cert_ordinal(cert_country, cert_lte) if (cert_country and cert_lte) else None,
+        min_votes_floor=int(rules.get("min_votes_floor") or 0),
+        pins=frozenset(pins),
+        pins_order=pins,
+        discover_template=MappingProxyType(tpl),
+    )
+
+def _compile_all(pins_overrides: dict) -> dict:
+    return {
+        k: compile_mood(k, rules, _merge_pins(PINNED_BASE.get(k, []), pins_overrides.get(k)))
+        for k, rules in MOOD_RULES.items()
+    }
+
+# (overrides version, {mood: CompiledMood}); version None = import-time build without overrides
+_compiled = (None, _compile_all({}))
+_compiled_lock = threading.Lock()
+
+def compiled_mood(mood_key: str, *, refresh: bool = True) -> CompiledMood:
     """
-    Strict genre gate: must include any allowed; must NOT include any excluded. - KR 19/09/2025
+    Compiled rules for a mood. `refresh=False` skips the overrides-version read (fine for genre-only
+    callers such as the gate; pins may lag until the next refreshing call).
     """
-    rules = MOOD_RULES.get(mood_key) or {}
-    exc = set(rules.get("exclude_genres") or [])
-    gids = _extract_genre_id_strings(movie)
-    if exc and (gids & exc):  # respects excludes - KR 23/09/2025
+    global _compiled
+    version, moods = _compiled
+    if refresh:
+        current = overrides_version()
+        if current != version:
+            with _compiled_lock:
+                if _compiled[0] != current:
+                    _compiled = (current, _compile_all(_get_overrides(_OVR_PINS_KEY)))
+                version, moods = _compiled
+    cm = moods.get(mood_key)
+    if cm is not None:
+        return cm
+    rules = MOOD_RULES.get(mood_key)
+    if rules is None:  # unknown mood: neutral rules, never added to the shared table
+        return compile_mood(mood_key, {}, PINNED_BASE.get(mood_key, []))
+    with _compiled_lock:  # mood registered after import: publish a new table, never mutate the shared one
+        version, moods = _compiled
+        cm = moods.get(mood_key)
+        if cm is None:
+            cm = compile_mood(mood_key, rules, PINNED_BASE.get(mood_key, []))
+            _compiled = (version, {**moods, mood_key: cm})
+    return cm
+
+def _gate(rule: CompiledMood, gmask: int) -> bool:
+    if rule.exclude_mask and (gmask & rule.exclude_mask):  # respects excludes - KR 23/09/2025
         return False
-    if not rules.get("enforce_genre_gate"):
+    if not rule.enforce_gate:
         return True
-    inc = set(rules.get("include_genres_any") or [])
-    if not gids:
+    if not gmask:
         return False
-    if inc and not (gids & inc):
+    if rule.include_mask and not (gmask & rule.include_mask):
         return False
     return True
 
-def filter_by_providers(results, *, region: str, providers_csv: str, limit_checks: int = 60):
+def passes_genre_gate(mood_key: str, movie: dict) -> bool:
+    """
+    Strict genre gate: must include any allowed; must NOT include any excluded. - KR 19/09/2025
+    """
+    return _gate(compiled_mood(mood_key, refresh=False), movie_genre_mask(movie))
+
+def candidate_passes_gate(mood_key: str, cand: MoodCandidate) -> bool:
+    return _gate(compiled_mood(mood_key, refresh=False), cand.genre_mask)
+
+def filter_candidates_by_providers(cands, *, region: str, providers_csv: str):
     """
     Hard gate: keep only movies that actually have *any* of the selected providers in the given region.
     - `providers_csv` is pipe-joined TMDB ids (e.g. "8|337|9").
-    - Only first `limit_checks` verified via /movie/{id}?append_to_response=watch/providers.  KR 20/09/2025
+    - Enriched candidates use their own providers; the rest are set lookups in the provider index
+      (no network, no check cap). Ids the index doesn't know yet are kept and indexed in the background.  KR 16/10/2025
     """
-    if not providers_csv:
-        return results
-
-    want_ids = set()
-    for token in providers_csv.split("|"):
-        token = token.strip()
-        if token.isdigit():
-            want_ids.add(int(token))
+    want_ids = _parse_provider_ids(providers_csv)
     if not want_ids:
-        return results
+        return cands
 
-    kept, checked = [], 0
-    for m in results:
-        mid = m.get("id")
-        if not mid:
+    provider_index.ensure_refresher()
+    matches = provider_index.matching(region, want_ids)
+    kept, unknown, indexed = [], [], []
+    for c in cands:
+        if not c.id:
             continue
-
-        have_ids = None
-        wp = (m.get("watch_providers") or {})
-        if wp:
-            rb = wp.get(region) or wp.get("US") or {}
-            buckets = []
-            for key in ("flatrate", "ads", "free", "rent", "buy"):
-                buckets.extend(rb.get(key) or [])
-            have_ids = {int(p.get("provider_id")) for p in buckets if p.get("provider_id")}
-
-        if have_ids is None and checked < limit_checks:
-            detail, err = tmdb_get(f"/movie/{mid}", {"append_to_response": "watch/providers"})
-            checked += 1
-            if err or not detail:
-                continue
-            wp = (detail.get("watch/providers") or {}).get("results", {})
-            rb = wp.get(region) or wp.get("US") or {}
-            buckets = []
-            for key in ("flatrate", "ads", "free", "rent", "buy"):
-                arr = rb.get(key) or []
-                if arr:
-                    buckets.extend(arr)
-            have_ids = {int(p.get("provider_id")) for p in buckets if p.get("provider_id")}
-
-        if have_ids is None:
-            kept.append(m)
-        elif have_ids & want_ids:
-            kept.append(m)
+        if c.providers is not None:
+            if c.providers_in(region) & want_ids:
+                kept.append(c)
+        elif provider_index.knows(c.id):
+            indexed.append(c.id)
+            if c.id in matches:
+                kept.append(c)
+        else:
+            kept.append(c)
+            unknown.append(c.id)
+    provider_index.enqueue(indexed)  # only re-queues entries past their TTL
+    if unknown:
+        provider_index.enqueue(unknown)
     return kept
 
 
 # Soft re-ranker (NEW) - KR 04/10/2025
 
-def _cert_bucket(detail: dict, rules: dict) -> int:
-    """Lower is 'lighter'. Small bonus for ≤ certification cap if present."""
-    cert_country = rules.get("cert_country")
-    cert_lte     = rules.get("cert_lte")
-    if not (cert_country and cert_lte):
-        return 0
-    rels = (detail or {}).get("release_dates", {}).get("results", [])
-    for block in rels:
-        if block.get("iso_3166_1") == cert_country:
-            for rd in block.get("release_dates", []) or []:
-                cert = (rd.get("certification") or "").strip()
-                if cert and cert <= cert_lte:
-                    return 2
-    return 0
+def cert_allowed(rule: CompiledMood, cert_min: dict | None) -> bool:
+    """Hard cap: False only when the movie's lightest known cert in the cap country is above the cap."""
+    if rule.cert_lte_ord is None or not cert_min:
+        return True
+    o = cert_min.get(rule.cert_country)
+    return o is None or o <= rule.cert_lte_ord
+
+def filter_candidates_by_cert(mood_key: str, cands: list) -> list:
+    """Drop candidates whose known certification exceeds the mood cap (unknown / un-enriched are kept)."""
+    rule = compiled_mood(mood_key, refresh=False)
+    if rule.cert_lte_ord is None:
+        return cands
+    return [c for c in cands if cert_allowed(rule, c.cert_min)]
 
-def rerank_for_mood(mood_key: str, items: list[dict], *, region="GB", providers_csv="", broad=False):
+_LIGHT_MASK = genre_mask((35, 10751, 16, 12, 10402, 10749))
+_DRAMA_BIT  = genre_bit(18)
+
+def score_candidates(mood_key: str, cands: list, *, region="GB", providers_csv="", broad=False) -> list[float]:
+    """
+    Score every candidate in one columnar pass (same weights as rerank_candidates documents).
+    Genre terms are pure bitmask tests against the compiled mood; popularity is a single column.
+    """
+    rule      = compiled_mood(mood_key)
+    pins      = rule.pins
+    want_prov = _parse_provider_ids(providers_csv) if (broad and providers_csv) else set()
+    exc_mask, inc_mask, feelgood = rule.exclude_mask, rule.score_include_mask, rule.feelgood
+
+    ids   = [c.id for c in cands]
+    masks = [c.genre_mask for c in cands]
+    pops  = [min(c.popularity * 0.002, 3.0) for c in cands]
+
+    base = [
+        (50 if mid in pins else 0)
+        - (18 if g & exc_mask else 0)
+        + (16 if g & inc_mask else 0)
+        - (6 if feelgood and (g & _DRAMA_BIT) and not (g & _LIGHT_MASK) else 0)
+        for mid, g in zip(ids, masks)
+    ]
+    if want_prov:
+        indexed = provider_index.matching(region, want_prov)
+        for i, c in enumerate(cands):
+            have = c.providers_in(region)
+            if (have & want_prov) if have is not None else (c.id in indexed):
+                base[i] += 10
+    if rule.cert_lte_ord is not None:
+        cap, country = rule.cert_lte_ord, rule.cert_country
+        for i, c in enumerate(cands):
+            o = c.cert_min.get(country) if c.cert_min else None
+            if o is not None and o <= cap:
+                base[i] += 2
+
+    return [b + p for b, p in zip(base, pops)]
+
+def rerank_candidates(mood_key: str, cands: list, *, region="GB", providers_csv="", broad=False) -> list:
     """
     Re-rank WITHOUT removing:
     +50 pinned
@@ -260,52 +494,11 @@ def rerank_for_mood(mood_key: str, items: list[dict], *, region="GB", providers_
     +10 has any selected provider (if providers chosen) — only when `broad=True`
     +2  certification ≤ cap (for light moods with caps)
     A gentle extra nudge for 'feelgood' to push heavy drama w/o 'light' genres down.
+    Ties keep their input order (stable sort), exactly as before.
     """
-    pins      = set(effective_pins_for(mood_key))
-    rules     = MOOD_RULES.get(mood_key) or {}
-    want_prov = {int(x) for x in providers_csv.split("|") if x.strip().isdigit()} if providers_csv else set()
-
-    scored = []
-    for m in items:
-        score = 0
-        mid   = m.get("id")
-
-        # pins
-        if mid in pins:
-            score += 50
-
-        # genre softness
-        gids = _extract_genre_id_strings(m)
-        exc  = set(rules.get("exclude_genres") or [])
-        inc  = set(rules.get("include_genres_any") or [])
-        if gids & exc:
-            score -= 18
-        if rules.get("enforce_genre_gate") and (gids & inc):
-            score += 16
-
-        if mood_key == "feelgood":
-            light = {"35", "10751", "16", "12", "10402", "10749"}
-            if ("18" in gids) and not (gids & light):
-                score -= 6
-
-        if broad and want_prov:
-            rb = (m.get("watch_providers") or {}).get(region) or (m.get("watch_providers") or {}).get("US") or {}
-            buckets = []
-            for key in ("flatrate", "ads", "free", "rent", "buy"):
-                buckets.extend(rb.get(key) or [])
-            have = {int(p.get("provider_id")) for p in buckets if p.get("provider_id")}
-            if have & want_prov:
-                score += 10
-
-        score += _cert_bucket(m.get("_detail") or {}, rules)
-
-        pop = float(m.get("popularity") or 0.0)
-        score += min(pop * 0.002, 3.0)
-
-        scored.append((score, m))
-
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [m for _, m in scored]
+    scores = score_candidates(mood_key, cands, region=region, providers_csv=providers_csv, broad=broad)
+    order = sorted(range(len(cands)), key=scores.__getitem__, reverse=True)
+    return [cands[i] for i in order]
 
 
 
@@ -321,34 +514,20 @@ def build_discover_params(
     - Applies optional filters (decade/year range, rating, votes, runtime, lang, sort).
     - Applies mood-level certification cap and min_votes floor where defined. — KR 19/09/2025
     """
-    rules = MOOD_RULES.get(mood_key) or {}
+    rule = compiled_mood(mood_key, refresh=False)
     filters = filters or {}
 
-    include_any = rules.get("include_genres_any") or []
-    with_genres = "|".join(include_any) if include_any else None
-    exclude = ",".join(rules.get("exclude_genres", [])) or None
-
+    # Mood part (genre OR gate, excludes, sort, certification cap) is pre-built on the compiled rule
     p = {
         "watch_region": region,
-        "with_watch_monetization_types": types,
-        "sort_by": rules.get("sort_by", "popularity.desc"),
+        # UI sends a comma list meaning "any of"; TMDB reads "," as all-of, "|" as any-of - KR 17/10/2025
+        "with_watch_monetization_types": (types or "").replace(",", "|"),
         "page": page,
-        "include_adult": "false",
+        **rule.discover_template,
     }
-    if with_genres:
-        p["with_genres"] = with_genres
-    if exclude:
-        p["without_genres"] = exclude
     if providers:
         p["with_watch_providers"] = providers
 
-    # Mood-level certification caps (light moods)
-    cert_country = rules.get("cert_country")
-    cert_lte     = rules.get("cert_lte")
-    if cert_country and cert_lte:
-        p["certification_country"] = cert_country
-        p["certification.lte"]     = cert_lte
-
     # Filters from request
     if filters.get("year_from"):
         p["primary_release_date.gte"] = f"{filters['year_from']}-01-01"
@@ -358,7 +537,7 @@ def build_discover_params(
         p["vote_average.gte"] = str(filters["vote_average_gte"])
 
     req_min_votes = filters.get("min_votes") or 0
-    mood_floor    = rules.get("min_votes_floor") or 0
+    mood_floor    = rule.min_votes_floor
     min_votes     = max(req_min_votes, mood_floor)
     if min_votes:
         p["vote_count.gte"] = str(min_votes)
@@ -374,6 +553,67 @@ def build_discover_params(
 
     return p
 
+# Daily snapshots (shared by mood_discover, mood_refresh_snapshot and the pre-warmer) - KR 15/10/2025
+WIDE_MONETIZATION = "ads|buy|flatrate|free|rent"
+SNAPSHOT_MAX_PAGES = int(os.environ.get("MOOD_SNAPSHOT_PAGES", "5"))  # deeper snapshots are cheap to score
+ENRICH_N = 60
+
+DEFAULT_FILTERS = {
+    "year_from": None, "year_to": None, "vote_average_gte": None,
+    "min_votes": None, "runtime_gte": None, "runtime_lte": None,
+    "lang": None, "sort_by": None,
+}
+
+def snapshot_base_params(mood_key: str, *, region="GB", providers="", types="flatrate,ads,free",
+                         broad=False, filters: dict | None = None) -> dict:
+    """Discover params for a mood snapshot (monetization widened when broad / provider-locked)."""
+    base = build_discover_params(
+        mood_key, region=region, providers=providers, types=types, page=1, filters=filters
+    )
+    if broad or providers:
+        base = dict(base)
+        base["with_watch_monetization_types"] = WIDE_MONETIZATION
+    return base
+
+def snapshot_variants(base: dict) -> list[tuple[str, dict]]:
+    """Strict snapshot + widened-monetization variant, in merge order."""
+    wide = dict(base)
+    wide["with_watch_monetization_types"] = WIDE_MONETIZATION
+    return [("strict", dict(base)), ("strict_wide", wide)]
+
+def snapshot_key(bucket_name: str, mood_key: str, region: str, par: dict, filters: dict | None = None) -> str:
+    f = filters or {}
+    ftag = (
+        f"y{f.get('year_from','-')}-{f.get('year_to','-')}"
+        f"-rt{f.get('runtime_gte','-')}-{f.get('runtime_lte','-')}"
+        f"-mv{f.get('min_votes','-')}-lg{f.get('lang','-')}"
+        f"-sb{f.get('sort_by','-')}-va{f.get('vote_average_gte','-')}"
+    )
+    return (
+        f"snap4:{bucket_name}:{mood_key}:{region}:"
+        f"{par.get('with_watch_providers','-')}:"
+        f"{par.get('with_watch_monetization_types','-')}:{ftag}:v2"
+    )
+
+def merge_snapshot_candidates(mood_key: str, snapshots) -> list["MoodCandidate"]:
+    """
+    Concatenate snapshot results, dedupe by id and apply the strict genre gate.
+    Returns compact MoodCandidate records; the (possibly shared, L1-cached) snapshot dicts are never mutated.
+    """
+    rule = compiled_mood(mood_key, refresh=False)
+    seen, candidates = set(), []
+    for snap in snapshots:
+        for m in (snap or {}).get("results") or []:
+            mid = m.get("id")
+            if not mid or mid in seen:
+                continue
+            c = MoodCandidate(m)
+            if not _gate(rule, c.genre_mask):
+                continue
+            seen.add(mid)
+            candidates.append(c)
+    return candidates
+
 # expose setters for admin endpoints
 def set_pins_overrides(patch: dict):
     pins_ov = _get_overrides(_OVR_PINS_KEY)
@@ -0,0 +1,126 @@
+import re
+
+from django.conf import settings
+
+from .palette_engine import extract_palette, extract_palette_or_none
+from .tmdb import cache_get_many, cache_set_many, concurrent_map, tmdb_session
+
+# Poster palettes — KR 16/10/2025
+# A poster file never changes under the same TMDB file name, so its palette is computed once and kept:
+# shared cache (keyed by file name, whatever size was requested) with the PosterPalette table behind it.
+# Computing (download + extract) touches neither, so it can run on any thread / process.
+# Request paths extract inline (posters are w92, ~ms each); only `manage.py precompute_palettes` uses a
+# process pool, so web workers never start pool processes of their own.
+
+PALETTE_TTL = 60 * 60 * 24 * 30
+PALETTE_SOURCE_SIZE = "w92"   # smallest TMDB poster size; plenty for 3 swatches
+PALETTE_BATCH_MAX = 60
+PALETTE_VERSION = 2           # bump when extraction changes; 2 = w92 median cut (0014 cleared the v1 rows)
+
+# "/t/p/<size>/<file>" as the endpoint takes it, or the bare "/<file>" TMDB returns as poster_path
+_TMDB_IMAGE_RE = re.compile(r"^/t/p/(original|w500|w780|w342|w154|w92)/([A-Za-z0-9._-]+)$")
+_TMDB_FILE_RE = re.compile(r"^/([A-Za-z0-9._-]+)$")
+
+
+class PosterNotImage(Exception):
+    def __init__(self, ctype=""):
+        super().__init__(f"TMDB did not return an image ({ctype})")
+        self.ctype = ctype
+
+
+def poster_file(path: str):
+    """TMDB image file name for a sized or bare poster path, or None if the path isn't one."""
+    m = _TMDB_IMAGE_RE.match(path or "")
+    if m:
+        return m.group(2)
+    m = _TMDB_FILE_RE.match(path or "")
+    return m.group(1) if m else None
+
+def poster_url(path: str) -> str:
+    """Always the small rendition, whatever size the caller asked about (palette is size-independent)."""
+    return f"https://image.tmdb.org/t/p/{PALETTE_SOURCE_SIZE}/{poster_file(path)}"
+
+def palette_key(file_name: str) -> str:
+    return f"palette:{file_name}:v{PALETTE_VERSION}"
+
+def fetch_poster(path: str) -> bytes:
+    """Small rendition of the poster. Raises PosterNotImage or requests errors."""
+    r = tmdb_session().get(poster_url(path), timeout=8)
+    r.raise_for_status()
+    ctype = r.headers.get("Content-Type", "")
+    if "image" not in ctype:
+        raise PosterNotImage(ctype)
+    return r.content
+
+def compute_palette(path: str) -> list:
+    """Download + extract (no cache / DB access). Raises PosterNotImage or requests errors."""
+    return extract_palette(fetch_poster(path))
+
+def cached_palettes(file_names) -> dict:
+    """{file: palette} for files already known (cache first, then the persisted table)."""
+    files = list(dict.fromkeys(f for f in file_names if f))
+    hits = cache_get_many([palette_key(f) for f in files])
+    found = {f: hits[palette_key(f)] for f in files if hits.get(palette_key(f))}
+
+    missing = [f for f in files if f not in found]
+    if missing and getattr(settings, "POSTER_PALETTE_PERSIST", True):
+        from api.models import PosterPalette
+
+        rows = dict(PosterPalette.objects.filter(file_path__in=missing).values_list("file_path", "palette"))
+        if rows:
+            cache_set_many({palette_key(f): p for f, p in rows.items()}, PALETTE_TTL)
+            found.update(rows)
+    return found
+
+def store_palettes(palettes: dict):
+    """Persist {file: palette} to the cache (and the table)."""
+    if not palettes:
+        return
+    cache_set_many({palette_key(f): p for f, p in palettes.items()}, PALETTE_TTL)
+    if getattr(settings, "POSTER_PALETTE_PERSIST", True):
+        from api.models import PosterPalette
+
+        PosterPalette.objects.bulk_create(
+            [PosterPalette(file_path=f, palette=p) for f, p in palettes.items()],
+            ignore_conflicts=True,
+        )
+
+def get_palette(path: str) -> list:
+    """Read-through palette for one poster path."""
+    file_name = poster_file(path)
+    hit = cached_palettes([file_name]).get(file_name)
+    if hit:
+        return hit
+    palette = compute_palette(path)
+    store_palettes({file_name: palette})
+    return palette
+
+def get_palettes_many(paths) -> dict:
+    """
+    {path: palette or None} for many poster paths, sharing the single-path cache.
+    Misses are downloaded concurrently and extracted inline, then stored in one go.
+    """
+    files = {p: poster_file(p) for p in dict.fromkeys(paths)}
+    known = cached_palettes(files.values())
+
+    todo = list(dict.fromkeys(f for f in files.values() if f and f not in known))
+    path_for = {}
+    for p, f in files.items():
+        path_for.setdefault(f, p)
+
+    def _fetch(f):
+        try:
+            return fetch_poster(path_for[f])
+        except Exception:
+            return None
+
+    contents = dict(zip(todo, concurrent_map(_fetch, todo)))
+    ready = [f for f in todo if contents[f]]
+    extracted = map(extract_palette_or_none, [contents[f] for f in ready])
+
+    fresh = {f: palette for f, palette in zip(ready, extracted) if palette}
+    store_palettes(fresh)
+
+    known.update(fresh)
+    return {p: known.get(f) for p, f in files.items()}
+
@@ -0,0 +1,38 @@
+from io import BytesIO
+
+from PIL import Image
+
+# Palette engine — KR 16/10/2025
+# Pure CPU, PIL only: no Django / cache imports, so it is cheap to load in process-pool workers.
+
+PALETTE_SWATCHES = 3
+PALETTE_SAMPLE = (64, 96)     # poster aspect, ~6k pixels
+PALETTE_LEVELS = 8            # median-cut boxes before picking the most populated ones
+PALETTE_KMEANS = 3            # k-means passes seeded from the median-cut boxes (deterministic)
+
+def extract_palette(content: bytes) -> list:
+    """
+    Dominant colours straight from the decoded buffer: JPEG draft-mode decode, downscale to
+    PALETTE_SAMPLE, then PIL's median cut refined by a few k-means passes (seeded from the cut, so
+    deterministic; all in C) instead of a PNG re-encode + ColorThief's pure-Python pass.
+    Swatches are the most populated clusters, most common first.
+    """
+    img = Image.open(BytesIO(content))
+    img.draft("RGB", PALETTE_SAMPLE)  # JPEG: let the decoder scale down (no-op for other formats)
+    img = img.convert("RGB")
+    img.thumbnail(PALETTE_SAMPLE, Image.Resampling.BILINEAR)
+
+    quantized = img.quantize(colors=PALETTE_LEVELS, method=Image.Quantize.MEDIANCUT, kmeans=PALETTE_KMEANS)
+    flat = quantized.getpalette() or []
+    counts = sorted(quantized.getcolors(PALETTE_LEVELS) or [], key=lambda c: (-c[0], c[1]))
+    palette = [flat[i * 3:i * 3 + 3] for _, i in counts][:PALETTE_SWATCHES]
+    while len(palette) < 2:
+        palette.append([20, 20, 20])
+    return palette
+
+def extract_palette_or_none(content: bytes):
+    """Pool-safe variant: one undecodable poster must not fail the whole batch."""
+    try:
+        return extract_palette(content)
+    except Exception:
+        return None
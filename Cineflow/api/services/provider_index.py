@@ -0,0 +1,179 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection
+
+# Inverted provider-availability index — KR 16/10/2025
+# (region, provider_id) -> {tmdb_id}, kept in process. Fed from:
+#   - every detail payload a MoodCandidate is enriched with (attach_detail -> observe),
+#   - a background worker that indexes ids the gate saw but didn't know yet (through the shared
+#     movie-detail cache, so mostly cache reads),
+#   - a periodic background reload of the local catalog's availability rows (when the catalog is on).
+# Request paths only intersect sets: no TMDB calls, no per-request check cap.
+# Same region rule as MoodCandidate.providers_in: a movie with no block for the region is judged on its
+# US block. Entries expire after PROVIDER_INDEX_TTL (still served, but re-queued) and the index keeps at
+# most PROVIDER_INDEX_MAX movies (least recently observed are dropped).
+
+PROVIDER_INDEX_REFRESH = int(os.environ.get("PROVIDER_INDEX_REFRESH", "900"))  # catalog reload period (s)
+PROVIDER_INDEX_BATCH = int(os.environ.get("PROVIDER_INDEX_BATCH", "50"))     # ids per background fetch
+PROVIDER_INDEX_TTL = int(os.environ.get("PROVIDER_INDEX_TTL", str(6 * 60 * 60)))  # same as MOVIE_DETAIL_TTL
+PROVIDER_INDEX_MAX = int(os.environ.get("PROVIDER_INDEX_MAX", "50000"))
+FALLBACK_REGION = "US"
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_key = {}     # (region, provider_id) -> set(tmdb_id)
+        self._by_region = {}  # region -> set(tmdb_id) that have a block for it (decides the US fallback)
+        self._by_movie = OrderedDict()  # tmdb_id -> (observed_at, regions, keys); oldest first
+        self._pending = set()
+        self._queue = queue.Queue()
+        self._worker = None
+        self._refresher = None
+
+    def observe(self, tmdb_id, providers: dict):
+        """Record a movie's availability ({region: iterable of provider ids}); replaces what was known."""
+        if not tmdb_id:
+            return
+        providers = providers or {}
+        regions = frozenset(providers)
+        keys = frozenset((region, int(pid)) for region, pids in providers.items() for pid in pids)
+        with self._lock:
+            self._pending.discard(tmdb_id)
+            self._forget(tmdb_id)
+            for k in keys:
+                self._by_key.setdefault(k, set()).add(tmdb_id)
+            for region in regions:
+                self._by_region.setdefault(region, set()).add(tmdb_id)
+            self._by_movie[tmdb_id] = (time.monotonic(), regions, keys)
+            while len(self._by_movie) > PROVIDER_INDEX_MAX:
+                self._forget(next(iter(self._by_movie)))
+
+    def _forget(self, tmdb_id):
+        """Drop a movie from every set (caller holds the lock)."""
+        entry = self._by_movie.pop(tmdb_id, None)
+        if entry is None:
+            return
+        _, regions, keys = entry
+        for k in keys:
+            ids = self._by_key.get(k)
+            if ids is not None:
+                ids.discard(tmdb_id)
+                if not ids:
+                    del self._by_key[k]
+        for region in regions:
+            ids = self._by_region.get(region)
+            if ids is not None:
+                ids.discard(tmdb_id)
+                if not ids:
+                    del self._by_region[region]
+
+    def knows(self, tmdb_id) -> bool:
+        return tmdb_id in self._by_movie
+
+    def stale(self, tmdb_ids) -> list:
+        """Ids whose entry is older than PROVIDER_INDEX_TTL (still usable, due a refresh)."""
+        cutoff = time.monotonic() - PROVIDER_INDEX_TTL
+        with self._lock:
+            return [mid for mid in tmdb_ids if mid in self._by_movie and self._by_movie[mid][0] < cutoff]
+
+    def matching(self, region: str, provider_ids) -> frozenset:
+        """Ids available in `region` on any of `provider_ids` (US block when a movie has none for `region`)."""
+        with self._lock:
+            out, fallback = set(), set()
+            for pid in provider_ids:
+                out |= self._by_key.get((region, int(pid)), set())
+                if region != FALLBACK_REGION:
+                    fallback |= self._by_key.get((FALLBACK_REGION, int(pid)), set())
+            out |= fallback - self._by_region.get(region, set())
+        return frozenset(out)
+
+    def enqueue(self, tmdb_ids):
+        """Index these ids in the background (skips freshly known / already queued ones)."""
+        cutoff = time.monotonic() - PROVIDER_INDEX_TTL
+        with self._lock:
+            fresh = [
+                mid for mid in tmdb_ids
+                if mid and mid not in self._pending
+                and (mid not in self._by_movie or self._by_movie[mid][0] < cutoff)
+            ]
+            self._pending.update(fresh)
+        if not fresh:
+            return
+        for mid in fresh:
+            self._queue.put(mid)
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._work, name="provider-index", daemon=True)
+            self._worker.start()
+
+    def _work(self):
+        from .mood import provider_sets
+        from .tmdb import get_movie_details_many, detail_watch_providers
+
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < PROVIDER_INDEX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                for mid, (detail, err) in zip(batch, get_movie_details_many(batch)):
+                    if not err and detail:
+                        self.observe(mid, provider_sets(detail_watch_providers(detail)))
+            except Exception:  # keep the worker alive; these ids are queued again on their next miss
+                logger.exception("provider index fetch failed for %s", batch)
+            finally:
+                with self._lock:
+                    self._pending.difference_update(batch)  # failures may be queued again later
+
+    def load_catalog(self) -> int:
+        """Rebuild availability for every catalog movie from CatalogAvailability rows."""
+        from api.models import CatalogAvailability, CatalogMovie
+
+        avail = {mid: {} for mid in CatalogMovie.objects.values_list("tmdb_id", flat=True).iterator()}
+        for mid, region, pid in CatalogAvailability.objects.values_list("movie_id", "region", "provider_id").iterator():
+            avail.setdefault(mid, {}).setdefault(region, set()).add(pid)
+        for mid, providers in avail.items():
+            self.observe(mid, providers)
+        return len(avail)
+
+    def ensure_refresher(self):
+        """Start the periodic catalog reload (no-op unless the local catalog is enabled)."""
+        if not getattr(settings, "MOOD_CATALOG_ENABLED", False):
+            return
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._refresher = threading.Thread(target=self._refresh_loop, name="provider-index-refresh", daemon=True)
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            try:
+                self.load_catalog()
+            except Exception:  # retried next period
+                logger.exception("provider index catalog reload failed")
+            finally:
+                connection.close()  # this thread's own connection
+            time.sleep(PROVIDER_INDEX_REFRESH)
+
+    def clear(self):
+        with self._lock:
+            self._by_key.clear()
+            self._by_region.clear()
+            self._by_movie.clear()
+            self._pending.clear()
+
+
+provider_index = ProviderIndex()
@@ -0,0 +1,89 @@
+from django.db import transaction
+from django.db.models import Case, When
+
+# Gapped positions for manually ordered lists (watchlist items, room movies) — KR 16/10/2025
+# Rows sit GAP apart, so appending is "last + GAP" and moving a row between two neighbours is one
+# UPDATE to their midpoint. Only when a gap is used up (~10 moves into the same slot) is the list
+# renumbered; `manage.py rebalance_positions` does that ahead of time from cron.
+
+GAP = 1024
+
+
+class MoveError(ValueError):
+    pass
+
+
+def tail_position(siblings) -> int:
+    """Position for a row appended to `siblings` (index-backed LIMIT 1, not an aggregate)."""
+    last = siblings.order_by("-position").values_list("position", flat=True).first()
+    return (last or 0) + GAP
+
+
+def renumber(siblings, ordered_ids) -> int:
+    """Write GAP-spaced positions in `ordered_ids` order (one UPDATE); ids missing from the list are ignored."""
+    if not ordered_ids:
+        return 0
+    whens = [When(id=pk, then=i * GAP) for i, pk in enumerate(ordered_ids, start=1)]
+    return siblings.filter(id__in=ordered_ids).update(position=Case(*whens))
+
+
+def rebalance(siblings) -> int:
+    """Renumber the whole list in its current order."""
+    ids = list(siblings.order_by("position", "-added_at").values_list("id", flat=True))
+    return renumber(siblings, ids)
+
+
+def needs_rebalance(positions, *, min_gap=2) -> bool:
+    """True when sorted `positions` have a gap too small to insert between (or duplicates)."""
+    return any(b - a < min_gap for a, b in zip(positions, positions[1:]))
+
+
+def _neighbours(siblings, item_id, after, before):
+    """(lower, upper) positions the moved row must land strictly between; None = open end."""
+    others = siblings.exclude(id=item_id)
+    known = dict(others.filter(id__in=[pk for pk in (after, before) if pk]).values_list("id", "position"))
+    if (after and after not in known) or (before and before not in known):
+        raise MoveError("after/before must be other items of the same list.")
+
+    lo = known.get(after) if after else None
+    hi = known.get(before) if before else None
+    if after and not before:
+        hi = others.filter(position__gt=lo).order_by("position").values_list("position", flat=True).first()
+    elif before and not after:
+        lo = others.filter(position__lt=hi).order_by("-position").values_list("position", flat=True).first()
+    if lo is not None and hi is not None and lo >= hi:
+        raise MoveError("'after' must come before 'before'.")
+    return lo, hi
+
+
+def _slot(lo, hi):
+    lo = 0 if lo is None else lo
+    if hi is None:
+        return lo + GAP
+    return (lo + hi) // 2 if hi - lo > 1 else None
+
+
+@transaction.atomic
+def move_between(siblings, item, *, after=None, before=None) -> bool:
+    """
+    Put `item` right after sibling `after` and/or right before sibling `before` (ids; give either or
+    both). Updates only the moved row unless its slot is full, then renumbers the list once.
+    Sets item.position; returns True when the list had to be renumbered.
+    """
+    if not (after or before):
+        raise MoveError("Give 'after' and/or 'before'.")
+    if item.id in (after, before):
+        raise MoveError("An item can't be moved relative to itself.")
+
+    # lock the whole list, not just the rows named: the open-ended neighbour _neighbours looks up and
+    # every row a rebalance renumbers must not move under us, so concurrent moves in one list serialize
+    list(siblings.select_for_update().order_by("id").values_list("id", flat=True))
+    position = _slot(*_neighbours(siblings, item.id, after, before))
+    rebalanced = position is None
+    if rebalanced:
+        rebalance(siblings)
+        position = _slot(*_neighbours(siblings, item.id, after, before))
+
+    siblings.filter(id=item.id).update(position=position)
+    item.position = position
+    return rebalanced
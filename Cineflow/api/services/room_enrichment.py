@@ -0,0 +1,114 @@
+import logging
+import os
+import queue
+import threading
+
+from django.db import connection
+from django.db.models import Q
+
+from .room_events import emit
+from .tmdb import cache, cache_get_many, get_movie_details_many, movie_detail_key
+
+# Background room-movie enrichment — KR 16/10/2025
+# Rows added without a title/poster are filled in off the request path: the views queue their tmdb ids
+# (after commit) and a daemon worker reads them through the shared movie-detail cache, then fills every
+# room row for that id that is still missing something. Ids TMDB failed for are parked with an
+# exponential backoff (negative cache), so rooms being polled never hammer TMDB for the same id.
+
+ROOM_ENRICH_BATCH = int(os.environ.get("ROOM_ENRICH_BATCH", "20"))            # ids per detail fetch
+ROOM_ENRICH_BACKOFF = int(os.environ.get("ROOM_ENRICH_BACKOFF", "60"))        # first retry delay (s)
+ROOM_ENRICH_BACKOFF_MAX = int(os.environ.get("ROOM_ENRICH_BACKOFF_MAX", str(6 * 60 * 60)))
+
+logger = logging.getLogger(__name__)
+
+
+def backoff_key(tmdb_id) -> str:
+    return f"room_enrich:backoff:{int(tmdb_id)}"
+
+
+def fields_from_cache(tmdb_id, title="", poster_path=""):
+    """Fill title/poster from an already-cached detail payload only (never calls TMDB)."""
+    if title and poster_path:
+        return title, poster_path
+    md = cache_get_many([movie_detail_key(tmdb_id)]).get(movie_detail_key(tmdb_id)) or {}
+    return title or md.get("title") or md.get("name") or "", poster_path or md.get("poster_path") or ""
+
+
+class RoomEnricher:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._queue = queue.Queue()
+        self._worker = None
+
+    def enqueue(self, tmdb_ids):
+        """Enrich these ids in the background (skips queued ids and ids still backing off)."""
+        ids = [int(mid) for mid in dict.fromkeys(tmdb_ids) if mid]
+        if not ids:
+            return
+        parked = cache.get_many([backoff_key(mid) for mid in ids])
+        with self._lock:
+            fresh = [mid for mid in ids if mid not in self._pending and backoff_key(mid) not in parked]
+            self._pending.update(fresh)
+        if not fresh:
+            return
+        for mid in fresh:
+            self._queue.put(mid)
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._work, name="room-enrich", daemon=True)
+            self._worker.start()
+
+    def _work(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < ROOM_ENRICH_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.enrich(batch)
+            except Exception:  # keep the worker alive; the ids can be queued again on the next read
+                logger.exception("room enrichment failed for %s", batch)
+            finally:
+                with self._lock:
+                    self._pending.difference_update(batch)
+                connection.close()  # this thread's own connection
+
+    def enrich(self, tmdb_ids) -> int:
+        """Fill missing title/poster for every room row with these ids; returns rows updated."""
+        from api.models import RoomMovie
+
+        updated, failed = 0, []
+        for mid, (detail, err) in zip(tmdb_ids, get_movie_details_many(tmdb_ids)):
+            if err or not detail:
+                failed.append(mid)
+                continue
+            rows = RoomMovie.objects.filter(tmdb_id=mid)
+            title = detail.get("title") or detail.get("name") or ""
+            poster = detail.get("poster_path") or ""
+            bare = list(rows.filter(Q(title="") | Q(poster_path="")).values_list("id", "room_id"))
+            if title:
+                updated += rows.filter(title="").update(title=title)
+            if poster:
+                updated += rows.filter(poster_path="").update(poster_path=poster)
+            filled = {k: v for k, v in (("title", title), ("poster_path", poster)) if v}
+            for rm_id, room_id in bare:  # let open room pages pick up the metadata
+                emit(room_id, "movie_updated", {"id": rm_id, "tmdb_id": mid, **filled})
+            cache.delete_many([backoff_key(mid), f"{backoff_key(mid)}:n"])
+        self._back_off(failed)
+        return updated
+
+    @staticmethod
+    def _back_off(tmdb_ids):
+        if not tmdb_ids:
+            return
+        previous = cache.get_many([f"{backoff_key(mid)}:n" for mid in tmdb_ids])
+        for mid in tmdb_ids:
+            attempts = int(previous.get(f"{backoff_key(mid)}:n") or 0) + 1
+            delay = min(ROOM_ENRICH_BACKOFF * 2 ** (attempts - 1), ROOM_ENRICH_BACKOFF_MAX)
+            cache.set(backoff_key(mid), 1, delay)
+            cache.set(f"{backoff_key(mid)}:n", attempts, ROOM_ENRICH_BACKOFF_MAX * 2)  # remembers the streak
+
+
+room_enricher = RoomEnricher()
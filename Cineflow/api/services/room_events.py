@@ -0,0 +1,180 @@
+import asyncio
+import itertools
+import json
+import logging
+import secrets
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils.connection import ConnectionProxy
+
+# Room event stream — KR 16/10/2025
+# Views emit small delta events ("member_joined", "movie_added", ...) after their transaction commits;
+# the backend fans them out to every process, and each process's broker hands them to the SSE streams
+# (GET /api/rooms/<id>/events/) of that room open in it. Clients apply deltas instead of polling.
+#
+# Backends (ROOM_EVENTS_URL):
+#   ""/"local://"      in-process only (single process / dev)
+#   "redis://host/db"  redis pub/sub, so every worker process sees every room's events
+
+_CHANNEL_PREFIX = "cf:room-events:"
+
+logger = logging.getLogger(__name__)
+
+# Stream tickets: EventSource can't send an Authorization header, and a JWT in the URL ends up in proxy /
+# access logs and expires while the stream is open. Clients instead trade their JWT (normal API call)
+# for a random, single-use ticket that is only good for opening one room's stream in the next few seconds.
+TICKET_TTL = 30
+_tickets = ConnectionProxy(caches, "security")  # shared across workers, like OTPs
+
+
+class RoomEventBroker:
+    """Per-process fan-out from published events to subscribed asyncio queues."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subs = {}  # room_id -> {(loop, asyncio.Queue)}
+
+    def subscribe(self, room_id, *, maxsize=100):
+        q = asyncio.Queue(maxsize=maxsize)
+        sub = (asyncio.get_running_loop(), q)
+        with self._lock:
+            self._subs.setdefault(int(room_id), set()).add(sub)
+        return sub
+
+    def unsubscribe(self, room_id, sub):
+        with self._lock:
+            subs = self._subs.get(int(room_id))
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[int(room_id)]
+
+    def subscriber_count(self, room_id) -> int:
+        return len(self._subs.get(int(room_id), ()))
+
+    def dispatch(self, room_id, event: dict):
+        """Deliver to this process's subscribers (safe to call from any thread)."""
+        with self._lock:
+            subs = list(self._subs.get(int(room_id), ()))
+        for loop, q in subs:
+            try:
+                loop.call_soon_threadsafe(_offer, q, event)
+            except RuntimeError:  # loop already closed; its stream is going away
+                pass
+
+
+def _offer(q, event):
+    try:
+        q.put_nowait(event)
+    except asyncio.QueueFull:  # slow client: drop its backlog and tell it to refetch the room
+        while not q.empty():
+            q.get_nowait()
+        q.put_nowait({"type": "resync"})
+
+
+class LocalBackend:
+    def __init__(self, broker: RoomEventBroker):
+        self.broker = broker
+
+    def publish(self, room_id, event: dict):
+        self.broker.dispatch(room_id, event)
+
+    def ensure_listener(self):
+        pass
+
+
+class RedisBackend:
+    """Publishes to a redis channel per room; one listener thread per process dispatches locally."""
+
+    def __init__(self, broker: RoomEventBroker, url: str):
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImproperlyConfigured("ROOM_EVENTS_URL=redis://... needs the redis package") from exc
+        self.broker = broker
+        self._client = redis.Redis.from_url(url)
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def publish(self, room_id, event: dict):
+        self._client.publish(f"{_CHANNEL_PREFIX}{int(room_id)}", json.dumps(event))
+
+    def ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name="room-events", daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(f"{_CHANNEL_PREFIX}*")
+        for msg in pubsub.listen():
+            try:
+                channel = msg["channel"].decode() if isinstance(msg["channel"], bytes) else msg["channel"]
+                self.broker.dispatch(int(channel[len(_CHANNEL_PREFIX):]), json.loads(msg["data"]))
+            except (KeyError, ValueError, TypeError):
+                continue
+
+
+broker = RoomEventBroker()
+_backend = None
+_backend_lock = threading.Lock()
+_seq = itertools.count(1)
+
+
+def backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                url = (getattr(settings, "ROOM_EVENTS_URL", "") or "").strip()
+                if url.startswith(("redis://", "rediss://")):
+                    _backend = RedisBackend(broker, url)
+                else:
+                    _backend = LocalBackend(broker)
+    return _backend
+
+
+def subscribe(room_id):
+    """Open a subscription for one SSE stream (call from the stream's event loop)."""
+    backend().ensure_listener()
+    return broker.subscribe(room_id)
+
+
+def emit(room_id, event_type: str, data: dict):
+    """Publish a delta event for a room once the current transaction commits."""
+    event = {"type": event_type, "room": int(room_id), "data": data}
+    transaction.on_commit(lambda: _publish(room_id, event))
+
+
+def _publish(room_id, event):
+    event["seq"] = next(_seq)
+    try:
+        backend().publish(room_id, event)
+    except Exception:  # the stream is best effort (clients can refetch the room), but never silently
+        logger.exception("room event %s for room %s could not be published", event.get("type"), room_id)
+
+
+def issue_ticket(user_id, room_id) -> str:
+    ticket = secrets.token_urlsafe(24)
+    _tickets.set(f"room_events:ticket:{ticket}", {"user": int(user_id), "room": int(room_id)}, TICKET_TTL)
+    return ticket
+
+
+def redeem_ticket(ticket, room_id):
+    """User id the ticket was issued to, or None; a ticket works once, for its own room only."""
+    if not ticket:
+        return None
+    key = f"room_events:ticket:{ticket}"
+    grant = _tickets.get(key)
+    if not grant or not _tickets.delete(key):  # lost a race for the same ticket
+        return None
+    return grant["user"] if grant.get("room") == int(room_id) else None
+
+
+def format_sse(event: dict) -> str:
+    return f"event: {event.get('type', 'message')}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
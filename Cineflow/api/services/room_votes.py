@@ -0,0 +1,84 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+from api.models import RoomMovie, WatchRoomVote
+
+# Denormalized room-movie vote counters — KR 16/10/2025
+# RoomMovie.score / up_count / down_count are kept in step with WatchRoomVote by the vote endpoint,
+# always as F() deltas inside the same transaction as the vote row, so concurrent voters never
+# overwrite each other. Reads (room payloads, rankings) use the columns and never join the votes.
+# `manage.py reconcile_room_scores` recomputes them from the vote rows (e.g. after users are deleted,
+# which cascades their votes without going through here).
+
+_COUNTERS = ("score", "up_count", "down_count")
+
+
+def _counter(value: int) -> str:
+    return "up_count" if value == WatchRoomVote.UP else "down_count"
+
+
+def _deltas(value: int, sign: int = 1) -> dict:
+    """Counter updates for adding (sign=1) or removing (sign=-1) one vote of `value`."""
+    return {"score": F("score") + sign * value, _counter(value): F(_counter(value)) + sign}
+
+
+def _apply(movie: RoomMovie, updates: dict):
+    RoomMovie.objects.filter(pk=movie.pk).update(**updates)
+    movie.refresh_from_db(fields=list(_COUNTERS))
+
+
+@transaction.atomic
+def cast_vote(movie: RoomMovie, user, value: int) -> WatchRoomVote:
+    """Create or flip `user`'s vote on `movie`, moving the counters by the difference."""
+    vote = WatchRoomVote.objects.select_for_update().filter(room_movie=movie, user=user).first()
+    if vote is None:
+        try:
+            with transaction.atomic():
+                vote = WatchRoomVote.objects.create(room_movie=movie, user=user, value=value)
+        except IntegrityError:  # same user voting twice at once; the other request created the row
+            vote = WatchRoomVote.objects.select_for_update().get(room_movie=movie, user=user)
+        else:
+            _apply(movie, _deltas(value))
+            return vote
+
+    if vote.value != value:
+        old = vote.value
+        vote.value = value
+        vote.save(update_fields=["value"])
+        _apply(movie, {
+            "score": F("score") + (value - old),
+            _counter(old): F(_counter(old)) - 1,
+            _counter(value): F(_counter(value)) + 1,
+        })
+    return vote
+
+
+@transaction.atomic
+def retract_vote(movie: RoomMovie, user) -> bool:
+    """Remove `user`'s vote on `movie` (if any) and take it back out of the counters."""
+    vote = WatchRoomVote.objects.select_for_update().filter(room_movie=movie, user=user).first()
+    if vote is None:
+        return False
+    vote.delete()
+    _apply(movie, _deltas(vote.value, -1))
+    return True
+
+
+def reconcile_scores(room_ids=None) -> int:
+    """Recompute the counters from the vote rows; returns how many room movies were corrected."""
+    qs = RoomMovie.objects.all()
+    if room_ids:
+        qs = qs.filter(room_id__in=room_ids)
+    actual = qs.annotate(
+        _score=Sum("votes__value", default=0),
+        _up=Count("votes", filter=Q(votes__value=WatchRoomVote.UP)),
+        _down=Count("votes", filter=Q(votes__value=WatchRoomVote.DOWN)),
+    ).values_list("pk", "score", "up_count", "down_count", "_score", "_up", "_down")
+
+    fixed = []
+    for pk, score, up, down, real_score, real_up, real_down in actual:
+        if (score, up, down) != (real_score, real_up, real_down):
+            fixed.append(RoomMovie(pk=pk, score=real_score, up_count=real_up, down_count=real_down))
+    if fixed:
+        RoomMovie.objects.bulk_update(fixed, list(_COUNTERS), batch_size=500)
+    return len(fixed)
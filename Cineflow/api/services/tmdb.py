@@ -1,14 +1,77 @@
 import os
+import time
+import logging
+import uuid
+import pickle
+import threading
 import requests
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from django.core.cache import cache
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
 from rest_framework.response import Response
 
+from .certification import min_cert_ordinals
+
+logger = logging.getLogger(__name__)
+
 # ---- TMDB (The Movie Database) Configuration ---- KR 21/08/2025
 TMDB_BASE = "https://api.themoviedb.org/3"
 TMDB_KEY = os.environ.get("TMDB_API_KEY", "")
 TMDB_BEARER = os.environ.get("TMDB_BEARER", "")
 
+# TMDB payloads live in their own cache alias (see CACHES in settings) - KR 16/10/2025
+TMDB_CACHE_ALIAS = "tmdb"
+cache = ConnectionProxy(caches, TMDB_CACHE_ALIAS)
+
+# Max parallel TMDB requests per batch (tmdb_get_many) - KR 14/10/2025
+TMDB_MAX_IN_FLIGHT = int(os.environ.get("TMDB_MAX_IN_FLIGHT", "12"))
+
+# Shared HTTP pool for api.themoviedb.org + image.tmdb.org - KR 14/10/2025
+TMDB_POOL_SIZE = int(os.environ.get("TMDB_POOL_SIZE", str(max(TMDB_MAX_IN_FLIGHT, 10))))
+TMDB_RETRIES = int(os.environ.get("TMDB_RETRIES", "3"))
+TMDB_BACKOFF = float(os.environ.get("TMDB_BACKOFF", "0.3"))
+
+_session = None
+_session_lock = threading.Lock()
+
+def tmdb_session() -> requests.Session:
+    """
+    Process-wide keep-alive session used for every TMDB call.
+    - One connection pool per host, capped at TMDB_POOL_SIZE (extra callers wait for a free socket).
+    - Retries GETs with exponential backoff on 429/5xx, honouring Retry-After. - KR 14/10/2025
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=TMDB_RETRIES,
+                    connect=TMDB_RETRIES,
+                    read=TMDB_RETRIES,
+                    status=TMDB_RETRIES,
+                    backoff_factor=TMDB_BACKOFF,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=frozenset({"GET", "HEAD"}),
+                    respect_retry_after_header=True,
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=4,
+                    pool_maxsize=TMDB_POOL_SIZE,
+                    pool_block=True,
+                    max_retries=retry,
+                )
+                sess = requests.Session()
+                sess.mount("https://", adapter)
+                sess.mount("http://", adapter)
+                sess.headers.update({"Connection": "keep-alive"})
+                _session = sess
+    return _session
+
 def tmdb_get(path, params=None):
     """
     Generic helper to call the TMDB API.
@@ -32,7 +95,7 @@ def tmdb_get(path, params=None):
         full_url = requests.Request('GET', url, params=p).prepare().url
         print("[TMDB GET]", full_url)
 
-        r = requests.get(url, params=p, headers=headers, timeout=6)
+        r = tmdb_session().get(url, params=p, headers=headers, timeout=6)
         r.raise_for_status()
         return r.json(), None
     except requests.RequestException as e:
@@ -41,12 +104,337 @@ def tmdb_get(path, params=None):
             status=502
         )
 
+def tmdb_get_many(paths, params=None, *, max_in_flight=None):
+    """
+    Fan out several TMDB GETs with bounded concurrency.
+    - `params` is either one dict shared by every path or a list of dicts (one per path).
+    - Returns a list of (data, err_response) tuples in the same order as `paths`. - KR 14/10/2025
+    """
+    paths = list(paths)
+    if not paths:
+        return []
+    if isinstance(params, (list, tuple)):
+        per_path = list(params)
+    else:
+        per_path = [params] * len(paths)
+
+    return concurrent_map(lambda args: tmdb_get(*args), list(zip(paths, per_path)), max_in_flight=max_in_flight)
+
+def concurrent_map(fn, items, *, max_in_flight=None):
+    """Ordered map over a bounded thread pool (falls back to a plain loop for one item)."""
+    items = list(items)
+    workers = max(1, min(max_in_flight or TMDB_MAX_IN_FLIGHT, len(items)))
+    if workers == 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tmdb") as pool:
+        return list(pool.map(fn, items))
+
+# L1: in-process LRU in front of the shared cache for big, hot payloads - KR 16/10/2025
+# Each L1-eligible key has a tiny version stamp next to it in L2 ("ver:<key>"). Reads fetch only the
+# stamp; the full payload is unpickled from L2 only when the stamp changed (or L1 evicted it).
+# L1-eligible values are pickled once here and stored in L2 as that blob, so its length is the L1 size
+# for free (no second serialization just to measure) and a read unpickles exactly once, as before.
+# Values handed out from L1 are shared between requests - callers must not mutate them.
+L1_PREFIXES = ("snap4:", "moodrank:", "tmdb:movie:")
+L1_MAX_ENTRIES = int(os.environ.get("CACHE_L1_MAX_ENTRIES", "512"))
+L1_MAX_BYTES = int(os.environ.get("CACHE_L1_MAX_BYTES", str(64 * 1024 * 1024)))
+
+class _L1Cache:
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (version, value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None or hit[0] != version:
+                return None
+            self._data.move_to_end(key)
+            return hit[1]
+
+    def put(self, key, version, value, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old:
+                self._bytes -= old[2]
+            self._data[key] = (version, value, size)
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, _, sz) = self._data.popitem(last=False)
+                self._bytes -= sz
+
+    def discard(self, key):
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old:
+                self._bytes -= old[2]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+l1_cache = _L1Cache(L1_MAX_ENTRIES, L1_MAX_BYTES)
+
+def _l1_eligible(key) -> bool:
+    return key.startswith(L1_PREFIXES)
+
+def _ver_key(key): return f"ver:{key}"
+
+def _pack(value):
+    """Pickled blob for L2 (its len is the L1 size), or None if the value can't be pickled."""
+    try:
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return None
+
 # cache helpers
+# Values written with a soft TTL are wrapped in an envelope; cache_get unwraps it - KR 15/10/2025
+_SWR_TAG = "__swr__"
+
+def _is_envelope(val) -> bool:
+    return isinstance(val, dict) and _SWR_TAG in val
+
+def cache_get_many(keys) -> dict:
+    """get_many that serves L1-eligible keys from the in-process LRU when their version stamp matches."""
+    return {k: val for k, (val, _) in cache_get_many_versioned(keys).items()}
+
+def cache_get_many_versioned(keys) -> dict:
+    """
+    {key: (value, version stamp)} for the keys present. The stamp is read before the value, so it is never
+    newer than the value it is paired with (None for keys that aren't L1-eligible or have no stamp).
+    """
+    keys = list(dict.fromkeys(keys))
+    hot = [k for k in keys if _l1_eligible(k)]
+    out, need = {}, [k for k in keys if not _l1_eligible(k)]
+    versions = cache.get_many([_ver_key(k) for k in hot]) if hot else {}
+    for k in hot:
+        ver = versions.get(_ver_key(k))
+        val = l1_cache.get(k, ver) if ver is not None else None
+        if val is not None:
+            out[k] = val
+        else:
+            need.append(k)
+    if need:
+        fetched = cache.get_many(need)
+        for k, val in fetched.items():
+            if isinstance(val, bytes) and _l1_eligible(k):  # packed by cache_set_many
+                size, val = len(val), pickle.loads(val)
+                ver = versions.get(_ver_key(k))
+                if ver is not None:
+                    l1_cache.put(k, ver, val, size)
+            out[k] = val
+    return {
+        k: (v["value"] if _is_envelope(v) else v, versions.get(_ver_key(k)))
+        for k, v in out.items()
+    }
+
+def cache_set_many(mapping: dict, ttl) -> dict:
+    """
+    set_many that stamps a fresh version on L1-eligible keys (and keeps this process's L1 current).
+    Returns {key: version stamp} for the stamped keys.
+    """
+    if not mapping:
+        return {}
+    stamped, versions = dict(mapping), {}
+    for k, v in mapping.items():
+        if _l1_eligible(k):
+            ver = versions[k] = uuid.uuid4().hex
+            stamped[_ver_key(k)] = ver
+            blob = _pack(v)
+            if blob is None:  # unpicklable: stored as is (the backend decides), never kept in L1
+                l1_cache.discard(k)
+                continue
+            stamped[k] = blob
+            l1_cache.put(k, ver, v, len(blob))
+    cache.set_many(stamped, ttl)
+    return versions
+
+def cache_versions(keys) -> list:
+    """Current version stamps of L1-eligible keys (None where the entry is missing)."""
+    keys = list(keys)
+    stamps = cache.get_many([_ver_key(k) for k in keys])
+    return [stamps.get(_ver_key(k)) for k in keys]
+
 def cache_get(key):
-    return cache.get(key)
+    return cache_get_many([key]).get(key)
 
-def cache_set(key, value, ttl):
-    cache.set(key, value, ttl)
+def cache_set(key, value, ttl, *, soft_ttl=None):
+    """
+    Store `value` for `ttl` seconds (hard TTL); returns its version stamp (None if not L1-eligible).
+    With `soft_ttl`, the value is considered fresh for that long and stale (but still served) until `ttl`.
+    """
+    if soft_ttl:
+        value = {_SWR_TAG: 1, "value": value, "fresh_until": time.time() + soft_ttl}
+    return cache_set_many({key: value}, ttl).get(key)
+
+def cache_delete(key):
+    cache.delete_many([key, _ver_key(key)])
+    l1_cache.discard(key)
+
+def cache_swap_in(mapping: dict, ttl):
+    """Publish several rebuilt keys at once, refreshing their single-flight stale copies too."""
+    if not mapping:
+        return
+    cache_set_many(mapping, ttl)
+    cache.set_many({_stale_key(k): v for k, v in mapping.items()}, ttl + STALE_GRACE_SECONDS)
+
+def _refresh_in_background(key, fetch, soft_ttl, hard_ttl):
+    # one refresher per key across workers (same lease as single-flight)
+    lease = _lease_key(key)
+    if not cache.add(lease, 1, SINGLE_FLIGHT_LEASE):
+        return
+
+    def _run():
+        try:
+            data, err = fetch()
+            if not err and data:
+                cache_set(key, data, hard_ttl, soft_ttl=soft_ttl)
+        except Exception:
+            # the stale copy keeps being served; leave a trace instead of failing silently - KR 17/10/2025
+            logger.exception("background refresh failed for %s", key)
+        finally:
+            cache.delete(lease)
+
+    threading.Thread(target=_run, name=f"swr:{key}", daemon=True).start()
+
+def cache_get_swr(key, fetch, *, soft_ttl, hard_ttl):
+    """
+    Stale-while-revalidate read for TMDB payloads.
+    - `fetch()` returns (data, err_response) like tmdb_get.
+    - Fresh hit: served as is. Stale hit: served immediately, refreshed on a background thread.
+    - Miss: fetched inline (only the very first request after a cold start pays TMDB latency).
+    Returns (data, err_response). - KR 15/10/2025
+    """
+    val = cache.get(key)
+    if _is_envelope(val):
+        if time.time() >= val.get("fresh_until", 0):
+            _refresh_in_background(key, fetch, soft_ttl, hard_ttl)
+        return val["value"], None
+    if val:
+        return val, None
+
+    data, err = fetch()
+    if err:
+        return None, err
+    if data:
+        cache_set(key, data, hard_ttl, soft_ttl=soft_ttl)
+    return data, None
+
+# Single-flight rebuilds: one worker refills a missing key, the rest wait or serve stale - KR 15/10/2025
+SINGLE_FLIGHT_LEASE = int(os.environ.get("CACHE_SINGLE_FLIGHT_LEASE", "60"))
+SINGLE_FLIGHT_WAIT = float(os.environ.get("CACHE_SINGLE_FLIGHT_WAIT", "8"))
+STALE_GRACE_SECONDS = 60 * 60 * 6
+
+def _lease_key(key): return f"lease:{key}"
+def _stale_key(key): return f"stale:{key}"
+
+def cache_get_or_build(key, build, ttl, *, lease_ttl=None, wait=None, poll=0.1, versioned=False):
+    """
+    Return cache[key], rebuilding it with `build()` at most once across workers.
+    - The first miss takes a `cache.add` lease and rebuilds (also keeping a longer-lived stale copy).
+    - Everyone else gets the stale copy if there is one, otherwise polls briefly for the winner's value.
+    - If the winner never delivers within `wait` seconds we rebuild locally rather than fail.
+    versioned=True returns (value, version stamp); the stamp is None when the value is the stale copy or
+    the local fallback, i.e. not the published value of `key` (don't derive cache keys from it).
+    """
+    def _out(val, ver):
+        return (val, ver) if versioned else val
+
+    val, ver = cache_get_many_versioned([key]).get(key, (None, None))
+    if val is not None:
+        return _out(val, ver)
+
+    lease = _lease_key(key)
+    if cache.add(lease, 1, lease_ttl or SINGLE_FLIGHT_LEASE):
+        try:
+            val = build()
+            ver = None
+            if val is not None:
+                ver = cache_set(key, val, ttl)
+                cache.set(_stale_key(key), val, ttl + STALE_GRACE_SECONDS)
+            return _out(val, ver)
+        finally:
+            cache.delete(lease)
+
+    stale = cache.get(_stale_key(key))
+    if stale is not None:
+        return _out(stale, None)
+
+    deadline = time.monotonic() + (SINGLE_FLIGHT_WAIT if wait is None else wait)
+    while time.monotonic() < deadline:
+        time.sleep(poll)
+        val, ver = cache_get_many_versioned([key]).get(key, (None, None))
+        if val is not None:
+            return _out(val, ver)
+        if cache.get(lease) is None:
+            break  # winner finished without a value (or died) - stop waiting
+
+    val, ver = cache_get_many_versioned([key]).get(key, (None, None))
+    if val is None:
+        val = build()
+        if val is not None:
+            cache_set(key, val, ttl)
+    return _out(val, ver)
+
+# Shared per-movie detail cache (superset payload, projected per caller) - KR 15/10/2025
+MOVIE_DETAIL_BLOCKS = ("credits", "videos", "watch/providers", "release_dates")
+MOVIE_DETAIL_TTL = int(os.environ.get("TMDB_MOVIE_DETAIL_TTL", str(60 * 60 * 6)))
+
+def movie_detail_key(tmdb_id) -> str:
+    return f"tmdb:movie:{int(tmdb_id)}:full:v2"
+
+def get_movie_details_many(tmdb_ids, *, max_in_flight=None):
+    """
+    Read-through cache for /movie/{id} with every block we use appended.
+    - Hits come from L1 / one cache.get_many; misses are fetched concurrently and stored for MOVIE_DETAIL_TTL.
+    - Returns a list of (data, err_response) tuples in the same order as `tmdb_ids`. - KR 15/10/2025
+    """
+    ids = [int(mid) for mid in tmdb_ids]
+    if not ids:
+        return []
+    found = {}
+    hits = cache_get_many([movie_detail_key(mid) for mid in set(ids)])
+    for mid in set(ids):
+        data = hits.get(movie_detail_key(mid))
+        if data:
+            found[mid] = (data, None)
+
+    missing = [mid for mid in dict.fromkeys(ids) if mid not in found]
+    if missing:
+        fetched = tmdb_get_many(
+            [f"/movie/{mid}" for mid in missing],
+            {"append_to_response": ",".join(MOVIE_DETAIL_BLOCKS)},
+            max_in_flight=max_in_flight,
+        )
+        to_store = {}
+        for mid, (data, err) in zip(missing, fetched):
+            found[mid] = (data, err)
+            if not err and data:
+                data["_cert_min"] = min_cert_ordinals(data.get("release_dates"))  # extracted once per fetch
+                to_store[movie_detail_key(mid)] = data
+        if to_store:
+            cache_set_many(to_store, MOVIE_DETAIL_TTL)
+
+    return [found[mid] for mid in ids]
+
+def get_movie_detail(tmdb_id):
+    """Single-movie variant of get_movie_details_many -> (data, err_response)."""
+    return get_movie_details_many([tmdb_id])[0]
+
+def project_movie_detail(detail: dict, include=()) -> dict:
+    """Copy of the base movie fields plus only the appended blocks the caller asked for."""
+    drop = (set(MOVIE_DETAIL_BLOCKS) - set(include)) | {"_cert_min"}
+    return {k: v for k, v in (detail or {}).items() if k not in drop}
+
+def detail_watch_providers(detail: dict) -> dict:
+    """{region: {flatrate/rent/buy/...}} block from a cached detail payload."""
+    return ((detail or {}).get("watch/providers") or {}).get("results", {}) or {}
 
 def midnight_ttl_seconds():
     """Cache until next UTC midnight for day-stable rails.  KR 02/09/2025"""
@@ -59,8 +447,6 @@ def collect_discover_pages(params, *, max_pages=5):
     Pull several /discover pages once, dedupe, and sort deterministically.
     - Returns a single merged payload with all results in 'results'. - KR 02/09/2025
     """
-    from .tmdb import tmdb_get  # local import ok
-
     merged = []
     first, err = tmdb_get("/discover/movie", params)
     if err or not first:
@@ -68,8 +454,13 @@ def collect_discover_pages(params, *, max_pages=5):
     merged.extend(first.get("results") or [])
     total_pages = max(1, int(first.get("total_pages") or 1))
 
-    for p in range(2, min(max_pages, total_pages) + 1):
-        more, e2 = tmdb_get("/discover/movie", {**params, "page": p})
+    # remaining pages in one concurrent batch; stop at the first failed page as before - KR 14/10/2025
+    pages = list(range(2, min(max_pages, total_pages) + 1))
+    fetched = tmdb_get_many(
+        ["/discover/movie"] * len(pages),
+        [{**params, "page": p} for p in pages],
+    )
+    for more, e2 in fetched:
         if e2 or not more:
             break
         merged.extend(more.get("results") or [])
@@ -88,4 +479,11 @@ def collect_discover_pages(params, *, max_pages=5):
         "page": 1,
         "total_pages": 1,
         "total_results": len(unique),
-    }
\ No newline at end of file
+    }
+
+def collect_discover_variants(param_sets, *, max_pages=5):
+    """
+    Run collect_discover_pages for several param dicts at once (e.g. strict + strict_wide).
+    Returns the snapshots in the same order as `param_sets`. - KR 14/10/2025
+    """
+    return concurrent_map(lambda p: collect_discover_pages(p, max_pages=max_pages), param_sets)
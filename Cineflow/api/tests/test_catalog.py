@@ -0,0 +1,87 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from api.models import CatalogMovie, CatalogAvailability
+from api.services.catalog import catalog_details, catalog_discover, ingest_details, local_snapshot
+from api.services.mood import MoodCandidate, build_discover_params
+
+
+def _detail(mid, genres, *, cert="PG", providers=(8,), region="GB", pop=10.0, votes=500):
+    return {
+        "id": mid, "title": f"Movie {mid}", "original_language": "en", "release_date": "2010-05-01",
+        "runtime": 100, "popularity": pop, "vote_average": 7.0, "vote_count": votes, "adult": False,
+        "genres": [{"id": g, "name": str(g)} for g in genres],
+        "release_dates": {"results": [{"iso_3166_1": "US", "release_dates": [{"certification": cert}]}]},
+        "watch/providers": {"results": {region: {"flatrate": [{"provider_id": p} for p in providers]}}},
+    }
+
+
+class CatalogTests(TestCase):
+    def setUp(self):
+        ingest_details([
+            _detail(1, [35], pop=50),                 # comedy, PG, Netflix GB
+            _detail(2, [35, 80], pop=40),             # crime is excluded for feelgood
+            _detail(3, [10751], cert="R", pop=30),    # above the PG-13 cap
+            _detail(4, [16], providers=(337,), pop=20),
+            _detail(5, [35], region="US", pop=90),    # not available in GB
+            _detail(6, [35], votes=3, pop=80),        # below the vote floor
+        ])
+
+    def test_ingest_is_an_upsert(self):
+        ingest_details([_detail(1, [35], providers=(9,), pop=51)])
+        self.assertEqual(CatalogMovie.objects.get(pk=1).popularity, 51)
+        self.assertEqual(list(CatalogAvailability.objects.filter(movie_id=1).values_list("provider_id", flat=True)), [9])
+
+    def test_discover_params_run_as_a_local_query(self):
+        params = build_discover_params("feelgood", region="GB")
+        snap = catalog_discover(params)
+        self.assertEqual([m["id"] for m in snap["results"]], [1, 4])
+        self.assertEqual(snap["results"][0]["genre_ids"], [35])
+
+        only_disney = build_discover_params("feelgood", region="GB", providers="337")
+        self.assertEqual([m["id"] for m in catalog_discover(only_disney)["results"]], [4])
+
+    def test_watch_filters_read_pipe_as_any_and_comma_as_all(self):
+        both = _detail(7, [35], providers=(8, 337), pop=5)
+        both["watch/providers"]["results"]["GB"]["rent"] = [{"provider_id": 8}]
+        ingest_details([both])
+
+        def ids(**extra):
+            return sorted(m["id"] for m in catalog_discover({"watch_region": "GB", **extra})["results"])
+
+        self.assertEqual(ids(with_watch_monetization_types="flatrate|rent"), [1, 2, 3, 4, 6, 7])
+        self.assertEqual(ids(with_watch_monetization_types="flatrate,rent"), [7])
+        self.assertEqual(ids(with_watch_providers="8|337"), [1, 2, 3, 4, 6, 7])
+        self.assertEqual(ids(with_watch_providers="8,337"), [7])
+        self.assertEqual(ids(with_watch_monetization_types="rent", with_watch_providers="8,337"), [])
+
+    def test_local_snapshot_falls_back_when_disabled_or_thin(self):
+        params = build_discover_params("feelgood", region="GB")
+        with override_settings(MOOD_CATALOG_ENABLED=False):
+            self.assertIsNone(local_snapshot(params))
+        with override_settings(MOOD_CATALOG_ENABLED=True, MOOD_CATALOG_MIN_RESULTS=5):
+            self.assertIsNone(local_snapshot(params))
+        with override_settings(MOOD_CATALOG_ENABLED=True, MOOD_CATALOG_MIN_RESULTS=2):
+            self.assertEqual(len(local_snapshot(params)["results"]), 2)
+
+    def test_catalog_details_enrich_like_tmdb_details(self):
+        with self.assertNumQueries(3):  # movies + prefetched certifications + availability
+            details = catalog_details([1, 3, 99])
+        self.assertEqual(sorted(details), [1, 3])
+
+        cand = MoodCandidate.from_movie({"id": 3, "genre_ids": [10751]})
+        cand.attach_detail(details[3])
+        self.assertEqual(cand.providers_in("GB"), frozenset({8}))
+        self.assertEqual(cand.cert_min, {"US": 3})
+        self.assertEqual(cand.hydrate(details[3])["watch_providers"]["GB"]["flatrate"], [{"provider_id": 8}])
+
+    @patch("api.management.commands.ingest_catalog.get_movie_details_many")
+    def test_ingest_command_uses_the_detail_cache_path(self, mock_details):
+        mock_details.return_value = [(_detail(7, [18]), None), (None, object())]
+        call_command("ingest_catalog", ids="7,8", stdout=StringIO())
+        mock_details.assert_called_once_with([7, 8])
+        self.assertTrue(CatalogMovie.objects.filter(pk=7).exists())
+        self.assertFalse(CatalogMovie.objects.filter(pk=8).exists())
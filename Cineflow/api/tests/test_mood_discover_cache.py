@@ -0,0 +1,113 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache as default_cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.services.mood import set_pins_overrides, rerank_candidates
+from api.services.tmdb import cache, l1_cache
+
+User = get_user_model()
+
+
+def _snapshot(params=None, max_pages=5):
+    # 45 comedies -> 3 pages of 20
+    return {"results": [{"id": i, "genre_ids": [35], "popularity": 100 - i} for i in range(1, 46)]}
+
+
+class MoodDiscoverRankedCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        default_cache.clear()
+        l1_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("m", email="m@ex.com", password="passpass"))
+
+    @patch("api.views.mood_discover.rerank_candidates", wraps=rerank_candidates)
+    @patch("api.views.mood_discover.get_movie_details_many", side_effect=lambda ids: [(None, None) for _ in ids])
+    @patch("api.views.mood_discover.collect_discover_pages", side_effect=_snapshot)
+    def test_later_pages_are_slices_of_the_cached_ranking(self, mock_collect, mock_details, mock_rerank):
+        r1 = self.client.get("/api/movies/mood/feelgood/?page=1")
+        self.assertEqual(r1.status_code, 200)
+
+        r2 = self.client.get("/api/movies/mood/feelgood/?page=2")
+        r3 = self.client.get("/api/movies/mood/feelgood/?page=3")
+        self.assertEqual(mock_rerank.call_count, 1)
+        self.assertEqual(mock_collect.call_count, 2)  # strict + strict_wide, built once
+
+        ids = [m["id"] for r in (r1, r2, r3) for m in r.json()["results"]]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(r3.json()["total_pages"], 3)
+
+    @patch("api.views.mood_discover.get_movie_details_many", side_effect=lambda ids: [(None, None) for _ in ids])
+    @patch("api.views.mood_discover.collect_discover_pages", side_effect=_snapshot)
+    def test_pin_override_invalidates_the_ranking(self, mock_collect, mock_details):
+        self.client.get("/api/movies/mood/feelgood/")
+        set_pins_overrides({"feelgood": [40]})
+        r = self.client.get("/api/movies/mood/feelgood/")
+        self.assertEqual(r.json()["results"][0]["id"], 40)
+
+    @patch("api.views.mood_discover.collect_discover_pages", side_effect=_snapshot)
+    def test_cached_pages_carry_enrichment_without_detail_reads(self, mock_collect):
+        detail = {
+            "watch/providers": {"results": {"GB": {"flatrate": [{"provider_id": 8}]}}},
+            "release_dates": {"results": []},
+        }
+        with patch("api.views.mood_discover.get_movie_details_many",
+                   side_effect=lambda ids: [(detail, None) for _ in ids]):
+            r = self.client.get("/api/movies/mood/feelgood/")
+        first = r.json()["results"][0]
+        self.assertEqual(first["watch_providers"]["GB"]["flatrate"][0]["provider_id"], 8)
+        self.assertIn("_detail", first)
+
+        with patch("api.views.mood_discover.get_movie_details_many") as mock_details:
+            r2 = self.client.get("/api/movies/mood/feelgood/?page=2")
+        mock_details.assert_not_called()
+        self.assertIn("watch_providers", r2.json()["results"][0])
+
+    @override_settings(MOOD_CATALOG_ENABLED=True, MOOD_CATALOG_MIN_RESULTS=1000)
+    @patch("api.views.mood_discover.collect_discover_pages", side_effect=_snapshot)
+    def test_catalog_movies_are_enriched_from_catalog_rows(self, mock_collect):
+        from api.services.catalog import ingest_details
+
+        ingest_details([{
+            "id": 1, "title": "One", "genres": [{"id": 35}],
+            "watch/providers": {"results": {"GB": {"flatrate": [{"provider_id": 8}]}}},
+        }])
+        with patch("api.views.mood_discover.get_movie_details_many",
+                   side_effect=lambda ids: [(None, None) for _ in ids]) as mock_details:
+            r = self.client.get("/api/movies/mood/feelgood/")
+        fetched = [mid for call in mock_details.call_args_list for mid in call.args[0]]
+        self.assertNotIn(1, fetched)  # TMDB only for ids the catalog doesn't have
+        self.assertIn(2, fetched)
+        card = next(m for m in r.json()["results"] if m["id"] == 1)
+        self.assertEqual(card["watch_providers"]["GB"]["flatrate"][0]["provider_id"], 8)
+
+    @patch("api.views.mood_discover.get_movie_details_many", side_effect=lambda ids: [(None, None) for _ in ids])
+    def test_ranking_from_a_stale_snapshot_is_not_cached(self, mock_details):
+        from api.services.tmdb import cache_set
+
+        stale = {"results": [{"id": 1, "genre_ids": [35], "popularity": 1}]}
+        with patch("api.views.mood_discover.cache_get_or_build", return_value=(stale, None)), \
+                patch("api.views.mood_discover.cache_set", wraps=cache_set) as mock_set:
+            r = self.client.get("/api/movies/mood/feelgood/")
+        self.assertEqual([m["id"] for m in r.json()["results"]][:1], [1])
+        self.assertFalse([c for c in mock_set.call_args_list if c.args[0].startswith("moodrank:")])
+
+    @patch("api.views.mood_discover.get_movie_details_many", side_effect=lambda ids: [(None, None) for _ in ids])
+    @patch("api.views.mood_discover.collect_discover_pages", side_effect=_snapshot)
+    def test_forced_providers_use_the_index_and_cache_misses_briefly(self, mock_collect, mock_details):
+        from api.services.provider_index import provider_index
+        from api.services.tmdb import cache_set
+        from api.views.mood_discover import PROVISIONAL_RANK_TTL
+
+        provider_index.clear()
+        with patch.object(provider_index, "enqueue") as mock_enqueue, \
+                patch("api.views.mood_discover.cache_set", wraps=cache_set) as mock_set:
+            r = self.client.get("/api/movies/mood/feelgood/?providers=8&force_providers=1")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()["total_results"], 45)  # unknown to the index -> kept, indexed in the background
+        self.assertIn(45, [mid for c in mock_enqueue.call_args_list for mid in c.args[0]])
+        ranked_ttls = [c.args[2] for c in mock_set.call_args_list if c.args[0].startswith("moodrank:")]
+        self.assertEqual(ranked_ttls, [PROVISIONAL_RANK_TTL])
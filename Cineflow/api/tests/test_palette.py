@@ -0,0 +1,105 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache as default_cache
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.models import PosterPalette, Watchlist, WatchlistItem
+from api.services.tmdb import cache
+from api.views.tmdb_public import PaletteBatchThrottle
+
+
+class PosterPaletteCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @patch("api.services.palette.compute_palette", return_value=[[1, 2, 3], [4, 5, 6]])
+    def test_palette_is_computed_once_per_poster_file(self, mock_compute):
+        client = APIClient()
+        r1 = client.get("/api/movies/poster_palette/?path=/t/p/w500/abc.jpg")
+        r2 = client.get("/api/movies/poster_palette/?path=/t/p/w92/abc.jpg")
+        self.assertEqual(r1.status_code, 200)
+        self.assertEqual(r1.json(), r2.json())
+        self.assertEqual(mock_compute.call_count, 1)
+        self.assertTrue(PosterPalette.objects.filter(file_path="abc.jpg").exists())
+
+        cache.clear()  # table still answers without recomputing
+        self.assertEqual(client.get("/api/movies/poster_palette/?path=/t/p/w342/abc.jpg").status_code, 200)
+        self.assertEqual(mock_compute.call_count, 1)
+
+    @patch("api.management.commands.precompute_palettes.extract_palette_or_none", return_value=[[9, 9, 9], [0, 0, 0]])
+    @patch("api.management.commands.precompute_palettes.fetch_poster", return_value=b"jpeg")
+    def test_precompute_covers_watchlist_posters(self, mock_fetch, mock_extract):
+        user = get_user_model().objects.create_user("p", email="p@ex.com", password="passpass")
+        wl = Watchlist.objects.create(user=user, name="L")
+        WatchlistItem.objects.create(watchlist=wl, tmdb_id=1, title="A", poster_path="/one.jpg")
+        WatchlistItem.objects.create(watchlist=wl, tmdb_id=2, title="B", poster_path="/two.jpg")
+        PosterPalette.objects.create(file_path="two.jpg", palette=[[1, 1, 1]])
+
+        call_command("precompute_palettes", sources="watchlists,rooms", processes=0, stdout=StringIO())
+        mock_fetch.assert_called_once_with("/one.jpg")
+        mock_extract.assert_called_once_with(b"jpeg")
+        self.assertEqual(PosterPalette.objects.get(file_path="one.jpg").palette, [[9, 9, 9], [0, 0, 0]])
+
+
+class PaletteEngineTests(TestCase):
+    def test_dominant_colours_are_deterministic_and_fetched_small(self):
+        from io import BytesIO
+        from PIL import Image, ImageDraw
+        from api.services.palette import extract_palette, poster_url
+
+        img = Image.new("RGB", (92, 138), (200, 30, 40))
+        ImageDraw.Draw(img).rectangle([0, 0, 91, 45], fill=(240, 200, 40))
+        buf = BytesIO()
+        img.save(buf, "JPEG", quality=90)
+
+        palette = extract_palette(buf.getvalue())
+        self.assertEqual(palette, extract_palette(buf.getvalue()))
+        self.assertTrue(all(abs(a - b) < 12 for a, b in zip(palette[0], (200, 30, 40))), palette)
+        self.assertTrue(all(abs(a - b) < 12 for a, b in zip(palette[1], (240, 200, 40))), palette)
+
+        self.assertEqual(poster_url("/t/p/original/abc.jpg"), "https://image.tmdb.org/t/p/w92/abc.jpg")
+
+
+def _jpeg(rgb):
+    from io import BytesIO
+    from PIL import Image
+    buf = BytesIO()
+    Image.new("RGB", (92, 138), rgb).save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+
+class PosterPaletteBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        default_cache.clear()  # throttle history
+
+    def test_batch_shares_the_single_path_cache_and_extracts_misses_inline(self):
+        images = {"/t/p/w500/red.jpg": _jpeg((200, 30, 40)), "/t/p/w500/blue.jpg": _jpeg((20, 40, 200))}
+        PosterPalette.objects.create(file_path="known.jpg", palette=[[1, 1, 1], [2, 2, 2]])
+
+        client = APIClient()
+        with patch("api.services.palette.fetch_poster", side_effect=lambda p: images[p]) as mock_fetch:
+            r = client.get("/api/movies/poster_palette/batch/?paths=/t/p/w500/red.jpg,/t/p/w500/blue.jpg,/t/p/w92/known.jpg")
+            self.assertEqual(r.status_code, 200)
+            palettes = r.json()["palettes"]
+            self.assertEqual(palettes["/t/p/w92/known.jpg"], [[1, 1, 1], [2, 2, 2]])
+            self.assertTrue(all(abs(a - b) < 12 for a, b in zip(palettes["/t/p/w500/red.jpg"][0], (200, 30, 40))))
+            self.assertEqual(mock_fetch.call_count, 2)
+
+            single = client.get("/api/movies/poster_palette/?path=/t/p/w342/blue.jpg")
+            self.assertEqual(single.json()["palette"], palettes["/t/p/w500/blue.jpg"])
+            self.assertEqual(mock_fetch.call_count, 2)
+
+        self.assertEqual(client.get("/api/movies/poster_palette/batch/?paths=../etc").status_code, 400)
+
+    @patch.object(PaletteBatchThrottle, "THROTTLE_RATES", {"palette_batch": "1/min"})
+    @patch("api.views.tmdb_public.get_palettes_many", return_value={})
+    def test_batch_is_throttled_per_client(self, mock_many):
+        client = APIClient()
+        self.assertEqual(client.get("/api/movies/poster_palette/batch/?paths=/t/p/w92/a.jpg").status_code, 200)
+        self.assertEqual(client.get("/api/movies/poster_palette/batch/?paths=/t/p/w92/a.jpg").status_code, 429)
+        self.assertEqual(mock_many.call_count, 1)
@@ -0,0 +1,64 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from api.services.tmdb import cache, cache_get
+from api.services.mood import DEFAULT_FILTERS, snapshot_base_params, snapshot_variants, snapshot_key
+from api.management.commands.prewarm_mood_snapshots import ui_shapes
+
+
+@patch("api.views.mood_discover.get_movie_details_many", side_effect=lambda ids: [(None, None) for _ in ids])
+class PrewarmMoodSnapshotsTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    @patch("api.management.commands.prewarm_mood_snapshots.get_movie_details_many")
+    @patch("api.management.commands.prewarm_mood_snapshots.collect_discover_pages")
+    def test_builds_the_keys_mood_discover_reads(self, mock_collect, mock_details, _view_details):
+        mock_collect.return_value = {"results": [{"id": 1, "genre_ids": [35], "popularity": 3}]}
+
+        call_command("prewarm_mood_snapshots", moods="feelgood", regions="GB", providers="", stdout=StringIO())
+
+        base = snapshot_base_params("feelgood", region="GB", filters=DEFAULT_FILTERS)
+        for name, par in snapshot_variants(base):
+            key = snapshot_key(name, "feelgood", "GB", par, DEFAULT_FILTERS)
+            self.assertEqual(cache_get(key), mock_collect.return_value)
+            self.assertIsNotNone(cache.get(f"stale:{key}"))
+        self.assertEqual(mock_collect.call_count, 2)
+        mock_details.assert_called_once_with([1])
+
+    @patch("api.management.commands.prewarm_mood_snapshots.get_movie_details_many")
+    @patch("api.management.commands.prewarm_mood_snapshots.collect_discover_pages")
+    def test_failed_builds_do_not_replace_snapshots(self, mock_collect, mock_details, _view_details):
+        mock_collect.return_value = {"results": []}
+        call_command("prewarm_mood_snapshots", moods="scary", regions="US", providers="", stdout=StringIO())
+        base = snapshot_base_params("scary", region="US", filters=DEFAULT_FILTERS)
+        name, par = snapshot_variants(base)[0]
+        self.assertIsNone(cache.get(snapshot_key(name, "scary", "US", par, DEFAULT_FILTERS)))
+
+    @patch("api.services.mood.provider_index.enqueue")
+    @patch("api.management.commands.prewarm_mood_snapshots.get_movie_details_many")
+    @patch("api.management.commands.prewarm_mood_snapshots.collect_discover_pages")
+    def test_warms_the_rankings_for_every_ui_shape(self, mock_collect, mock_details, _enqueue, _view_details):
+        from api.views.mood_discover import ranked_mood
+
+        mock_collect.return_value = {"results": [{"id": 1, "genre_ids": [35], "popularity": 3}]}
+        call_command("prewarm_mood_snapshots", moods="feelgood", regions="GB", providers=";8",
+                     stdout=StringIO())
+        self.assertEqual(mock_collect.call_count, 3)  # default + wide, and the provider-locked wide snapshot
+
+        shapes = [("", *shape) for shape in ui_shapes("")] + [("8", *shape) for shape in ui_shapes("8")]
+        self.assertEqual(len(shapes), 6)
+        with patch("api.views.mood_discover._rank_mood") as mock_rank:
+            for providers, types, broad, force in shapes:
+                base = snapshot_base_params("feelgood", region="GB", providers=providers, types=types,
+                                            broad=broad, filters=DEFAULT_FILTERS)
+                variants = snapshot_variants(base)
+                keys = [snapshot_key(name, "feelgood", "GB", par, DEFAULT_FILTERS) for name, par in variants]
+                ranked = ranked_mood("feelgood", variants, keys, region="GB", providers=providers,
+                                     types_in=types, filters=dict(DEFAULT_FILTERS), broad=broad,
+                                     force_providers=force)
+                self.assertIn("results", ranked)
+        mock_rank.assert_not_called()
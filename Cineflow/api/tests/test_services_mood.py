@@ -45,4 +45,152 @@ class MoodServiceUnitTests(TestCase):
         )
         self.assertIsInstance(params, dict)
         if "page" in params:
-            self.assertEqual(params["page"], 2)
\ No newline at end of file
+            self.assertEqual(params["page"], 2)
+
+    def test_candidate_records_gate_and_provider_filter(self):
+        from api.services.mood import MoodCandidate, candidate_passes_gate, filter_candidates_by_providers
+
+        on_netflix = MoodCandidate.from_movie({
+            "id": 1, "genre_ids": [35],
+            "watch_providers": {"GB": {"flatrate": [{"provider_id": 8}]}},
+        })
+        elsewhere = MoodCandidate.from_movie({
+            "id": 2, "genre_ids": [35],
+            "watch_providers": {"US": {"rent": [{"provider_id": 2}]}},
+        })
+        self.assertTrue(candidate_passes_gate("feelgood", on_netflix))
+        kept = filter_candidates_by_providers([on_netflix, elsewhere], region="GB", providers_csv="8")
+        self.assertEqual([c.id for c in kept], [1])
+
+    def test_columnar_rerank_matches_legacy_dict_scoring(self):
+        import random
+        from api.services.mood import MoodCandidate, rerank_candidates, effective_pins_for, MOOD_RULES
+
+        def legacy(mood_key, items):
+            pins  = set(effective_pins_for(mood_key))
+            rules = MOOD_RULES.get(mood_key) or {}
+            exc   = set(rules.get("exclude_genres") or [])
+            inc   = set(rules.get("include_genres_any") or [])
+            light = {"35", "10751", "16", "12", "10402", "10749"}
+            scored = []
+            for m in items:
+                score = 0
+                gids = {str(g) for g in m["genre_ids"]}
+                if m["id"] in pins:
+                    score += 50
+                if gids & exc:
+                    score -= 18
+                if rules.get("enforce_genre_gate") and (gids & inc):
+                    score += 16
+                if mood_key == "feelgood" and "18" in gids and not (gids & light):
+                    score -= 6
+                score += min(float(m.get("popularity") or 0.0) * 0.002, 3.0)
+                scored.append((score, m))
+            scored.sort(key=lambda x: x[0], reverse=True)
+            return [m["id"] for _, m in scored]
+
+        rnd = random.Random(12)
+        genres = [18, 35, 27, 53, 10751, 16, 80, 99, 10749]
+        items = [
+            {"id": i, "genre_ids": rnd.sample(genres, rnd.randint(0, 3)), "popularity": rnd.choice([0, 5.0, 400.0, 2000.0])}
+            for i in range(1, 300)
+        ] + [{"id": 260513, "genre_ids": [16, 35], "popularity": 10.0}]
+
+        for mood_key in ("feelgood", "scary", "dark_gritty", "chill"):
+            cands = [MoodCandidate.from_movie(m) for m in items]
+            got = [c.id for c in rerank_candidates(mood_key, cands)]
+            self.assertEqual(got, legacy(mood_key, items), mood_key)
+
+    def test_compiled_rules_follow_pin_overrides(self):
+        from api.services.mood import compiled_mood, set_pins_overrides, PINNED_BASE
+
+        rule = compiled_mood("feelgood")
+        self.assertIn(35, rule.include_ids)
+        self.assertEqual(rule.discover_template["certification.lte"], "PG-13")
+        with self.assertRaises(Exception):
+            rule.pins = frozenset()
+
+        set_pins_overrides({"feelgood": [424242]})
+        try:
+            rule = compiled_mood("feelgood")
+            self.assertEqual(rule.pins_order[0], 424242)
+            self.assertIn(424242, rule.pins)
+        finally:
+            set_pins_overrides({"feelgood": []})
+        self.assertEqual(list(compiled_mood("feelgood").pins_order), PINNED_BASE["feelgood"])
+
+    def test_unknown_moods_are_not_added_to_the_compiled_table(self):
+        from api.services import mood
+
+        rule = mood.compiled_mood("no_such_mood", refresh=False)
+        self.assertFalse(rule.enforce_gate)
+        self.assertNotIn("no_such_mood", mood._compiled[1])
+
+        table = mood._compiled[1]
+        mood.MOOD_RULES["unit_late"] = {"exclude_genres": {"27"}}  # registered after import
+        try:
+            self.assertEqual(mood.compiled_mood("unit_late", refresh=False).exclude_ids, frozenset({27}))
+            self.assertIn("unit_late", mood._compiled[1])
+            self.assertNotIn("unit_late", table)  # published as a new table, the old one is left alone
+        finally:
+            del mood.MOOD_RULES["unit_late"]
+
+    def test_certification_ordinals_rank_and_cap(self):
+        from api.services.certification import cert_ordinal, min_cert_ordinals
+        from api.services.mood import MoodCandidate, rerank_candidates, filter_candidates_by_cert
+
+        self.assertLess(cert_ordinal("US", "PG-13"), cert_ordinal("US", "R"))
+        self.assertLess(cert_ordinal("GB", "12A"), cert_ordinal("GB", "12"))
+        self.assertIsNone(cert_ordinal("US", "NR"))
+
+        def rd(*certs):
+            return {"results": [{"iso_3166_1": "US", "release_dates": [{"certification": c} for c in certs]}]}
+        self.assertEqual(min_cert_ordinals(rd("R", "PG-13", "")), {"US": 2})
+
+        rated_r = MoodCandidate.from_movie({"id": 1, "genre_ids": [35], "popularity": 0, "_detail": {"release_dates": rd("R")}})
+        rated_pg = MoodCandidate.from_movie({"id": 2, "genre_ids": [35], "popularity": 0, "_detail": {"release_dates": rd("PG")}})
+        unknown = MoodCandidate.from_movie({"id": 3, "genre_ids": [35], "popularity": 0})
+
+        self.assertEqual([c.id for c in rerank_candidates("feelgood", [rated_r, unknown, rated_pg])], [2, 1, 3])
+        self.assertEqual([c.id for c in filter_candidates_by_cert("feelgood", [rated_r, unknown, rated_pg])], [3, 2])
+
+    def test_provider_gate_and_boost_use_the_inverted_index(self):
+        from unittest.mock import patch
+        from api.services.mood import MoodCandidate, filter_candidates_by_providers, rerank_candidates
+        from api.services.provider_index import provider_index
+
+        provider_index.clear()
+        provider_index.observe(11, {"GB": {8}, "US": {9}})
+        provider_index.observe(12, {"US": {8}})
+        cands = [MoodCandidate.from_movie({"id": mid, "genre_ids": [35], "popularity": 0}) for mid in (12, 13, 11)]
+
+        with patch.object(provider_index, "enqueue") as mock_enqueue, \
+                patch("api.services.tmdb.get_movie_details_many") as mock_details:
+            kept = filter_candidates_by_providers(cands, region="GB", providers_csv="8|337")
+            ranked = rerank_candidates("feelgood", cands, region="GB", providers_csv="8", broad=True)
+
+        # 12 has no GB block -> judged on US (same as providers_in); 13 unknown -> kept and queued
+        self.assertEqual([c.id for c in kept], [12, 13, 11])
+        mock_enqueue.assert_any_call([13])
+        mock_details.assert_not_called()
+        self.assertEqual({c.id for c in ranked[:2]}, {11, 12})
+        provider_index.clear()
+
+    def test_provider_index_expires_and_caps_entries(self):
+        from unittest.mock import patch
+        from api.services import provider_index as pi
+
+        index = pi.ProviderIndex()
+        with patch.object(pi, "PROVIDER_INDEX_MAX", 2), patch.object(pi, "PROVIDER_INDEX_TTL", 60), \
+                patch.object(index, "_queue") as mock_queue, patch("threading.Thread"):
+            index.observe(1, {"GB": {8}})
+            index.observe(2, {"GB": {8}})
+            index.observe(3, {"GB": {8}})
+            self.assertFalse(index.knows(1))  # oldest dropped from every set
+            self.assertEqual(index.matching("GB", {8}), frozenset({2, 3}))
+
+            with patch("time.monotonic", return_value=pi.time.monotonic() + 120):
+                self.assertEqual(index.stale([2, 3]), [2, 3])
+                index.enqueue([2, 3])
+            self.assertEqual(mock_queue.put.call_count, 2)
+            self.assertEqual(index.matching("GB", {8}), frozenset({2, 3}))  # stale entries still served
@@ -107,4 +107,215 @@ class TMDBServiceUnitTests(TestCase):
         self.assertTrue(
             result in (None, {}, []) or (isinstance(result, dict) and any(k in result for k in ["error", "detail", "message"])),
             f"{name} should handle non-200s safely; got {result!r}",
-        )
\ No newline at end of file
+        )
+
+class TMDBBatchTests(TestCase):
+    @patch("api.services.tmdb.tmdb_get")
+    def test_get_many_keeps_input_order(self, mock_get):
+        from api.services.tmdb import tmdb_get_many
+
+        mock_get.side_effect = lambda path, params=None: ({"path": path, "params": params}, None)
+        paths = [f"/movie/{i}" for i in range(10)]
+        out = tmdb_get_many(paths, {"append_to_response": "watch/providers"}, max_in_flight=4)
+
+        self.assertEqual([d["path"] for d, _ in out], paths)
+        self.assertTrue(all(d["params"] == {"append_to_response": "watch/providers"} for d, _ in out))
+
+    @patch("api.services.tmdb.tmdb_get")
+    def test_get_many_accepts_per_path_params(self, mock_get):
+        from api.services.tmdb import tmdb_get_many
+
+        mock_get.side_effect = lambda path, params=None: (params, None)
+        out = tmdb_get_many(["/a", "/b"], [{"page": 1}, {"page": 2}])
+        self.assertEqual([d for d, _ in out], [{"page": 1}, {"page": 2}])
+        self.assertEqual(tmdb_get_many([]), [])
+
+    @patch("api.services.tmdb.tmdb_get")
+    def test_collect_discover_pages_merges_all_pages_deterministically(self, mock_get):
+        from api.services.tmdb import collect_discover_pages
+
+        pages = {
+            1: [{"id": 1, "popularity": 5}, {"id": 2, "popularity": 9}],
+            2: [{"id": 3, "popularity": 9}, {"id": 1, "popularity": 5}],
+            3: [{"id": 4, "popularity": 1}],
+        }
+
+        def fake(path, params=None):
+            return {"results": pages[(params or {}).get("page", 1)], "total_pages": 3}, None
+
+        mock_get.side_effect = fake
+        out = collect_discover_pages({"page": 1}, max_pages=5)
+        self.assertEqual([m["id"] for m in out["results"]], [2, 3, 1, 4])
+        self.assertEqual(out["total_results"], 4)
+
+
+class MovieDetailCacheTests(TestCase):
+    def setUp(self):
+        from api.services.tmdb import cache
+        cache.clear()
+
+    @patch("api.services.tmdb.tmdb_get")
+    def test_details_fetched_once_and_shared(self, mock_get):
+        from api.services.tmdb import get_movie_details_many, get_movie_detail, project_movie_detail
+
+        mock_get.side_effect = lambda path, params=None: (
+            {"id": int(path.rsplit("/", 1)[1]), "credits": {"cast": []}, "watch/providers": {"results": {}}},
+            None,
+        )
+        first = get_movie_details_many([7, 8, 7])
+        self.assertEqual([d["id"] for d, _ in first], [7, 8, 7])
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertIn("release_dates", mock_get.call_args[0][1]["append_to_response"])
+
+        data, err = get_movie_detail(8)
+        self.assertIsNone(err)
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertNotIn("credits", project_movie_detail(data, include=("watch/providers",)))
+
+
+class SingleFlightCacheTests(TestCase):
+    def setUp(self):
+        from api.services.tmdb import cache
+        cache.clear()
+        self.cache = cache
+
+    def test_builds_once_then_serves_cache(self):
+        from api.services.tmdb import cache_get_or_build
+
+        build = MagicMock(return_value={"results": [1]})
+        self.assertEqual(cache_get_or_build("sf:a", build, 60), {"results": [1]})
+        self.assertEqual(cache_get_or_build("sf:a", build, 60), {"results": [1]})
+        self.assertEqual(build.call_count, 1)
+        self.assertIsNone(self.cache.get("lease:sf:a"))
+
+    def test_waiter_gets_stale_copy_while_lease_is_held(self):
+        from api.services.tmdb import cache_get_or_build
+
+        self.cache.set("lease:sf:b", 1, 60)
+        self.cache.set("stale:sf:b", {"results": ["old"]}, 60)
+        build = MagicMock(return_value={"results": ["new"]})
+        self.assertEqual(cache_get_or_build("sf:b", build, 60), {"results": ["old"]})
+        build.assert_not_called()
+
+    def test_waiter_falls_back_to_building_after_timeout(self):
+        from api.services.tmdb import cache_get_or_build
+
+        self.cache.set("lease:sf:c", 1, 60)
+        build = MagicMock(return_value={"results": ["mine"]})
+        self.assertEqual(cache_get_or_build("sf:c", build, 60, wait=0.2, poll=0.05), {"results": ["mine"]})
+        build.assert_called_once()
+
+    def test_versioned_reads_only_stamp_published_values(self):
+        from api.services.tmdb import cache_get_or_build, cache_versions
+
+        built, ver = cache_get_or_build("snap4:v", lambda: {"results": [1]}, 60, versioned=True)
+        self.assertEqual((built, ver), ({"results": [1]}, cache_versions(["snap4:v"])[0]))
+
+        self.cache.set("lease:snap4:w", 1, 60)  # another worker is rebuilding: the stale copy is unversioned
+        self.cache.set("stale:snap4:w", {"results": ["old"]}, 60)
+        self.assertEqual(cache_get_or_build("snap4:w", MagicMock(), 60, versioned=True), ({"results": ["old"]}, None))
+
+
+class _InlineThread:
+    def __init__(self, target=None, **kwargs):
+        self.target = target
+
+    def start(self):
+        self.target()
+
+
+class StaleWhileRevalidateTests(TestCase):
+    def setUp(self):
+        from api.services.tmdb import cache
+        cache.clear()
+
+    def test_miss_fetches_inline_and_wraps_envelope(self):
+        from api.services.tmdb import cache_get_swr, cache_get
+
+        fetch = MagicMock(return_value=({"results": [1]}, None))
+        data, err = cache_get_swr("swr:a", fetch, soft_ttl=60, hard_ttl=600)
+        self.assertEqual((data, err), ({"results": [1]}, None))
+        self.assertEqual(cache_get("swr:a"), {"results": [1]})
+
+        cache_get_swr("swr:a", fetch, soft_ttl=60, hard_ttl=600)
+        fetch.assert_called_once()
+
+    @patch("api.services.tmdb.threading.Thread", _InlineThread)
+    def test_stale_hit_serves_old_value_and_refreshes(self):
+        from api.services.tmdb import cache_get_swr, cache_set, cache_get
+
+        cache_set("swr:b", {"results": ["old"]}, 600, soft_ttl=-1)
+        fetch = MagicMock(return_value=({"results": ["new"]}, None))
+        data, _ = cache_get_swr("swr:b", fetch, soft_ttl=60, hard_ttl=600)
+
+        self.assertEqual(data, {"results": ["old"]})
+        fetch.assert_called_once()
+        self.assertEqual(cache_get("swr:b"), {"results": ["new"]})
+
+    @patch("api.services.tmdb.threading.Thread", _InlineThread)
+    def test_failed_refresh_is_logged_and_keeps_stale_value(self):
+        from api.services.tmdb import cache_get_swr, cache_set, cache_get
+
+        cache_set("swr:c", {"results": ["old"]}, 600, soft_ttl=-1)
+        fetch = MagicMock(side_effect=RuntimeError("boom"))
+        with self.assertLogs("api.services.tmdb", level="ERROR") as logs:
+            data, _ = cache_get_swr("swr:c", fetch, soft_ttl=60, hard_ttl=600)
+
+        self.assertEqual(data, {"results": ["old"]})
+        self.assertIn("swr:c", logs.output[0])
+        self.assertEqual(cache_get("swr:c"), {"results": ["old"]})
+
+
+class L1CacheTests(TestCase):
+    def setUp(self):
+        from api.services.tmdb import cache, l1_cache
+        cache.clear()
+        l1_cache.clear()
+        self.cache = cache
+
+    def test_hot_keys_skip_l2_payload_while_version_matches(self):
+        from api.services.tmdb import cache_set, cache_get
+
+        cache_set("snap4:test", {"results": [1]}, 60)
+        with patch.object(self.cache, "get_many", wraps=self.cache.get_many) as spy:
+            self.assertEqual(cache_get("snap4:test"), {"results": [1]})
+        self.assertEqual(spy.call_count, 1)  # version stamp only
+
+    def test_l2_write_elsewhere_invalidates_l1(self):
+        from api.services.tmdb import cache_set, cache_get
+
+        cache_set("snap4:test", {"results": [1]}, 60)
+        # another worker rewrites the entry with a new version stamp
+        self.cache.set_many({"snap4:test": {"results": [2]}, "ver:snap4:test": "other"}, 60)
+        self.assertEqual(cache_get("snap4:test"), {"results": [2]})
+
+    def test_delete_clears_both_tiers(self):
+        from api.services.tmdb import cache_set, cache_get, cache_delete
+
+        cache_set("tmdb:movie:1:full:v2", {"id": 1}, 60)
+        cache_delete("tmdb:movie:1:full:v2")
+        self.assertIsNone(cache_get("tmdb:movie:1:full:v2"))
+
+    def test_l2_holds_one_pickle_whose_length_sizes_l1(self):
+        import pickle
+        from api.services.tmdb import cache, cache_set, cache_get, l1_cache
+
+        value = {"results": [{"id": i, "title": f"Movie {i}"} for i in range(50)]}
+        with patch("api.services.tmdb.pickle.dumps", wraps=pickle.dumps) as mock_dumps:
+            cache_set("snap4:sized", value, 60)
+        self.assertEqual(sum(c.args[0] is value for c in mock_dumps.call_args_list), 1)  # backend pickles only the blob
+        blob = cache.get("snap4:sized")
+        self.assertEqual(l1_cache._data["snap4:sized"][2], len(blob))
+
+        l1_cache.clear()  # another process: L2 read unpickles once and fills L1 with the same size
+        self.assertEqual(cache_get("snap4:sized"), value)
+        self.assertEqual(l1_cache._data["snap4:sized"][2], len(blob))
+
+    def test_lru_is_bounded(self):
+        from api.services.tmdb import _L1Cache
+
+        l1 = _L1Cache(max_entries=2, max_bytes=1000)
+        for i in range(3):
+            l1.put(f"k{i}", "v", i, 10)
+        self.assertIsNone(l1.get("k0", "v"))
+        self.assertEqual(l1.get("k2", "v"), 2)
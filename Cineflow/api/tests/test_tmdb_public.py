@@ -0,0 +1,46 @@
+from unittest.mock import patch
+
+from django.core.cache import cache as default_cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.services.tmdb import cache
+from api.views.tmdb_public import ProvidersBatchThrottle
+
+
+class MovieProvidersBatchViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        default_cache.clear()  # throttle history
+
+    @patch("api.services.tmdb.tmdb_get")
+    def test_providers_batch_endpoint_serves_region_blocks(self, mock_get):
+        def fake(path, params=None):
+            mid = int(path.rsplit("/", 1)[1])
+            if mid == 3:
+                return None, object()
+            block = {"link": "x", "flatrate": [{"provider_id": 8}]}
+            return {"id": mid, "credits": {"cast": [1]}, "watch/providers": {"results": {"GB": block}}}, None
+        mock_get.side_effect = fake
+
+        client = APIClient()
+        r = client.get("/api/movies/providers/batch/?ids=1,2,3,1&region=gb")
+        self.assertEqual(r.status_code, 200)
+        body = r.json()
+        self.assertEqual(body["region"], "GB")
+        self.assertEqual(body["results"]["1"]["flatrate"], [{"provider_id": 8}])
+        self.assertIsNone(body["results"]["3"])
+        self.assertNotIn("credits", body["results"]["1"])
+        self.assertEqual(mock_get.call_count, 3)
+
+        client.get("/api/movies/providers/batch/?ids=1,2&region=GB")
+        self.assertEqual(mock_get.call_count, 3)  # second call is all cache hits
+        self.assertEqual(client.get("/api/movies/providers/batch/?ids=a,1").status_code, 400)
+
+    @patch.object(ProvidersBatchThrottle, "THROTTLE_RATES", {"providers_batch": "2/min"})
+    @patch("api.views.tmdb_public.get_movie_details_many", side_effect=lambda ids: [(None, None) for _ in ids])
+    def test_providers_batch_is_throttled_per_client(self, mock_details):
+        client = APIClient()
+        codes = [client.get("/api/movies/providers/batch/?ids=1,2").status_code for _ in range(3)]
+        self.assertEqual(codes, [200, 200, 429])
+        self.assertEqual(mock_details.call_count, 2)
@@ -1,9 +1,23 @@
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
 from django.db import IntegrityError
-from django.test import TestCase
+from io import StringIO
+from unittest.mock import patch
 
-from api.models import Watchlist, WatchlistItem, WatchlistCollaborator, Room, RoomMembership
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.models import Watchlist, WatchlistItem, WatchlistCollaborator, Room, RoomMembership, RoomMovie, WatchRoomVote
 from api.serializers import ReorderSerializer
+from api.services.room_enrichment import room_enricher
+from api.services.room_events import broker, issue_ticket
+from api.services.room_votes import cast_vote
+from api.services.ranking import GAP
+from api.services.tmdb import cache
 
 User = get_user_model()
 
@@ -45,4 +59,327 @@ class RoomRulesTests(TestCase):
     def test_unique_membership(self):
         RoomMembership.objects.create(room=self.room, user=self.guest, is_host=False)
         with self.assertRaises(IntegrityError):
-            RoomMembership.objects.create(room=self.room, user=self.guest, is_host=False)
\ No newline at end of file
+            RoomMembership.objects.create(room=self.room, user=self.guest, is_host=False)
+
+
+class RoomQueryCountTests(TestCase):
+    """Room payloads must cost the same number of queries however many rooms/members/movies there are."""
+
+    def setUp(self):
+        self.user = User.objects.create_user("rq", email="rq@ex.com", password="passpass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.n = 0
+
+    def _room(self, members=1, movies=1):
+        self.n += 1
+        room = Room.objects.create(owner=self.user, name=f"R{self.n}")
+        RoomMembership.objects.create(room=room, user=self.user, is_host=True)
+        for i in range(members):
+            u = User.objects.create_user(f"m{self.n}_{i}", email=f"m{self.n}_{i}@ex.com", password="passpass")
+            RoomMembership.objects.create(room=room, user=u)
+        for i in range(movies):
+            rm = RoomMovie.objects.create(room=room, tmdb_id=1000 * self.n + i, title=f"M{i}", position=i)
+            cast_vote(rm, self.user, WatchRoomVote.UP)
+        return room
+
+    def _count(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+        return len(ctx.captured_queries), r.json()
+
+    def test_my_rooms_is_constant(self):
+        self._room()
+        small, _ = self._count("/api/rooms/")
+        for _ in range(3):
+            self._room(members=3, movies=4)
+        large, data = self._count("/api/rooms/")
+        self.assertEqual(small, large)
+        self.assertEqual(len(data), 4)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/api/rooms/")
+        self.assertFalse(any("watchroomvote" in q["sql"] for q in ctx.captured_queries))
+        self.assertEqual(data[0]["movies"][0]["score"], 1)
+        self.assertEqual(len(data[0]["members"]), 4)
+
+    def test_room_detail_and_join_are_constant(self):
+        small_room = self._room()
+        big_room = self._room(members=5, movies=6)
+        small, _ = self._count(f"/api/rooms/{small_room.id}/")
+        large, data = self._count(f"/api/rooms/{big_room.id}/")
+        self.assertEqual(small, large)
+        self.assertEqual([m["position"] for m in data["movies"]], list(range(6)))
+
+        joins = []
+        for room in (small_room, big_room):
+            with CaptureQueriesContext(connection) as ctx:
+                r = self.client.post("/api/rooms/join/", {"invite_code": room.invite_code}, format="json")
+            self.assertEqual(r.status_code, 200)
+            joins.append(len(ctx.captured_queries))
+        self.assertEqual(joins[0], joins[1])
+
+
+class RoomVoteCounterTests(TestCase):
+    def setUp(self):
+        self.host = User.objects.create_user("vh", email="vh@ex.com", password="passpass")
+        self.guest = User.objects.create_user("vg", email="vg@ex.com", password="passpass")
+        self.room = Room.objects.create(owner=self.host, name="Votes")
+        RoomMembership.objects.create(room=self.room, user=self.host, is_host=True)
+        RoomMembership.objects.create(room=self.room, user=self.guest)
+        self.movie = RoomMovie.objects.create(room=self.room, tmdb_id=1, title="One")
+        self.url = f"/api/rooms/{self.room.id}/movies/{self.movie.id}/vote/"
+
+    def _vote(self, user, value=None):
+        client = APIClient()
+        client.force_authenticate(user)
+        r = client.delete(self.url) if value is None else client.post(self.url, {"value": value}, format="json")
+        self.assertEqual(r.status_code, 200)
+        body = r.json()
+        return body["score"], body["up_count"], body["down_count"]
+
+    def test_create_flip_repeat_and_retract(self):
+        self.assertEqual(self._vote(self.host, 1), (1, 1, 0))
+        self.assertEqual(self._vote(self.guest, -1), (0, 1, 1))
+        self.assertEqual(self._vote(self.guest, -1), (0, 1, 1))
+        self.assertEqual(self._vote(self.guest, 1), (2, 2, 0))
+        self.assertEqual(self._vote(self.host), (1, 1, 0))
+        self.assertEqual(self._vote(self.host), (1, 1, 0))
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.score, self.movie.up_count, self.movie.down_count), (1, 1, 0))
+
+    def test_reconcile_fixes_drift(self):
+        self._vote(self.host, 1)
+        self._vote(self.guest, -1)
+        self.guest.delete()  # cascades the vote without touching the counters
+        call_command("reconcile_room_scores", stdout=StringIO())
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.score, self.movie.up_count, self.movie.down_count), (1, 1, 0))
+
+
+class RoomEnrichmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("en", email="en@ex.com", password="passpass")
+        self.room = Room.objects.create(owner=self.user, name="Bare")
+        RoomMembership.objects.create(room=self.room, user=self.user, is_host=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @patch("api.services.tmdb.tmdb_get_many")
+    def test_list_and_add_never_call_tmdb(self, mock_tmdb):
+        RoomMovie.objects.create(room=self.room, tmdb_id=11, title="")
+        with patch.object(room_enricher, "enqueue") as mock_enqueue, \
+                self.captureOnCommitCallbacks(execute=True):
+            r1 = self.client.get(f"/api/rooms/{self.room.id}/movies/")
+            r2 = self.client.post(f"/api/rooms/{self.room.id}/movies/", {"tmdb_id": 12}, format="json")
+        self.assertEqual(r1.status_code, 200)
+        self.assertEqual(r2.status_code, 201)
+        mock_tmdb.assert_not_called()
+        self.assertEqual([c.args[0] for c in mock_enqueue.call_args_list], [[11], [12]])
+
+    def test_room_payloads_queue_bare_rows(self):
+        RoomMovie.objects.create(room=self.room, tmdb_id=31, title="Full", poster_path="/f.jpg")
+        RoomMovie.objects.create(room=self.room, tmdb_id=32, title="No poster")
+        with patch.object(room_enricher, "enqueue") as mock_enqueue, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.get(f"/api/rooms/{self.room.id}/").status_code, 200)
+            self.assertEqual(self.client.get("/api/rooms/").status_code, 200)
+        self.assertEqual([c.args[0] for c in mock_enqueue.call_args_list], [[32], [32]])
+
+    def test_worker_fills_rows_and_backs_off_failures(self):
+        RoomMovie.objects.create(room=self.room, tmdb_id=21, title="Kept")
+        RoomMovie.objects.create(room=self.room, tmdb_id=22)
+        details = {21: ({"id": 21, "title": "Other", "poster_path": "/p.jpg"}, None), 22: (None, object())}
+        with patch("api.services.room_enrichment.get_movie_details_many",
+                   side_effect=lambda ids: [details[i] for i in ids]):
+            room_enricher.enrich([21, 22])
+
+        rm = RoomMovie.objects.get(tmdb_id=21)
+        self.assertEqual((rm.title, rm.poster_path), ("Kept", "/p.jpg"))
+        with patch.object(room_enricher, "_queue") as mock_queue:
+            room_enricher.enqueue([22])  # still backing off
+        mock_queue.put.assert_not_called()
+
+
+class RoomEventStreamTests(TestCase):
+    def setUp(self):
+        self.host = User.objects.create_user("sh", email="sh@ex.com", password="passpass")
+        self.guest = User.objects.create_user("sg", email="sg@ex.com", password="passpass")
+        self.room = Room.objects.create(owner=self.host, name="Live")
+        RoomMembership.objects.create(room=self.room, user=self.host, is_host=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.host)
+
+    def test_mutations_publish_compact_deltas_after_commit(self):
+        base = f"/api/rooms/{self.room.id}"
+        guest = APIClient()
+        guest.force_authenticate(self.guest)
+        with patch("api.services.room_events.backend") as mock_backend, \
+                patch.object(room_enricher, "enqueue"), \
+                self.captureOnCommitCallbacks(execute=True):
+            guest.post("/api/rooms/join/", {"invite_code": self.room.invite_code}, format="json")
+            a = self.client.post(f"{base}/movies/", {"tmdb_id": 1, "title": "A", "poster_path": "/a.jpg"}, format="json").json()
+            b = self.client.post(f"{base}/movies/", {"tmdb_id": 2, "title": "B", "poster_path": "/b.jpg"}, format="json").json()
+            self.client.post(f"{base}/movies/reorder/", {"order": [b["id"], a["id"]]}, format="json")
+            self.client.post(f"{base}/movies/{a['id']}/vote/", {"value": 1}, format="json")
+            self.client.delete(f"{base}/movies/{b['id']}/")
+
+        events = [c.args[1] for c in mock_backend.return_value.publish.call_args_list]
+        self.assertEqual(
+            [e["type"] for e in events],
+            ["member_joined", "movie_added", "movie_added", "movies_reordered", "movie_scored", "movie_removed"],
+        )
+        self.assertEqual(events[0]["data"]["username"], "sg")
+        self.assertEqual(events[3]["data"], {"order": [b["id"], a["id"]]})
+        self.assertEqual(events[4]["data"], {"id": a["id"], "score": 1, "up_count": 1, "down_count": 0})
+
+    def test_publish_failures_are_logged(self):
+        from api.services import room_events
+
+        with patch("api.services.room_events.backend") as mock_backend, \
+                self.assertLogs("api.services.room_events", level="ERROR") as logs:
+            mock_backend.return_value.publish.side_effect = ConnectionError("broker down")
+            room_events._publish(self.room.id, {"type": "movie_added", "room": self.room.id, "data": {}})
+        self.assertIn("movie_added", logs.output[0])
+
+    def test_wsgi_refuses_to_stream(self):
+        self.assertEqual(self.client.post(f"/api/rooms/{self.room.id}/events/ticket/").status_code, 503)
+        ticket = issue_ticket(self.host.id, self.room.id)
+        self.assertEqual(self.client.get(f"/api/rooms/{self.room.id}/events/?ticket={ticket}").status_code, 503)
+
+    async def test_stream_needs_a_fresh_member_ticket(self):
+        client = AsyncClient()
+        url = f"/api/rooms/{self.room.id}/events/"
+        self.assertEqual((await client.get(url)).status_code, 401)
+        self.assertEqual((await client.get(f"{url}?ticket=nope")).status_code, 401)
+
+        guest = {"Authorization": f"Bearer {AccessToken.for_user(self.guest)}"}
+        self.assertEqual((await client.post(f"{url}ticket/", headers=guest)).status_code, 404)
+
+        host = {"Authorization": f"Bearer {AccessToken.for_user(self.host)}"}
+        r = await client.post(f"{url}ticket/", headers=host)
+        self.assertEqual(r.status_code, 200)
+        ticket = r.json()["ticket"]
+        self.assertEqual((await client.get(f"/api/rooms/{self.room.id + 1}/events/?ticket={ticket}")).status_code, 401)
+        r = await client.post(f"{url}ticket/", headers=host)
+        ticket = r.json()["ticket"]
+        stream = await client.get(f"{url}?ticket={ticket}")
+        self.assertEqual(stream.status_code, 200)
+        await stream.streaming_content.__aiter__().aclose()
+        self.assertEqual((await client.get(f"{url}?ticket={ticket}")).status_code, 401)  # single use
+
+    async def test_stream_delivers_broker_events(self):
+        ticket = await sync_to_async(issue_ticket)(self.host.id, self.room.id)
+        response = await AsyncClient().get(f"/api/rooms/{self.room.id}/events/?ticket={ticket}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+
+        chunks = response.streaming_content.__aiter__()
+        self.assertIn(b"retry:", await chunks.__anext__())
+        self.assertIn(b"event: ready", await chunks.__anext__())
+        broker.dispatch(self.room.id, {"type": "movie_removed", "room": self.room.id, "data": {"id": 5}})
+        self.assertIn(b'"data":{"id":5}', await chunks.__anext__())
+        await chunks.aclose()
+
+
+class GappedPositionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("gp", email="gp@ex.com", password="passpass")
+        self.wl = Watchlist.objects.create(user=self.user, name="Gaps")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _order(self):
+        return list(WatchlistItem.objects.filter(watchlist=self.wl).order_by("position", "-added_at").values_list("title", flat=True))
+
+    def _add(self, *titles):
+        ids = {}
+        for n, t in enumerate(titles, start=1):
+            with CaptureQueriesContext(connection) as ctx:
+                r = self.client.post(f"/api/watchlists/{self.wl.id}/items/", {"tmdb_id": n, "title": t}, format="json")
+            self.assertEqual(r.status_code, 201)
+            self.assertFalse(any("MAX(" in q["sql"].upper() for q in ctx.captured_queries))
+            ids[t] = r.json()["id"]
+        return ids
+
+    def _move(self, item_id, **body):
+        return self.client.post(f"/api/watchlists/{self.wl.id}/items/{item_id}/move/", body, format="json")
+
+    def test_append_is_gapped_and_a_move_updates_one_row(self):
+        ids = self._add("A", "B", "C", "D")
+        self.assertEqual(
+            list(WatchlistItem.objects.filter(watchlist=self.wl).order_by("position").values_list("position", flat=True)),
+            [GAP, 2 * GAP, 3 * GAP, 4 * GAP],
+        )
+        with CaptureQueriesContext(connection) as ctx:
+            r = self._move(ids["D"], after=ids["A"], before=ids["B"])
+        self.assertEqual(r.status_code, 200)
+        item_updates = [q for q in ctx.captured_queries
+                        if q["sql"].startswith("UPDATE") and "api_watchlistitem" in q["sql"]]
+        self.assertEqual(len(item_updates), 1)
+        self.assertEqual(self._order(), ["A", "D", "B", "C"])
+
+        self.assertEqual(self._move(ids["A"], after=ids["C"]).status_code, 200)   # to the end
+        self.assertEqual(self._move(ids["C"], before=ids["D"]).status_code, 200)  # to the front
+        self.assertEqual(self._order(), ["C", "D", "B", "A"])
+
+    def test_exhausted_gap_rebalances_and_keeps_order(self):
+        ids = self._add("A", "B", "C", "D")
+        for _ in range(12):  # alternate C and D into the ever-shrinking slot right after A
+            self.assertEqual(self._move(ids["C"], after=ids["A"]).status_code, 200)
+            self.assertEqual(self._move(ids["D"], after=ids["A"]).status_code, 200)
+        self.assertEqual(self._order(), ["A", "D", "C", "B"])
+
+        call_command("rebalance_positions", "--all", stdout=StringIO())
+        self.assertEqual(
+            list(WatchlistItem.objects.filter(watchlist=self.wl).order_by("position").values_list("position", flat=True)),
+            [GAP, 2 * GAP, 3 * GAP, 4 * GAP],
+        )
+        self.assertEqual(self._order(), ["A", "D", "C", "B"])
+
+    def test_move_locks_the_whole_list_before_picking_a_slot(self):
+        from django.db.models.query import QuerySet
+
+        ids = self._add("A", "B", "C")
+        locked = []
+        real = QuerySet._fetch_all
+
+        def spy(qs):  # rows each locking query covers (sqlite ignores FOR UPDATE, so read them back)
+            if qs.query.select_for_update and qs.model is WatchlistItem:
+                query = qs.query.chain()
+                query.select_for_update = False
+                locked.append(set(QuerySet(model=WatchlistItem, query=query).values_list("id", flat=True)))
+            return real(qs)
+
+        with patch.object(QuerySet, "_fetch_all", autospec=True, side_effect=spy):
+            self.assertEqual(self._move(ids["A"], after=ids["B"]).status_code, 200)  # upper neighbour C is looked up
+        self.assertTrue(locked)
+        self.assertTrue(all(rows == set(ids.values()) for rows in locked), locked)
+
+    def test_invalid_moves_are_rejected(self):
+        ids = self._add("A", "B")
+        other = Watchlist.objects.create(user=self.user, name="Other")
+        stranger = WatchlistItem.objects.create(watchlist=other, tmdb_id=99, title="X")
+        self.assertEqual(self._move(ids["A"]).status_code, 400)
+        self.assertEqual(self._move(ids["A"], after=ids["A"]).status_code, 400)
+        self.assertEqual(self._move(ids["A"], after=stranger.id).status_code, 400)
+        self.assertEqual(self._move(ids["A"], after=ids["B"], before=ids["B"]).status_code, 400)
+
+    def test_room_move_emits_a_single_row_delta(self):
+        room = Room.objects.create(owner=self.user, name="Queue")
+        RoomMembership.objects.create(room=room, user=self.user, is_host=True)
+        with patch.object(room_enricher, "enqueue"):
+            a, b, c = (
+                self.client.post(f"/api/rooms/{room.id}/movies/", {"tmdb_id": n, "title": t, "poster_path": "/p.jpg"},
+                                 format="json").json()
+                for n, t in ((1, "A"), (2, "B"), (3, "C"))
+            )
+        self.assertEqual([a["position"], b["position"], c["position"]], [GAP, 2 * GAP, 3 * GAP])
+
+        with patch("api.services.room_events.backend") as mock_backend, self.captureOnCommitCallbacks(execute=True):
+            r = self.client.post(f"/api/rooms/{room.id}/movies/{c['id']}/move/", {"before": a["id"]}, format="json")
+        self.assertEqual(r.status_code, 200)
+        event = mock_backend.return_value.publish.call_args.args[1]
+        self.assertEqual(event["type"], "movie_moved")
+        self.assertEqual(event["data"], {"id": c["id"], "position": GAP // 2})
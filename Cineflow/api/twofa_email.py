@@ -1,12 +1,16 @@
 # api/twofa_email.py
 import random
-from django.core.cache import cache
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
 from django.conf import settings
 from .email_theme import send_html_email, code_block
 
 CODE_TTL = int(getattr(settings, "EMAIL_2FA_CODE_TTL", 300))   
 RATE_TTL = int(getattr(settings, "EMAIL_2FA_RATE_TTL", 60))   
 
+# OTPs + rate limits live in the small, shared "security" cache alias
+cache = ConnectionProxy(caches, "security")
+
 def _otp_key(user_id):  return f"2fa:email:otp:{user_id}"
 def _rate_key(user_id): return f"2fa:email:rate:{user_id}"
 
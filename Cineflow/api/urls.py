@@ -17,6 +17,7 @@ from api.views.mood_admin import (
 from api.views.tmdb_public import (
     trending_movies, search_movies, now_playing, streaming_trending,
     providers_movies, person_movies, movie_detail, poster_palette,
+    movie_providers_batch, poster_palette_batch,
 )
 
 from .views import watchlists as views
@@ -55,9 +56,11 @@ urlpatterns = [
     path("movies/now_playing/", now_playing, name="movies_now_playing"),
     path("movies/streaming_trending/", streaming_trending, name="movies_streaming_trending"),
     path("movies/providers/", providers_movies, name="movies_providers"),
+    path("movies/providers/batch/", movie_providers_batch, name="movies_providers_batch"),
     path("movies/by_person/", person_movies, name="person_movies"),
     path("movies/<int:tmdb_id>/", movie_detail, name="api_movie_detail"),
     path("movies/poster_palette/", poster_palette, name="api_poster_palette"),
+    path("movies/poster_palette/batch/", poster_palette_batch, name="api_poster_palette_batch"),
 
     # Mood (protected)
     path("movies/mood/<str:mood_key>/", mood_discover, name="mood-discover"),
@@ -78,6 +81,7 @@ urlpatterns = [
     path("watchlists/<int:list_id>/items/", views.add_item, name="add_item"),
     path("watchlists/<int:list_id>/items/<int:item_id>/", views.update_item, name="update_item"),
     path("watchlists/<int:list_id>/items/<int:item_id>/delete/", views.remove_item, name="remove_item"),
+    path("watchlists/<int:list_id>/items/<int:item_id>/move/", views.move_item, name="move_item"),
     path("watchlists/<int:list_id>/reorder/", views.reorder_items, name="reorder_items"),
 
     # Watchlist collaborators
@@ -88,9 +92,12 @@ urlpatterns = [
     path("rooms/join/", rooms.room_join, name="room_join"),
     path("rooms/<int:room_id>/", rooms.room_detail, name="room_detail"),
     path("rooms/<int:room_id>/members/", rooms.room_members, name="room_members"),
+    path("rooms/<int:room_id>/events/", rooms.room_events, name="room_events"),
+    path("rooms/<int:room_id>/events/ticket/", rooms.room_events_ticket, name="room_events_ticket"),
     path("rooms/<int:room_id>/movies/", rooms.room_movies, name="room_movies"),
     path("rooms/<int:room_id>/movies/reorder/", rooms.room_movies_reorder, name="room_movies_reorder"),
     path("rooms/<int:room_id>/movies/<int:movie_id>/", rooms.room_movie_delete, name="room_movie_delete"),
+    path("rooms/<int:room_id>/movies/<int:movie_id>/move/", rooms.room_movie_move, name="room_movie_move"),
     path("rooms/<int:room_id>/movies/<int:movie_id>/vote/", rooms.room_movie_vote, name="room_movie_vote"),
 
     # Auth Email
@@ -2,14 +2,18 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 
-from api.services.tmdb import cache_get, cache_set, midnight_ttl_seconds, collect_discover_pages
+from api.services.tmdb import cache_get, cache_set, midnight_ttl_seconds, collect_discover_variants
 from api.services.mood import (
     MOOD_RULES,
     effective_pins_for,
     effective_keywords_for,
     set_pins_overrides,
     set_keywords_overrides,
-    build_discover_params,
+    DEFAULT_FILTERS,
+    SNAPSHOT_MAX_PAGES,
+    snapshot_base_params,
+    snapshot_variants,
+    snapshot_key,
 )
 
 @api_view(["GET", "POST"])
@@ -55,37 +59,26 @@ def mood_refresh_snapshot(request):
     broad     = (request.data.get("broad") or request.query_params.get("broad") or "").lower() in ("1", "true", "yes")
     purge     = (request.data.get("purge") or request.query_params.get("purge") or "").lower() in ("1", "true", "yes")
 
-    filters = {
-        "year_from": None, "year_to": None, "vote_average_gte": None,
-        "min_votes": None, "runtime_gte": None, "runtime_lte": None,
-        "lang": None, "sort_by": None,
-    }
-
-    base = build_discover_params(mood_key, region=region, providers=providers, types=types_in, page=1, filters=filters)
-    if broad or providers:
-        base = dict(base)
-        base["with_watch_monetization_types"] = "ads,buy,flatrate,free,rent"
-
-    variants = [("strict", dict(base))]
-    if base.get("with_watch_monetization_types") != "ads,buy,flatrate,free,rent":
-        wide = dict(base); wide["with_watch_monetization_types"] = "ads,buy,flatrate,free,rent"
-        variants.append(("strict_wide", wide))
-
-    def _snapkey(bucket, par):
-        ftag = "y- --rt- -mv- -lg- -sb- -va-"
-        return f"snap3:{bucket}:{mood_key}:{region}:{par.get('with_watch_providers','-')}:{par.get('with_watch_monetization_types','-')}:{ftag}:v1"
-
-    keys, sizes = [], []
-    for name, params in variants:
-        k = _snapkey(name, params)
-        keys.append(k)
-        if purge:
-            from django.core.cache import cache
-            cache.delete(k)
-            sizes.append(0)
-        else:
-            snap = collect_discover_pages({**params, "page": 1}, max_pages=5)
-            cache_set(k, snap, midnight_ttl_seconds())
+    # Same keys mood_discover reads for a request without filters - KR 15/10/2025
+    filters = dict(DEFAULT_FILTERS)
+    base = snapshot_base_params(mood_key, region=region, providers=providers, types=types_in,
+                                broad=broad, filters=filters)
+    variants = snapshot_variants(base)
+
+    keys = [snapshot_key(name, mood_key, region, params, filters) for name, params in variants]
+    if purge:
+        from api.services.tmdb import cache_delete
+        for k in keys:
+            cache_delete(k)
+        sizes = [0] * len(keys)
+    else:
+        # build every variant concurrently - KR 14/10/2025
+        snaps = collect_discover_variants([{**params, "page": 1} for _, params in variants],
+                                          max_pages=SNAPSHOT_MAX_PAGES)
+        ttl = midnight_ttl_seconds()
+        sizes = []
+        for k, snap in zip(keys, snaps):
+            cache_set(k, snap, ttl)
             sizes.append(len(snap.get("results", [])))
 
     return Response({"refreshed": (not purge), "purged": purge, "keys": keys, "sizes": sizes,
@@ -98,7 +91,7 @@ def mood_keywords_mutate(request):
     GET  ?mood=feelgood -> returns effective lists
     POST { "mood":"feelgood", "add":["123","456"] } OR { "mood":"feelgood", "remove":["123"] }
     """
-    from api.services.mood import effective_keywords_for, _OVR_KEYWORDS_KEY
+    from api.services.mood import effective_keywords_for, _OVR_KEYWORDS_KEY, _set_overrides
     from django.core.cache import cache
 
     if request.method == "GET":
@@ -127,7 +120,7 @@ def mood_keywords_mutate(request):
         cur = [x for x in cur if x not in rem_set]
 
     kw_ov[mood] = cur
-    cache.set(_OVR_KEYWORDS_KEY, kw_ov, 60 * 60 * 24 * 30)
+    _set_overrides(_OVR_KEYWORDS_KEY, kw_ov)  # also bumps the overrides version
     return Response({"effective": effective_keywords_for(mood), "override": cur}, status=200)
 
 @api_view(["POST"])
@@ -136,7 +129,7 @@ def mood_pins_mutate(request):
     """
     Add/remove a single pinned movie ID for a mood.
     """
-    from api.services.mood import effective_pins_for, _OVR_PINS_KEY
+    from api.services.mood import effective_pins_for, _OVR_PINS_KEY, _set_overrides
     from django.core.cache import cache
 
     mood = (request.data.get("mood") or "").strip()
@@ -158,7 +151,7 @@ def mood_pins_mutate(request):
         cur = [x for x in cur if x != rem]
 
     pins_ov[mood] = cur
-    cache.set(_OVR_PINS_KEY, pins_ov, 60 * 60 * 24 * 30)
+    _set_overrides(_OVR_PINS_KEY, pins_ov)  # also bumps the overrides version
     return Response({"effective": effective_pins_for(mood), "override": cur}, status=200)
 
 @api_view(["POST"])
@@ -167,7 +160,7 @@ def mood_seed_from_movie(request):
     """
     Seed a mood's keyword overrides from a TMDB movie's keywords
     """
-    from api.services.mood import effective_keywords_for, _OVR_KEYWORDS_KEY
+    from api.services.mood import effective_keywords_for, _OVR_KEYWORDS_KEY, _set_overrides
     from django.core.cache import cache
     from api.services.tmdb import tmdb_get
 
@@ -207,7 +200,7 @@ def mood_seed_from_movie(request):
         if kw not in cur:
             cur.insert(0, kw)
     kw_ov[mood] = cur
-    cache.set(_OVR_KEYWORDS_KEY, kw_ov, 60 * 60 * 24 * 30)
+    _set_overrides(_OVR_KEYWORDS_KEY, kw_ov)  # also bumps the overrides version
 
     return Response({
         "mood": mood,
@@ -222,14 +215,15 @@ def clear_all_snapshots(request):
     """
     Remove cached mood snapshot entries (best-effort).
     """
-    from django.core.cache import cache
+    from api.services.tmdb import cache, l1_cache  # snapshots live in the "tmdb" cache alias
+    l1_cache.clear()
     deleted = 0
     mode = "pattern"
     iter_keys = getattr(cache, "iter_keys", None)
 
     try:
         if callable(iter_keys):
-            for pref in ("snap3:", "snap2f:"):
+            for pref in ("snap4:", "ver:snap4:", "stale:snap4:", "snap3:", "snap2f:"):
                 for key in cache.iter_keys(f"{pref}*"):
                     if cache.delete(key):
                         deleted += 1
@@ -1,21 +1,39 @@
+import hashlib
+
+from django.conf import settings
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from api.services.tmdb import (
-    tmdb_get,
+    get_movie_details_many,
+    detail_watch_providers,
+    project_movie_detail,
     cache_get,
+    cache_get_many_versioned,
     cache_set,
+    cache_versions,
+    cache_get_or_build,
+    concurrent_map,
     midnight_ttl_seconds,
     collect_discover_pages,
 )
+from api.services.catalog import catalog_details, local_snapshot
+from api.services.provider_index import provider_index
 from api.services.mood import (
     MOOD_RULES,
-    passes_genre_gate,
-    build_discover_params,
-    effective_pins_for,
-    filter_by_providers,
-    rerank_for_mood,
+    ENRICH_N,
+    SNAPSHOT_MAX_PAGES,
+    snapshot_base_params,
+    snapshot_variants,
+    snapshot_key,
+    merge_snapshot_candidates,
+    compiled_mood,
+    overrides_version,
+    MoodCandidate,
+    filter_candidates_by_providers,
+    filter_candidates_by_cert,
+    rerank_candidates,
 )
 
 # Filters — KR 17/09/2025 (decade removed; year_from/year_to left optional)
@@ -75,102 +93,102 @@ def _parse_filters_from_request(request):
         "sort_by": sort_by,
     }
 
-@api_view(["GET"])
-@permission_classes([IsAuthenticated])  # mood is for logged in users only - KR 01/09/2025
-def mood_discover(request, mood_key: str):
+# Forced-provider rankings that still hold ids the provider index hasn't seen are only kept briefly:
+# the index worker fills those in the background and the next build drops the misses - KR 17/10/2025
+PROVISIONAL_RANK_TTL = 120
+
+_RANKED_FORMAT = 2  # bump when the cached ranked payload changes shape (2: results stored as full cards)
+
+def _ranked_key(mood_key, region, providers, types_in, filters, broad, force_providers, snap_versions,
+                *, cert_strict=False):
+    """Cache key for a fully ranked mood list; None while a snapshot has no version stamp yet."""
+    if any(v is None for v in snap_versions):
+        return None
+    shape = repr((
+        providers, types_in, sorted(filters.items()), bool(broad), bool(force_providers),
+        overrides_version(), tuple(snap_versions), bool(cert_strict), _RANKED_FORMAT,
+    ))
+    digest = hashlib.sha1(shape.encode("utf-8")).hexdigest()[:20]
+    return f"moodrank:{mood_key}:{region}:{digest}"
+
+def _get_snapshots(variants, keys):
     """
-    Mood-based discover with strict genre gating, pins, soft re-ranking, and
-    (optional) provider hard-gate. — Updated KR 23/09/2025
+    (snapshots, version stamps). A stamp is None when that snapshot is not the published value of its key
+    (stale copy, local fallback, empty placeholder); rankings built from it must not be cached.
     """
-    if mood_key not in MOOD_RULES:
-        return Response({"detail": f"Unknown mood '{mood_key}'"}, status=400)
+    # cache hits first; misses are built together (concurrently) - KR 14/10/2025
+    # and single-flighted so only one worker rebuilds after the midnight expiry - KR 15/10/2025
+    hits = cache_get_many_versioned(keys)
+    snaps = [hits.get(k, (None, None))[0] for k in keys]
+    versions = [hits.get(k, (None, None))[1] for k in keys]
+    missing = [i for i, snap in enumerate(snaps) if not snap]
+    if missing:
+        ttl = midnight_ttl_seconds()
 
-    region    = request.query_params.get("region", "GB")
-    providers = request.query_params.get("providers", "")
-    types_in  = request.query_params.get("types", "flatrate,ads,free")
-    page      = max(1, int(request.query_params.get("page", "1") or 1))
-    broad     = request.query_params.get("broad") in ("1", "true", "yes")
-    debug     = request.query_params.get("debug") in ("1", "true", "yes")
-    providers_selected = bool(providers)
-    force_providers    = request.query_params.get("force_providers") in ("1", "true", "yes")
+        # local catalog first (one indexed query each, request thread); TMDB /discover backfills the rest - KR 16/10/2025
+        for i in missing:
+            snap = local_snapshot({**variants[i][1], "page": 1}, max_pages=SNAPSHOT_MAX_PAGES)
+            if snap:
+                versions[i] = cache_set(keys[i], snap, ttl)
+                snaps[i] = snap
+        missing = [i for i in missing if not snaps[i]]
 
-    filters = _parse_filters_from_request(request)
+        def _build(i):
+            par = variants[i][1]
+            return cache_get_or_build(
+                keys[i],
+                lambda: collect_discover_pages({**par, "page": 1}, max_pages=SNAPSHOT_MAX_PAGES),
+                ttl,
+                versioned=True,
+            )
 
-    # 1) Build base params
-    base = build_discover_params(
-        mood_key, region=region, providers=providers, types=types_in, page=1, filters=filters
-    )
+        for i, (snap, ver) in zip(missing, concurrent_map(_build, missing)):
+            snaps[i], versions[i] = (snap, ver) if snap else ({"results": []}, None)
+    return snaps, versions
+
+def _details_for(ids) -> dict:
+    """{id: detail} for enrichment: catalog rows first (when the catalog is on), TMDB detail cache for the rest."""
+    details = catalog_details(ids) if getattr(settings, "MOOD_CATALOG_ENABLED", False) else {}
+    rest = [mid for mid in ids if mid not in details]
+    for mid, (detail, err) in zip(rest, get_movie_details_many(rest)):
+        if not err and detail:
+            details[mid] = detail
+    return details
 
-    # Allow broad monetization when requested / provider-locked
-    if broad or providers_selected:
-        base = dict(base)
-        base["with_watch_monetization_types"] = "ads,buy,flatrate,free,rent"
-
-    # Snapshots (strict + widened monetization variant)
-    def _snapshot_key(bucket_name: str, par: dict):
-        f = filters
-        ftag = (
-            f"y{f.get('year_from','-')}-{f.get('year_to','-')}"
-            f"-rt{f.get('runtime_gte','-')}-{f.get('runtime_lte','-')}"
-            f"-mv{f.get('min_votes','-')}-lg{f.get('lang','-')}"
-            f"-sb{f.get('sort_by','-')}-va{f.get('vote_average_gte','-')}"
-        )
-        return (
-            f"snap4:{bucket_name}:{mood_key}:{region}:"
-            f"{par.get('with_watch_providers','-')}:"
-            f"{par.get('with_watch_monetization_types','-')}:{ftag}:v2"
-        )
-
-    def _get_snapshot(par: dict, bucket_name: str):
-        k = _snapshot_key(bucket_name, par)
-        snap = cache_get(k)
-        if not snap:
-            snap = collect_discover_pages({**par, "page": 1}, max_pages=5)
-            cache_set(k, snap, midnight_ttl_seconds())
-        return snap
-
-    strict      = dict(base)
-    strict_wide = dict(base); strict_wide["with_watch_monetization_types"] = "ads,buy,flatrate,free,rent"
-
-    snap_a = _get_snapshot(strict, "strict")
-    snap_b = _get_snapshot(strict_wide, "strict_wide")
-
-    merged = (snap_a.get("results") or []) + (snap_b.get("results") or [])
+def _rank_mood(mood_key, variants, snap_keys, *, region, providers, broad, force_providers, cert_strict=False):
+    """
+    Snapshots -> dedupe/gate -> enrich -> provider gate -> re-rank -> pins, on compact records.
+    Returns ({"results": [card dicts, ranked], "sizes": {...}}, snapshot version stamps); enrichment blocks
+    are attached here, once per build, so serving a page from the cached payload is a plain slice.
+    """
+    (snap_a, snap_b), snap_versions = _get_snapshots(variants, snap_keys)
 
     # Dedupe, then apply strict server-side genre gate
-    seen, candidates = set(), []
-    for m in merged:
-        mid = m.get("id")
-        if not mid or mid in seen:
-            continue
-        if not passes_genre_gate(mood_key, m):
-            continue
-        seen.add(mid)
-        candidates.append(m)
+    candidates = merge_snapshot_candidates(mood_key, [snap_a, snap_b])
 
     # Enrich first N for provider/cert fairness in re-rank
-    ENRICH_N = 60
-    if candidates:
-        for i, m in enumerate(candidates[:ENRICH_N]):
-            mid = m.get("id")
-            if not mid:
-                continue
-            detail, err = tmdb_get(
-                f"/movie/{mid}",
-                {"append_to_response": "watch/providers,release_dates"}
-            )
-            if not err and detail:
-                m["_detail"] = {
-                    "release_dates": (detail.get("release_dates") or {})
-                }
-                m["watch_providers"] = (detail.get("watch/providers") or {}).get("results", {})
+    to_enrich = [c for c in candidates[:ENRICH_N] if c.id]
+    details = {}
+    if to_enrich:
+        # shared detail cache; misses fetched in one concurrent batch - KR 15/10/2025
+        # catalog movies are enriched from their catalog rows instead - KR 17/10/2025
+        details = _details_for([c.id for c in to_enrich])
+        for c in to_enrich:
+            if c.id in details:
+                c.attach_detail(details[c.id])
 
-    # Provider hard gate (optional)
+    # Certification hard cap (optional; enriched candidates only) - KR 16/10/2025
+    if cert_strict:
+        candidates = filter_candidates_by_cert(mood_key, candidates)
+
+    # Provider hard gate (optional; index lookups only, unknown ids kept and queued)
+    provisional = False
     if providers and force_providers:
-        candidates = filter_by_providers(candidates, region=region, providers_csv=providers, limit_checks=60)
+        candidates = filter_candidates_by_providers(candidates, region=region, providers_csv=providers)
+        provisional = any(c.providers is None and not provider_index.knows(c.id) for c in candidates)
 
     # Soft mood & provider re-rank
-    candidates = rerank_for_mood(
+    candidates = rerank_candidates(
         mood_key,
         candidates,
         region=region,
@@ -179,22 +197,107 @@ def mood_discover(request, mood_key: str):
     )
 
     # Apply pins
-    pins = effective_pins_for(mood_key)
+    pins = compiled_mood(mood_key).pins_order
     order = {mid: i for i, mid in enumerate(pins)}
-    existing_ids = {m.get("id") for m in candidates if m.get("id")}
+    existing_ids = {c.id for c in candidates if c.id}
     appended = []
-    for mid in [mid for mid in pins if mid not in existing_ids][:5]:
-        detail, err = tmdb_get(f"/movie/{mid}", {"append_to_response": "watch/providers"})
+    missing_pins = [mid for mid in pins if mid not in existing_ids][:5]
+    for detail, err in get_movie_details_many(missing_pins):
         if not err and detail:
-            wp = (detail.get("watch/providers") or {}).get("results", {})
+            wp = detail_watch_providers(detail)
             if region in wp or "US" in wp:
-                appended.append(detail)
+                appended.append(project_movie_detail(detail, include=("watch/providers",)))
+
+    # Card fields for every enriched candidate
+    late = [c.id for c in candidates if c.providers is not None and c.id not in details]
+    if late:
+        details.update(_details_for(late))
 
-    merged2 = candidates + appended
+    merged2 = [c.hydrate(details.get(c.id)) for c in candidates] + appended
 
     def pin_key(m): return (order.get(m.get("id"), 10_000),)
     merged2.sort(key=pin_key)
 
+    return {
+        "results": merged2,
+        "sizes": {"strict": len(snap_a.get("results", []) or []),
+                  "strict_wide": len(snap_b.get("results", []) or [])},
+        "provisional": provisional,
+    }, snap_versions
+
+def ranked_mood(mood_key, variants, snap_keys, *, region, providers, types_in, filters, broad,
+                force_providers, cert_strict=False, ttl=None):
+    """
+    Cached ranked payload for one request shape, built (and cached) on a miss.
+    Shared by mood_discover and prewarm_mood_snapshots so both read/write the same moodrank: keys. - KR 17/10/2025
+    """
+    ranked_key = _ranked_key(
+        mood_key, region, providers, types_in, filters, broad, force_providers, cache_versions(snap_keys),
+        cert_strict=cert_strict,
+    )
+    ranked = cache_get(ranked_key) if ranked_key else None
+    if ranked is not None:
+        return ranked
+
+    ranked, used_versions = _rank_mood(
+        mood_key, variants, snap_keys,
+        region=region, providers=providers, broad=broad, force_providers=force_providers,
+        cert_strict=cert_strict,
+    )
+    # keyed by the snapshots this ranking was built from (None if any was stale -> not cached),
+    # never by whatever versions are current now - KR 17/10/2025
+    ranked_key = _ranked_key(
+        mood_key, region, providers, types_in, filters, broad, force_providers, used_versions,
+        cert_strict=cert_strict,
+    )
+    if ranked_key:
+        if ranked.get("provisional"):
+            ttl = PROVISIONAL_RANK_TTL
+        cache_set(ranked_key, ranked, ttl or midnight_ttl_seconds())
+    return ranked
+
+def _page(ranked, start, end):
+    """One page of cards from the ranked payload (copies, so the cached lists are never mutated)."""
+    return [dict(m) for m in ranked["results"][start:end]]
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])  # mood is for logged in users only - KR 01/09/2025
+def mood_discover(request, mood_key: str):
+    """
+    Mood-based discover with strict genre gating, pins, soft re-ranking, and
+    (optional) provider hard-gate. — Updated KR 23/09/2025
+    """
+    if mood_key not in MOOD_RULES:
+        return Response({"detail": f"Unknown mood '{mood_key}'"}, status=400)
+
+    region    = request.query_params.get("region", "GB")
+    providers = request.query_params.get("providers", "")
+    types_in  = request.query_params.get("types", "flatrate,ads,free")
+    page      = max(1, int(request.query_params.get("page", "1") or 1))
+    broad     = request.query_params.get("broad") in ("1", "true", "yes")
+    debug     = request.query_params.get("debug") in ("1", "true", "yes")
+    force_providers    = request.query_params.get("force_providers") in ("1", "true", "yes")
+    cert_strict        = request.query_params.get("cert_strict") in ("1", "true", "yes")
+
+    filters = _parse_filters_from_request(request)
+
+    # 1) Build base params (broad monetization when requested / provider-locked)
+    base = snapshot_base_params(
+        mood_key, region=region, providers=providers, types=types_in, broad=broad, filters=filters
+    )
+    variants  = snapshot_variants(base)
+    snap_keys = [snapshot_key(name, mood_key, region, par, filters) for name, par in variants]
+
+    # 2) Fully ranked list is cached per request shape + snapshot versions + overrides version,
+    #    so page 2, 3, ... are plain slices. - KR 16/10/2025
+    ranked = ranked_mood(
+        mood_key, variants, snap_keys,
+        region=region, providers=providers, types_in=types_in, filters=filters,
+        broad=broad, force_providers=force_providers, cert_strict=cert_strict,
+    )
+
+    merged2 = ranked["results"]
+
     # Paginate (20/page)
     PAGE_SIZE = 20
     start = (page - 1) * PAGE_SIZE
@@ -204,7 +307,7 @@ def mood_discover(request, mood_key: str):
 
     payload = {
         "page": page,
-        "results": merged2[start:end],
+        "results": _page(ranked, start, end),
         "total_pages": total_pages,
         "total_results": total_results,
     }
@@ -212,11 +315,11 @@ def mood_discover(request, mood_key: str):
     if debug:
         payload["_mood"]    = mood_key
         payload["_filters"] = filters
-        payload["_sizes"]   = {"strict": len(snap_a.get("results", []) or []),
-                               "strict_wide": len(snap_b.get("results", []) or [])}
+        payload["_sizes"]   = ranked["sizes"]
         payload["_picked_examples"] = [r.get("id") for r in merged2[:10]]
         payload["_force_providers"] = bool(force_providers)
         payload["_providers"]       = providers
         payload["_broad"]           = bool(broad)
+        payload["_cert_strict"]     = bool(cert_strict)
 
     return Response(payload, status=200)
\ No newline at end of file
@@ -1,6 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.core import signing
-from django.core.cache import cache
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
 from django.utils.crypto import get_random_string
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
@@ -13,6 +14,8 @@ from ..email_utils import send_password_reset_email
 
 User = get_user_model()
 
+cache = ConnectionProxy(caches, "security")  # rate-limit keys shared across workers
+
 def _rate_key(email): return f"pwreset:rate:{(email or '').strip().lower()}"
 
 @api_view(["POST"])
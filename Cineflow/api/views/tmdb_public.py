@@ -1,14 +1,20 @@
-from io import BytesIO
 import re
-from PIL import Image
-from colorthief import ColorThief
 
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from rest_framework.throttling import UserRateThrottle
 
-from api.services.tmdb import tmdb_get, cache_get, cache_set
+from api.services.tmdb import (
+    tmdb_get, cache_get, cache_set, cache_get_swr,
+    get_movie_detail, get_movie_details_many, project_movie_detail, detail_watch_providers,
+)
+from api.services.palette import get_palette, get_palettes_many, PosterNotImage, PALETTE_BATCH_MAX
+
+# Homepage rails: served stale-while-revalidate, so only a cold cache ever waits on TMDB - KR 15/10/2025
+RAIL_SOFT_TTL = 60 * 10
+RAIL_HARD_TTL = 60 * 60 * 24
 
 # Pre-validate the incoming TMDB path for safety - KR 26/08/2025
 _TMDB_PATH_RE = re.compile(r"^/t/p/(original|w500|w780|w342|w154|w92)/[A-Za-z0-9._-]+$")
@@ -21,34 +27,47 @@ def poster_palette(request):
     Extract a small color palette (3 swatches) from a TMDB poster image.
     Query: ?path=/t/p/w500/abcdef.jpg
     Returns: {"palette": [[r,g,b],[r,g,b],[r,g,b]]}  - KR 26/08/2025
+    Cached per poster file (cache + PosterPalette table); only a never-seen poster is downloaded. - KR 16/10/2025
     """
-    import requests
-
     path = request.query_params.get("path", "")
     if not path or not _TMDB_PATH_RE.match(path):
         return Response({"detail": "Invalid or missing TMDB path"}, status=400)
 
-    url = f"https://image.tmdb.org{path}"
     try:
-        r = requests.get(url, timeout=8)
-        r.raise_for_status()
-        ctype = r.headers.get("Content-Type", "")
-        if "image" not in ctype:
-            return Response({"detail": "TMDB did not return an image", "ctype": ctype}, status=502)
-
-        img = Image.open(BytesIO(r.content)).convert("RGB")
-        bio = BytesIO(); img.save(bio, format="PNG"); bio.seek(0)
-
-        ct = ColorThief(bio)
-        palette = ct.get_palette(color_count=3, quality=10) or []
-        palette = [list(s) for s in palette][:3]
-        while len(palette) < 2:
-            palette.append([20, 20, 20])
-
-        return Response({"palette": palette}, status=200)
+        return Response({"palette": get_palette(path)}, status=200)
+    except PosterNotImage as e:
+        return Response({"detail": "TMDB did not return an image", "ctype": e.ctype}, status=502)
     except Exception as e:
         return Response({"detail": "Palette extraction failed", "error": str(e)}, status=500)
 
+# batch poster palettes - KR 16/10/2025
+class PaletteBatchThrottle(UserRateThrottle):  # per user, or per IP when anonymous - KR 17/10/2025
+    scope = "palette_batch"
+
+@api_view(["GET", "POST"])
+@permission_classes([AllowAny])
+@throttle_classes([PaletteBatchThrottle])  # up to PALETTE_BATCH_MAX poster downloads per call
+def poster_palette_batch(request):
+    """
+    Palettes for many posters in one call (same cache as poster_palette).
+    Query: ?paths=/t/p/w500/a.jpg,/t/p/w342/b.jpg   or POST {"paths": [...]}   (max PALETTE_BATCH_MAX)
+    Returns: {"palettes": {"<path>": [[r,g,b], ...] or null}}
+    """
+    if request.method == "POST":
+        paths = request.data.get("paths") or []
+        if not isinstance(paths, list):
+            return Response({"detail": "paths must be a list"}, status=400)
+    else:
+        paths = [p for p in request.query_params.get("paths", "").split(",") if p]
+    paths = list(dict.fromkeys(str(p).strip() for p in paths))
+
+    if not paths or not all(_TMDB_PATH_RE.match(p) for p in paths):
+        return Response({"detail": "Invalid or missing TMDB paths"}, status=400)
+    if len(paths) > PALETTE_BATCH_MAX:
+        return Response({"detail": f"At most {PALETTE_BATCH_MAX} paths per request"}, status=400)
+
+    return Response({"palettes": get_palettes_many(paths)}, status=200)
+
 # trending
 @api_view(["GET"])
 @permission_classes([AllowAny])
@@ -57,12 +76,12 @@ def trending_movies(request):
     Returns trending movies of the week from TMDB.
     """
     cache_key = "tmdb:trending:movie:week"
-    data = cache_get(cache_key)
-    if not data:
-        data, err = tmdb_get("/trending/movie/week")
-        if err:
-            return err
-        cache_set(cache_key, data, 60 * 10)
+    data, err = cache_get_swr(
+        cache_key, lambda: tmdb_get("/trending/movie/week"),
+        soft_ttl=RAIL_SOFT_TTL, hard_ttl=RAIL_HARD_TTL,
+    )
+    if err:
+        return err
     return Response(data, status=200)
 
 # search by title
@@ -87,18 +106,18 @@ def search_movies(request):
 def now_playing(request):
     """
     What's on in cinemas (TMDB /movie/now_playing)
-    Cached for 10 minutes to reduce TMDB calls. - KR 21/08/2025
+    Fresh for 10 minutes, then served stale while refreshing in the background. - KR 15/10/2025
     """
     region = request.query_params.get("region", "US")
     page = request.query_params.get("page", "1")
 
     cache_key = f"tmdb:now_playing:{region}:p{page}"
-    data = cache_get(cache_key)
-    if not data:
-        data, err = tmdb_get("/movie/now_playing", {"region": region, "page": page})
-        if err:
-            return err
-        cache_set(cache_key, data, 60 * 10)
+    data, err = cache_get_swr(
+        cache_key, lambda: tmdb_get("/movie/now_playing", {"region": region, "page": page}),
+        soft_ttl=RAIL_SOFT_TTL, hard_ttl=RAIL_HARD_TTL,
+    )
+    if err:
+        return err
     return Response(data, status=200)
 
 # streaming discover
@@ -129,16 +148,13 @@ def streaming_trending(request):
         params["with_watch_providers"] = providers
 
     cache_key = f"tmdb:streaming:{region}:{providers}:{types}:p{page}"
-    data = cache_get(cache_key)
-    if not data:
-        data, err = tmdb_get("/discover/movie", params)
-        if err:
-            return err
-        if debug:
-            data = dict(data)
-            data["_debug_params"] = params
-        cache_set(cache_key, data, 60 * 10)
-    elif debug:
+    data, err = cache_get_swr(
+        cache_key, lambda: tmdb_get("/discover/movie", params),
+        soft_ttl=RAIL_SOFT_TTL, hard_ttl=RAIL_HARD_TTL,
+    )
+    if err:
+        return err
+    if debug:
         d = dict(data)
         d["_debug_params"] = params
         return Response(d, status=200)
@@ -151,12 +167,12 @@ def streaming_trending(request):
 def providers_movies(request):
     region = request.query_params.get("region", "US")
     cache_key = f"tmdb:providers:movie:{region}"
-    data = cache_get(cache_key)
-    if not data:
-        data, err = tmdb_get("/watch/providers/movie", {"watch_region": region})
-        if err:
-            return err
-        cache_set(cache_key, data, 60 * 60)  # 1 hour
+    data, err = cache_get_swr(
+        cache_key, lambda: tmdb_get("/watch/providers/movie", {"watch_region": region}),
+        soft_ttl=60 * 60, hard_ttl=RAIL_HARD_TTL * 7,  # provider catalog barely changes
+    )
+    if err:
+        return err
     return Response(data, status=200)
 
 # people -> credits
@@ -214,36 +230,59 @@ def person_movies(request):
 def movie_detail(request, tmdb_id: int):
     """
     Return a single movie's detail and credits merged into one payload.
-    Cached for 30 minutes to reduce API calls. - KR 26/08/2025
     Now includes trailers and watch/providers via append_to_response. - KR 26/08/2025
+    Served from the shared per-movie detail cache (region block projected per request). - KR 15/10/2025
     """
     region = request.query_params.get("region", "IE").upper()
 
-    cache_key = f"tmdb:movie:{tmdb_id}:detail+credits+videos+providers:{region}"
-    data = cache_get(cache_key)
-    if data:
-        return Response(data, status=200)
-
-    params = {"append_to_response": "videos,credits,watch/providers"}
-    details, err = tmdb_get(f"/movie/{tmdb_id}", params)
+    details, err = get_movie_detail(tmdb_id)
     if err:
         return err
 
-    merged = details or {}
+    merged = project_movie_detail(details, include=("videos", "credits", "watch/providers"))
     merged["credits"] = (merged.get("credits") or {"cast": [], "crew": []})
 
-    wp = merged.get("watch/providers") or {}
-    try:
-        region_block = (wp.get("results", {}) or {}).get(region) \
-                       or (wp.get("results", {}) or {}).get("US") \
-                       or {}
-    except Exception:
-        region_block = {}
-    merged["providers"] = region_block
-
-    cache_set(cache_key, merged, 60 * 30)
+    wp = detail_watch_providers(details)
+    merged["providers"] = wp.get(region) or wp.get("US") or {}
+
     return Response(merged, status=200)
 
+# batch provider lookup for cards - KR 16/10/2025
+PROVIDERS_BATCH_MAX = 60
+_PROVIDER_BLOCK_KEYS = ("link", "flatrate", "ads", "free", "rent", "buy")
+
+class ProvidersBatchThrottle(UserRateThrottle):  # per user, or per IP when anonymous - KR 17/10/2025
+    scope = "providers_batch"
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+@throttle_classes([ProvidersBatchThrottle])  # up to PROVIDERS_BATCH_MAX detail lookups per call
+def movie_providers_batch(request):
+    """
+    Watch providers for many movies in one call (just the region block per id, no credits/videos).
+    Query: ?ids=550,27205,155&region=GB   (max PROVIDERS_BATCH_MAX ids)
+    Returns: {"region": "GB", "results": {"550": {...buckets...}, ...}}; ids TMDB couldn't serve map to null.
+    Served from the shared per-movie detail cache; misses are fetched concurrently.
+    """
+    region = request.query_params.get("region", "IE").upper()
+    raw_ids = [x.strip() for x in request.query_params.get("ids", "").split(",") if x.strip()]
+    if not raw_ids or not all(x.isdigit() for x in raw_ids):
+        return Response({"detail": "ids must be a comma-separated list of TMDB ids"}, status=400)
+    ids = list(dict.fromkeys(int(x) for x in raw_ids))
+    if len(ids) > PROVIDERS_BATCH_MAX:
+        return Response({"detail": f"At most {PROVIDERS_BATCH_MAX} ids per request"}, status=400)
+
+    results = {}
+    for mid, (details, err) in zip(ids, get_movie_details_many(ids)):
+        if err or not details:
+            results[str(mid)] = None
+            continue
+        wp = detail_watch_providers(details)
+        block = wp.get(region) or wp.get("US") or {}  # same fallback as movie_detail
+        results[str(mid)] = {k: block[k] for k in _PROVIDER_BLOCK_KEYS if k in block}
+
+    return Response({"region": region, "results": results}, status=200)
+
 # registration passthrough
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
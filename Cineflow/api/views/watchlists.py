@@ -1,6 +1,5 @@
 from django.db import IntegrityError  # This is raised when a database rule such as a unique constraint is violated. Used to catch "movie already in this list". - KR 23/09/2025
 from django.db import transaction      # bulk reorder - KR 26/09/2025
-from django.db.models import Case, When, Max 
 from django.db.models import F
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import api_view, permission_classes  # Turn functions into API endpoints(@api_view) and set access rules. - KR 23/09/2025
@@ -13,7 +12,9 @@ from ..serializers import (
     WatchlistItemSerializer,
     WatchlistItemCreateSerializer,  # used for input validation when adding an item
     ReorderSerializer,              # bulk reorder payload validator - KR 26/09/2025
+    MoveSerializer,                 # single-item drag payload - KR 16/10/2025
 )
+from ..services.ranking import MoveError, move_between, renumber
 
 # Allowed statuses for item state machine (UI: Will Watch / Watched / Dropped)
 ALLOWED_ITEM_STATUSES = {"planned", "watching", "watched", "dropped"}  # keep in sync with frontend - KR 26/09/2025
@@ -94,9 +95,6 @@ def add_item(request, list_id):         # list_id = the watchlist id
     """
     wl = _owned_watchlist_or_404(request, list_id)  # 404 if not found or not owned
 
-    # Determine next position (append to end) - KR 26/09/2025
-    next_pos = (WatchlistItem.objects.filter(watchlist=wl).aggregate(m=Max("position"))["m"] or 0) + 1
-
     ser = WatchlistItemCreateSerializer(data=request.data)  # validate the incoming item data
     if not ser.is_valid():
         return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -110,7 +108,7 @@ def add_item(request, list_id):         # list_id = the watchlist id
                 "title": ser.validated_data["title"],
                 "poster_path": ser.validated_data.get("poster_path", ""),
                 "status": "planned",                                     # default state on add - KR 26/09/2025
-                "position": next_pos,                                    # append at end - KR 26/09/2025
+                # position left at 0: WatchlistItem.save appends at the tail, only when actually inserting - KR 16/10/2025
             }
         )
     except IntegrityError:
@@ -225,17 +223,41 @@ def reorder_items(request, list_id):
             new_order.append(i)
             seen.add(i)
 
-    # Lock affected rows and update positions in a single query - KR 27/09/2025
-    when_list = [When(id=item_id, then=pos) for pos, item_id in enumerate(new_order, start=1)]
+    # Lock affected rows and update positions in a single query (GAP-spaced, see services/ranking) - KR 27/09/2025
     with transaction.atomic():
-        (WatchlistItem.objects
-            .select_for_update()
-            .filter(watchlist=wl, id__in=new_order)
-            .update(position=Case(*when_list))
-        )
+        items = WatchlistItem.objects.select_for_update().filter(watchlist=wl)
+        renumber(items, new_order)
         # touch parent to bump ordering in list view - KR 27/09/2025
         Watchlist.objects.filter(id=wl.id).update(updated_at=F("updated_at"))
 
     # Serializer Meta/related manager should return items ordered by position - KR 27/09/2025
     data = WatchlistSerializer(wl).data
-    return Response(data, status=status.HTTP_200_OK)
\ No newline at end of file
+    return Response(data, status=status.HTTP_200_OK)
+
+
+# ---------- Move one item (drag and drop) ----------
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def move_item(request, list_id, item_id):
+    """
+    Move one item between two neighbours; only that row's position changes.
+    Body: { "after": item_id|null, "before": item_id|null } (at least one) - KR 16/10/2025
+    """
+    wl = _owned_watchlist_or_404(request, list_id)
+    item = get_object_or_404(WatchlistItem, pk=item_id, watchlist=wl)
+
+    ser = MoveSerializer(data=request.data)
+    if not ser.is_valid():
+        return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        with transaction.atomic():
+            move_between(
+                WatchlistItem.objects.filter(watchlist=wl), item,
+                after=ser.validated_data.get("after"), before=ser.validated_data.get("before"),
+            )
+            Watchlist.objects.filter(id=wl.id).update(updated_at=F("updated_at"))
+    except MoveError as exc:
+        return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(WatchlistItemSerializer(item).data, status=status.HTTP_200_OK)
@@ -1,32 +1,58 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.db import transaction
-from django.db.models import Case, When, Sum, Q
+from django.db.models import Q, prefetch_related_objects
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 
 from ..models import (
-    Room, RoomMembership, RoomMovie, WatchRoomVote,
+    Room, RoomMembership, RoomMovie,
     Watchlist, WatchlistCollaborator
 )
 
 from ..serializers import (
     RoomSerializer, RoomCreateSerializer, RoomMembershipSerializer,
     RoomJoinSerializer, RoomMovieSerializer, RoomAddMovieSerializer,
-    RoomReorderSerializer, RoomVoteSerializer,
-    WatchlistCollaboratorSerializer, WatchlistCollaboratorInviteSerializer
+    RoomReorderSerializer, RoomVoteSerializer, MoveSerializer,
+    WatchlistCollaboratorSerializer, WatchlistCollaboratorInviteSerializer,
+    room_prefetches,
 )
+from ..services.room_events import TICKET_TTL, broker, emit, format_sse, issue_ticket, redeem_ticket, subscribe
+from ..services.room_enrichment import fields_from_cache, room_enricher
+from ..services.ranking import MoveError, move_between, renumber, tail_position
+from ..services.room_votes import cast_vote, retract_vote
 
 # helpers - KR 29/09/2025
 
 def _member_or_404(user, room_id) -> Room:
     """Ensure the user is a member of the room, otherwise 404 - KR 29/09/2025"""
     room = get_object_or_404(Room, id=room_id, is_active=True)
-    # raises DoesNotExist -> 404 if not a member
-    RoomMembership.objects.get(room=room, user=user)
+    # 404 if not a member
+    get_object_or_404(RoomMembership, room=room, user=user)
     return room
 
+def _enrich_bare(movies) -> None:
+    """Queue room rows still missing title/poster for background enrichment (after commit) - KR 17/10/2025"""
+    bare = [rm.tmdb_id for rm in movies if not (rm.title and rm.poster_path)]
+    if bare:
+        transaction.on_commit(lambda: room_enricher.enqueue(bare))
+
+def _room_payload(room: Room, request) -> dict:
+    """RoomSerializer data with members/movies prefetched (constant query count) - KR 16/10/2025"""
+    prefetch_related_objects([room], *room_prefetches())
+    _enrich_bare(room.ranked_movies)
+    return RoomSerializer(room, context={"request": request}).data
+
 def _owner_only(user, room: Room) -> None:
     """Only owner can mutate certain room fields - KR 30/09/2025"""
     if room.owner_id != user.id:
@@ -48,8 +74,11 @@ def my_rooms(request):
             .filter(Q(owner=request.user) | Q(memberships__user=request.user))
             .distinct()
             .order_by("-created_at")
+            .prefetch_related(*room_prefetches())
         )
-        data = RoomSerializer(qs, many=True, context={"request": request}).data
+        rooms = list(qs)
+        _enrich_bare(rm for room in rooms for rm in room.ranked_movies)
+        data = RoomSerializer(rooms, many=True, context={"request": request}).data
         return Response(data, status=status.HTTP_200_OK)
 
     ser = RoomCreateSerializer(data=request.data, context={"request": request})
@@ -62,10 +91,7 @@ def my_rooms(request):
         room=room, user=request.user, defaults={"is_host": True}
     )
 
-    return Response(
-        RoomSerializer(room, context={"request": request}).data,
-        status=status.HTTP_201_CREATED
-    )
+    return Response(_room_payload(room, request), status=status.HTTP_201_CREATED)
 
 # Room detail (view/update/delete)
 
@@ -80,10 +106,7 @@ def room_detail(request, room_id):
     room = _member_or_404(request.user, room_id)
 
     if request.method == "GET":
-        return Response(
-            RoomSerializer(room, context={"request": request}).data,
-            status=status.HTTP_200_OK
-        )
+        return Response(_room_payload(room, request), status=status.HTTP_200_OK)
 
     if request.method == "PATCH":
         _owner_only(request.user, room)
@@ -91,10 +114,7 @@ def room_detail(request, room_id):
         if not ser.is_valid():
             return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
         ser.save()
-        return Response(
-            RoomSerializer(room, context={"request": request}).data,
-            status=status.HTTP_200_OK
-        )
+        return Response(_room_payload(room, request), status=status.HTTP_200_OK)
 
     # DELETE (soft)
     _owner_only(request.user, room)
@@ -115,11 +135,13 @@ def room_join(request):
         return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
 
     room = get_object_or_404(Room, invite_code=ser.validated_data["invite_code"], is_active=True)
-    RoomMembership.objects.get_or_create(room=room, user=request.user)
-    return Response(
-        RoomSerializer(room, context={"request": request}).data,
-        status=status.HTTP_200_OK
-    )
+    membership, joined = RoomMembership.objects.get_or_create(room=room, user=request.user)
+    if joined:
+        emit(room.id, "member_joined", {
+            "id": membership.id, "user_id": request.user.id, "username": request.user.username,
+            "is_host": membership.is_host,
+        })
+    return Response(_room_payload(room, request), status=status.HTTP_200_OK)
 
 # Room members list
 
@@ -130,33 +152,6 @@ def room_members(request, room_id):
     qs = RoomMembership.objects.filter(room=room).select_related("user").order_by("-is_host", "joined_at")
     return Response(RoomMembershipSerializer(qs, many=True).data, status=status.HTTP_200_OK)
 
-from django.conf import settings
-import requests
-
-def _fetch_tmdb_detail(tmdb_id: int) -> dict:
-    key = getattr(settings, "TMDB_API_KEY", None)
-    if not key:
-        return {}
-    try:
-        r = requests.get(
-            f"https://api.themoviedb.org/3/movie/{int(tmdb_id)}",
-            params={"api_key": key, "language": "en-US"},
-            timeout=5,
-        )
-        if r.ok:
-            return r.json() or {}
-    except Exception:
-        pass
-    return {}
-
-def _enrich_fields_if_missing(tmdb_id: int, title: str, poster_path: str):
-    if title and poster_path:
-        return title, poster_path
-    md = _fetch_tmdb_detail(tmdb_id)
-    t = title or md.get("title") or md.get("name") or ""
-    p = poster_path or (md.get("poster_path") or "")
-    return t, p
-
 # Room movies: add / list
 
 @api_view(["GET", "POST"])
@@ -169,18 +164,10 @@ def room_movies(request, room_id):
     room = _member_or_404(request.user, room_id)
 
     if request.method == "GET":
-        qs = RoomMovie.objects.filter(room=room).order_by("position", "-added_at")
-
-        dirty = []
-        for rm in qs:
-            if not (rm.title and rm.poster_path):
-                t, p = _enrich_fields_if_missing(rm.tmdb_id, rm.title or "", rm.poster_path or "")
-                if (t and t != rm.title) or (p and p != rm.poster_path):
-                    rm.title = t
-                    rm.poster_path = p
-                    dirty.append(rm)
-        if dirty:
-            RoomMovie.objects.bulk_update(dirty, ["title", "poster_path"])
+        qs = list(RoomMovie.objects.filter(room=room).order_by("position", "-added_at"))
+
+        # rows still missing metadata are filled in the background; respond with what we have - KR 16/10/2025
+        _enrich_bare(qs)
 
         return Response(RoomMovieSerializer(qs, many=True).data, status=status.HTTP_200_OK)
 
@@ -188,19 +175,9 @@ def room_movies(request, room_id):
     if not ser.is_valid():
         return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    # next position at tail - KR 29/09/2025
-    last_pos = (
-        RoomMovie.objects
-        .filter(room=room)
-        .order_by("-position")
-        .values_list("position", flat=True)
-        .first()
-        or 0
-    )
-
     raw_title = ser.validated_data.get("title") or ""
     raw_poster = ser.validated_data.get("poster_path") or ""
-    final_title, final_poster = _enrich_fields_if_missing(
+    final_title, final_poster = fields_from_cache(
         int(ser.validated_data["tmdb_id"]), raw_title, raw_poster
     )
 
@@ -210,9 +187,13 @@ def room_movies(request, room_id):
         title=final_title,
         poster_path=final_poster,
         added_by=request.user,
-        position=last_pos + 1,
+        position=tail_position(RoomMovie.objects.filter(room=room)),  # next position at tail (gapped) - KR 16/10/2025
     )
-    return Response(RoomMovieSerializer(movie).data, status=status.HTTP_201_CREATED)
+    if not (final_title and final_poster):
+        transaction.on_commit(lambda: room_enricher.enqueue([movie.tmdb_id]))
+    data = RoomMovieSerializer(movie).data
+    emit(room.id, "movie_added", data)
+    return Response(data, status=status.HTTP_201_CREATED)
 
 #  Reorder room movies 
 
@@ -230,34 +211,71 @@ def room_movies_reorder(request, room_id):
     if len(owned_ids) != len(ids):
         return Response({"detail": "Order contains invalid IDs for this room."}, status=status.HTTP_400_BAD_REQUEST)
 
-    whens = [When(id=item_id, then=pos) for pos, item_id in enumerate(ids, start=1)]
     with transaction.atomic():
-        RoomMovie.objects.filter(id__in=ids).update(position=Case(*whens))
+        renumber(RoomMovie.objects.filter(room=room), ids)
+    emit(room.id, "movies_reordered", {"order": ids})
 
     qs = RoomMovie.objects.filter(room=room).order_by("position", "-added_at")
     return Response(RoomMovieSerializer(qs, many=True).data, status=status.HTTP_200_OK)
 
-# Vote up/down on a room movie
+# Move one room movie (drag and drop) - KR 16/10/2025
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
-def room_movie_vote(request, room_id, movie_id):
+def room_movie_move(request, room_id, movie_id):
     """
-    POST { value: 1|-1 } -> up/down vote - KR 30/09/2025
+    POST { after: id|null, before: id|null } -> place the movie between two neighbours.
+    Only that row's position changes (bar a rare renumber); other members get a movie_moved event.
     """
     room = _member_or_404(request.user, room_id)
     movie = get_object_or_404(RoomMovie, id=movie_id, room=room)
 
-    ser = RoomVoteSerializer(data=request.data)
+    ser = MoveSerializer(data=request.data)
     if not ser.is_valid():
         return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    vote, _ = WatchRoomVote.objects.update_or_create(
-        room_movie=movie,
-        user=request.user,
-        defaults={"value": ser.validated_data["value"]},
-    )
-    return Response({"id": vote.id, "value": vote.value}, status=status.HTTP_200_OK)
+    siblings = RoomMovie.objects.filter(room=room)
+    try:
+        rebalanced = move_between(
+            siblings, movie,
+            after=ser.validated_data.get("after"), before=ser.validated_data.get("before"),
+        )
+    except MoveError as exc:
+        return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if rebalanced:  # every position changed; send the whole order once
+        order = list(siblings.order_by("position", "-added_at").values_list("id", flat=True))
+        emit(room.id, "movies_reordered", {"order": order})
+    else:
+        emit(room.id, "movie_moved", {"id": movie.id, "position": movie.position})
+    return Response(RoomMovieSerializer(movie).data, status=status.HTTP_200_OK)
+
+# Vote up/down on a room movie
+
+@api_view(["POST", "DELETE"])
+@permission_classes([IsAuthenticated])
+def room_movie_vote(request, room_id, movie_id):
+    """
+    POST { value: 1|-1 } -> up/down vote - KR 30/09/2025
+    DELETE               -> take the vote back
+    Both return the movie's updated score / up_count / down_count - KR 16/10/2025
+    """
+    room = _member_or_404(request.user, room_id)
+    movie = get_object_or_404(RoomMovie, id=movie_id, room=room)
+
+    if request.method == "DELETE":
+        retract_vote(movie, request.user)
+        vote_id, value = None, 0
+    else:
+        ser = RoomVoteSerializer(data=request.data)
+        if not ser.is_valid():
+            return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
+        vote = cast_vote(movie, request.user, ser.validated_data["value"])
+        vote_id, value = vote.id, vote.value
+
+    totals = {"score": movie.score, "up_count": movie.up_count, "down_count": movie.down_count}
+    emit(room.id, "movie_scored", {"id": movie.id, **totals})
+    return Response({"id": vote_id, "value": value, **totals}, status=status.HTTP_200_OK)
 
 @api_view(["DELETE"])
 @permission_classes([IsAuthenticated])
@@ -265,8 +283,80 @@ def room_movie_delete(request, room_id, movie_id):
     room = _member_or_404(request.user, room_id)
     movie = get_object_or_404(RoomMovie, id=movie_id, room=room)
     movie.delete()
+    emit(room.id, "movie_removed", {"id": movie_id})
     return Response(status=status.HTTP_204_NO_CONTENT)
 
+# Room event stream (Server-Sent Events) - KR 16/10/2025
+# POST /api/rooms/<id>/events/ticket/ (normal JWT auth) -> single-use ticket, then
+# GET  /api/rooms/<id>/events/?ticket=<ticket> streams the delta events the views above emit, so open
+# room pages stay current without polling. The stream is async: it is only served when the site runs
+# under ASGI (see cineflow/asgi.py); under WSGI it answers 503 and clients keep polling.
+
+ROOM_EVENTS_HEARTBEAT = 20  # seconds between keep-alive comments
+_NO_STREAM = "Live updates are not available on this server; poll the room instead."
+
+def _can_stream(request) -> bool:
+    # WSGI would buffer the endless stream before sending a byte and pin the worker forever
+    return isinstance(getattr(request, "_request", request), ASGIRequest)  # DRF Request wraps the Django one
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def room_events_ticket(request, room_id):
+    room = _member_or_404(request.user, room_id)
+    if not _can_stream(request):
+        return Response({"detail": _NO_STREAM}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return Response({"ticket": issue_ticket(request.user.id, room.id), "expires_in": TICKET_TTL},
+                    status=status.HTTP_200_OK)
+
+def _stream_user(request, room_id):
+    """User from a stream ticket, or the usual Authorization header (non-browser clients)."""
+    if "ticket" in request.GET:
+        user_id = redeem_ticket(request.GET.get("ticket"), room_id)
+        return get_user_model().objects.filter(id=user_id, is_active=True).first() if user_id else None
+    try:
+        found = JWTAuthentication().authenticate(request)
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+    return found[0] if found else None
+
+def _stream_access(request, room_id) -> int:
+    user = _stream_user(request, room_id)
+    if user is None:
+        return status.HTTP_401_UNAUTHORIZED
+    if not RoomMembership.objects.filter(room_id=room_id, room__is_active=True, user=user).exists():
+        return status.HTTP_404_NOT_FOUND
+    return status.HTTP_200_OK
+
+async def _event_stream(room_id):
+    sub = subscribe(room_id)
+    try:
+        yield "retry: 3000\n\n"
+        yield format_sse({"type": "ready", "room": room_id, "data": {}})
+        while True:
+            try:
+                event = await asyncio.wait_for(sub[1].get(), ROOM_EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield format_sse(event)
+    finally:
+        broker.unsubscribe(room_id, sub)
+
+async def room_events(request, room_id):
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    if not _can_stream(request):
+        return JsonResponse({"detail": _NO_STREAM}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    code = await sync_to_async(_stream_access)(request, room_id)
+    if code != status.HTTP_200_OK:
+        detail = "Authentication required." if code == status.HTTP_401_UNAUTHORIZED else "Not found."
+        return JsonResponse({"detail": detail}, status=code)
+
+    response = StreamingHttpResponse(_event_stream(room_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # don't let nginx buffer the stream
+    return response
+
 # Watchlist collaborators (list/add/remove)
 
 @api_view(["GET", "POST", "DELETE"])
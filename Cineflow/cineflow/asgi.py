@@ -5,6 +5,13 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Live room updates (/api/rooms/<id>/events/) are async SSE streams and are only served through this
+entry point; under WSGI (cineflow.wsgi) the stream and its ticket endpoint answer 503 and the rooms UI
+keeps polling. To turn them on, start the site with
+    gunicorn cineflow.asgi:application -k uvicorn.workers.UvicornWorker
+instead of `gunicorn cineflow.wsgi`, and set ROOM_EVENTS_URL to a redis URL when running more than one
+worker process. - KR 16/10/2025
 """
 
 import os
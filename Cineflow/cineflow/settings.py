@@ -20,6 +20,19 @@ ALLOWED_HOSTS = [
 
 # App constants / external APIs
 TMDB_API_KEY = os.getenv("TMDB_API_KEY")
+
+# Mood snapshot pre-warmer (manage.py prewarm_mood_snapshots)
+# Provider sets are ";"-separated TMDB pipe lists, e.g. "8|337;9" ("" = no provider filter)
+MOOD_PREWARM_REGIONS = [r.strip().upper() for r in os.getenv("MOOD_PREWARM_REGIONS", "GB,US,IE").split(",") if r.strip()]
+MOOD_PREWARM_PROVIDER_SETS = [""] + [p.strip() for p in os.getenv("MOOD_PREWARM_PROVIDERS", "").split(";") if p.strip()]
+
+# Local movie catalog (manage.py ingest_catalog). When enabled, mood snapshots are built from our DB and
+# TMDB /discover is only used when the catalog returns fewer than MOOD_CATALOG_MIN_RESULTS movies.
+MOOD_CATALOG_ENABLED = os.getenv("MOOD_CATALOG_ENABLED", "0").lower() in ("1", "true", "yes")
+MOOD_CATALOG_MIN_RESULTS = int(os.getenv("MOOD_CATALOG_MIN_RESULTS", "40"))
+
+# Poster palettes are cached per TMDB file; also persist them in the PosterPalette table (manage.py precompute_palettes)
+POSTER_PALETTE_PERSIST = os.getenv("POSTER_PALETTE_PERSIST", "1").lower() in ("1", "true", "yes")
 SITE_NAME = "Cineflow"
 
 # Single, canonical FRONTEND_URL (used for email links, CORS/CSRF below)
@@ -97,6 +110,58 @@ DATABASES = {
     )
 }
 
+# --- Caches ---
+# Env-driven so every worker shares one cache in production:
+#   CACHE_URL=redis://host:6379/0 | rediss://... | file:///tmp/cineflow-cache | db://cineflow_cache | locmem://
+#   TMDB_CACHE_URL / SECURITY_CACHE_URL override CACHE_URL per alias (e.g. separate redis DBs with their own maxmemory policy).
+# "tmdb" holds hot TMDB payloads (snapshots, details, rails); "security" holds small OTP / rate-limit keys.
+# file:// and db:// are local multi-process fallbacks (db:// needs `manage.py createcachetable`).
+# Only CACHE_URL is read (no REDIS_URL fallback), so an add-on's REDIS_URL never switches backends by itself.
+def _cache_config(url, *, alias, timeout, max_entries, cull_frequency=3):
+    url = (url or "").strip()
+    scheme, _, rest = url.partition("://")
+    scheme = scheme.lower()
+    cfg = {"KEY_PREFIX": f"cf:{alias}", "TIMEOUT": timeout}
+
+    if scheme in ("redis", "rediss"):
+        cfg.update({"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": url})
+        return cfg
+
+    # local backends enforce their own size limits
+    cfg["OPTIONS"] = {"MAX_ENTRIES": max_entries, "CULL_FREQUENCY": cull_frequency}
+    if scheme == "file":
+        root = Path(rest or (BASE_DIR / ".cache"))
+        cfg.update({"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": str(root / alias)})
+    elif scheme == "db":
+        cfg.update({"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": f"{rest or 'cineflow_cache'}_{alias}"})
+    elif url and scheme != "locmem":
+        from django.core.exceptions import ImproperlyConfigured
+        raise ImproperlyConfigured(f"Unsupported cache URL scheme for {alias!r}: {scheme}://")
+    else:
+        cfg.update({"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": f"cineflow-{alias}"})
+    return cfg
+
+CACHE_URL = os.getenv("CACHE_URL", "")
+
+CACHES = {
+    "default": _cache_config(
+        CACHE_URL, alias="default", timeout=300,
+        max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "2000")),
+    ),
+    "tmdb": _cache_config(
+        os.getenv("TMDB_CACHE_URL", CACHE_URL), alias="tmdb", timeout=60 * 60,
+        max_entries=int(os.getenv("TMDB_CACHE_MAX_ENTRIES", "20000")), cull_frequency=4,
+    ),
+    "security": _cache_config(
+        os.getenv("SECURITY_CACHE_URL", CACHE_URL), alias="security", timeout=300,
+        max_entries=int(os.getenv("SECURITY_CACHE_MAX_ENTRIES", "5000")), cull_frequency=10,
+    ),
+}
+
+# Room event stream fan-out (api/services/room_events.py): "" = in-process only,
+# redis://host:6379/1 = pub/sub across every worker process - KR 16/10/2025
+ROOM_EVENTS_URL = os.getenv("ROOM_EVENTS_URL", "")
+
 # --- DRF / JWT ---
 SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
@@ -116,6 +181,11 @@ REST_FRAMEWORK = {
         "rest_framework.parsers.FormParser",
         "rest_framework.parsers.MultiPartParser",
     ],
+    # rates for the throttled public batch lookups (api/views/tmdb_public.py) - KR 17/10/2025
+    "DEFAULT_THROTTLE_RATES": {
+        "providers_batch": os.getenv("THROTTLE_PROVIDERS_BATCH", "60/min"),
+        "palette_batch": os.getenv("THROTTLE_PALETTE_BATCH", "60/min"),
+    },
 }
 
 # --- Email (SendGrid via Anymail) ---
@@ -1,4 +1,5 @@
 import { authFetch } from "@/api/auth";
+import API_ROOT from "@/utils/apiRoot";
 
 const API_BASE = "/api";
 
@@ -54,9 +55,16 @@ export function addRoomMovie(roomId, m) {
 export function reorderRoomMovies(roomId, order) { 
   return post(`/rooms/${roomId}/movies/reorder/`, { order });
 }
+// drag one movie between two neighbours (either may be null at the ends) - KR 16/10/2025
+export function moveRoomMovie(roomId, movieId, { after = null, before = null } = {}) {
+  return post(`/rooms/${roomId}/movies/${movieId}/move/`, { after, before });
+}
 export function voteRoomMovie(roomId, movieId, value) { 
   return post(`/rooms/${roomId}/movies/${movieId}/vote/`, { value });
 }
+export function unvoteRoomMovie(roomId, movieId) {
+  return del(`/rooms/${roomId}/movies/${movieId}/vote/`);
+}
 
 export function deleteRoomMovie(roomId, movieId) {
   return authFetch(`/api/rooms/${roomId}/movies/${movieId}/`, {
@@ -68,6 +76,43 @@ export function deleteRoom(roomId) {
   return authFetch(`/api/rooms/${roomId}/`, { method: "DELETE" }).then(handle);
 }
 
+// Live room updates (SSE): onEvent gets {type, room, data, seq}; returns a function that closes the stream.
+// A "resync" event means deltas were dropped - refetch the room. Each (re)connect trades the JWT for a
+// fresh single-use ticket, so no token sits in the URL and an expired access token is refreshed by
+// authFetch. Stops retrying when the server has no live updates (503) - keep polling then. - KR 16/10/2025
+const ROOM_EVENT_TYPES = ["member_joined", "movie_added", "movie_updated", "movies_reordered", "movie_moved", "movie_scored", "movie_removed", "resync"];
+export function subscribeRoomEvents(roomId, onEvent, { onUnavailable } = {}) {
+  let source = null;
+  let closed = false;
+  let retryMs = 1000;
+  const listener = (e) => { try { onEvent(JSON.parse(e.data)); } catch { /* ignore malformed frames */ } };
+
+  async function connect() {
+    if (closed) return;
+    let ticket;
+    try {
+      ({ ticket } = await post(`/rooms/${roomId}/events/ticket/`, {}));
+    } catch (err) {
+      if ([401, 403, 404, 503].includes(err.status)) { onUnavailable?.(err); return; }
+      setTimeout(connect, retryMs); retryMs = Math.min(retryMs * 2, 30000);
+      return;
+    }
+    if (closed) return;
+    source = new EventSource(`${API_ROOT}/rooms/${roomId}/events/?ticket=${encodeURIComponent(ticket)}`);
+    source.addEventListener("ready", () => { retryMs = 1000; });
+    ROOM_EVENT_TYPES.forEach((t) => source.addEventListener(t, listener));
+    source.onerror = () => {
+      // tickets are single-use, so never let EventSource retry on its own
+      source.close();
+      if (closed) return;
+      setTimeout(connect, retryMs); retryMs = Math.min(retryMs * 2, 30000);
+    };
+  }
+
+  connect();
+  return () => { closed = true; source?.close(); };
+}
+
 // Watchlist collaborators (owner-only) - KR 29/09/2025
 export function listCollaborators(listId) {
   return get(`/watchlists/${listId}/collaborators/`);
@@ -104,4 +104,8 @@ export function updateWatchlistItem(listId, itemId, payLoad) {
 
 export function reorderWatchlistItems(listId, order) {             // POST /api/watchlists/:listId/reorder/ {order:[itemId,...]}
   return post(`/watchlists/${listId}/reorder/`, { order });        // sends explicit item ID order to backend - KR 30/09/2025
+}
+
+export function moveWatchlistItem(listId, itemId, { after = null, before = null } = {}) {  // POST /api/watchlists/:listId/items/:itemId/move/
+  return post(`/watchlists/${listId}/items/${itemId}/move/`, { after, before });          // single-row drag (neighbour ids) - KR 16/10/2025
 }
\ No newline at end of file